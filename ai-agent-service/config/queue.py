@@ -12,6 +12,13 @@ from config.settings import settings
 class QueueManager:
     """Manage RabbitMQ connections and operations"""
 
+    # Outgoing priority lanes: message class -> queue (the gateway sends live replies first)
+    OUTGOING_LANES = {
+        "live": settings.QUEUE_OUTGOING_MESSAGES,
+        "engagement": settings.QUEUE_OUTGOING_ENGAGEMENT,
+        "follow_up": settings.QUEUE_OUTGOING_FOLLOW_UP
+    }
+
     def __init__(self, lazy=False):
         self.connection = None
         self.channel = None
@@ -36,10 +43,11 @@ class QueueManager:
                     queue=settings.QUEUE_INCOMING_MESSAGES,
                     passive=True
                 )
-                self.channel.queue_declare(
-                    queue=settings.QUEUE_OUTGOING_MESSAGES,
-                    passive=True
-                )
+                for queue_name in self.OUTGOING_LANES.values():
+                    self.channel.queue_declare(
+                        queue=queue_name,
+                        passive=True
+                    )
 
                 logger.info("Successfully connected to RabbitMQ")
                 return
@@ -81,6 +89,20 @@ class QueueManager:
             logger.error(f"Failed to publish message to queue '{queue_name}': {e}")
             return False
 
+    def publish_outgoing(self, message_class: str, message: Dict[str, Any]) -> bool:
+        """
+        Publish a message for WhatsApp delivery on its priority lane
+
+        Args:
+            message_class: 'live', 'engagement' or 'follow_up'
+            message: Outgoing message data (tagged with its class and enqueue time)
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        message = {**message, "message_class": message_class, "enqueued_at": time.time()}
+        return self.publish(self.OUTGOING_LANES[message_class], message)
+
     def consume(self, queue_name: str, callback: Callable, prefetch_count: int = 1) -> None:
         """
         Start consuming messages from queue with auto-reconnect
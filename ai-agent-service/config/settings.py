@@ -25,7 +25,9 @@ class Settings(BaseSettings):
     # RabbitMQ
     RABBITMQ_URL: str = os.getenv("RABBITMQ_URL", "")
     QUEUE_INCOMING_MESSAGES: str = os.getenv("QUEUE_INCOMING_MESSAGES", "incoming_messages")
-    QUEUE_OUTGOING_MESSAGES: str = os.getenv("QUEUE_OUTGOING_MESSAGES", "outgoing_messages")
+    QUEUE_OUTGOING_MESSAGES: str = os.getenv("QUEUE_OUTGOING_MESSAGES", "outgoing_messages")  # live replies
+    QUEUE_OUTGOING_ENGAGEMENT: str = os.getenv("QUEUE_OUTGOING_ENGAGEMENT", "outgoing_engagement")
+    QUEUE_OUTGOING_FOLLOW_UP: str = os.getenv("QUEUE_OUTGOING_FOLLOW_UP", "outgoing_follow_up")
 
     # Settings
     MAX_CONTEXT_MESSAGES: int = int(os.getenv("MAX_CONTEXT_MESSAGES", "20"))
@@ -11,7 +11,6 @@ from datetime import datetime
 from services.gemini_client import GeminiClient
 from services.knowledge_loader import KnowledgeBaseLoader
 from config.queue import queue_manager
-from config.settings import settings
 from config.database import get_db
 from models.contact import Contact
 from models.message import Message
@@ -108,7 +107,7 @@ class AISalesAgentService:
         response_text: str,
         reply_to_id: str = None
     ) -> None:
-        """Publish response to outgoing messages queue"""
+        """Publish response to the live outgoing lane"""
         message_data = {
             "phone_number": phone_number,
             "message_text": response_text,
@@ -116,7 +115,7 @@ class AISalesAgentService:
             "mark_as_read": True
         }
 
-        queue_manager.publish(settings.QUEUE_OUTGOING_MESSAGES, message_data)
+        queue_manager.publish_outgoing("live", message_data)
         logger.success(f"Published response to outgoing queue for {phone_number}")
 
     def generate_response(
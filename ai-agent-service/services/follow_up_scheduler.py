@@ -239,13 +239,13 @@ class FollowUpSchedulerService:
             db.add(message)
             db.commit()
 
-            # Publish to outgoing queue
+            # Publish to the follow-up lane, behind live replies
             message_data = {
                 "phone_number": contact.phone_number,
                 "message_text": message_text,
                 "mark_as_read": False
             }
-            queue_manager.publish(settings.QUEUE_OUTGOING_MESSAGES, message_data)
+            queue_manager.publish_outgoing("follow_up", message_data)
 
             logger.success(f"Sent follow-up message to {contact.phone_number}")
 
@@ -203,17 +203,14 @@ class MessageConsumerService:
             db.add(bot_message)
             db.commit()
 
-            # Publish to outgoing queue
+            # Publish to the engagement lane
             outgoing_data = {
                 "phone_number": contact.phone_number,
                 "message_text": response_text,
                 "contact_id": contact_id
             }
 
-            self.queue_manager.publish(
-                settings.QUEUE_OUTGOING_MESSAGES,
-                outgoing_data
-            )
+            self.queue_manager.publish_outgoing("engagement", outgoing_data)
 
             logger.success(f"✅ Sent engagement message to {contact.phone_number}")
 
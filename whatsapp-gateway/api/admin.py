@@ -0,0 +1,142 @@
+"""
+Admin API for WhatsApp Gateway Service
+"""
+from fastapi import APIRouter, Depends, HTTPException, Header
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Optional
+from loguru import logger
+
+from config.database import get_db
+from config.queue import QueueManager, api_queue_manager
+from config.settings import settings
+from models.whitelist import Whitelist
+from services.whitelist_cache import whitelist_cache
+
+
+def verify_admin_token(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Require the configured admin token; the admin API is disabled without one"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin API is disabled (ADMIN_TOKEN not set)")
+
+    if x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(verify_admin_token)])
+
+
+class WhitelistEntryRequest(BaseModel):
+    """Whitelist entry to add"""
+    phone_number: str
+    note: Optional[str] = None
+
+
+def clean_phone_number(phone_number: str) -> str:
+    """Normalize phone number the same way chat ids are stripped"""
+    return phone_number.strip().lstrip("+").replace("@c.us", "")
+
+
+@router.get("/whitelist")
+async def list_whitelist(db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """List whitelisted numbers"""
+    entries = db.query(Whitelist).order_by(Whitelist.added_at).all()
+    return {
+        "count": len(entries),
+        "numbers": [
+            {
+                "phone_number": entry.phone_number,
+                "note": entry.note,
+                "added_at": entry.added_at.isoformat() if entry.added_at else None
+            }
+            for entry in entries
+        ]
+    }
+
+
+@router.post("/whitelist")
+async def add_to_whitelist(entry: WhitelistEntryRequest, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """Add number to whitelist and refresh the cache immediately"""
+    phone_number = clean_phone_number(entry.phone_number)
+    if not phone_number:
+        raise HTTPException(status_code=400, detail="phone_number is required")
+
+    existing = db.query(Whitelist).filter(Whitelist.phone_number == phone_number).first()
+    if existing:
+        return {"status": "exists", "phone_number": phone_number}
+
+    try:
+        db.add(Whitelist(phone_number=phone_number, note=entry.note))
+        db.commit()
+    except Exception as e:
+        logger.error(f"Failed to add {phone_number} to whitelist: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to add number")
+
+    whitelist_cache.invalidate()
+    logger.info(f"Added {phone_number} to whitelist")
+    return {"status": "added", "phone_number": phone_number}
+
+
+@router.delete("/whitelist/{phone_number}")
+async def remove_from_whitelist(phone_number: str, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """Remove number from whitelist and refresh the cache immediately"""
+    phone_number = clean_phone_number(phone_number)
+
+    deleted = db.query(Whitelist).filter(Whitelist.phone_number == phone_number).delete()
+    db.commit()
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Number not in whitelist")
+
+    whitelist_cache.invalidate()
+    logger.info(f"Removed {phone_number} from whitelist")
+    return {"status": "removed", "phone_number": phone_number}
+
+
+def verify_retryable_queue(queue_name: str) -> None:
+    if queue_name not in QueueManager.RETRYABLE_QUEUES:
+        raise HTTPException(status_code=404, detail=f"No dead-letter queue for '{queue_name}'")
+
+
+@router.get("/dlq")
+def list_dead_letter_queues() -> Dict[str, Any]:
+    """Dead-letter queue sizes per source queue"""
+    with api_queue_manager() as queue_manager:
+        return {
+            "queues": {
+                queue_name: queue_manager.get_queue_size(QueueManager.dead_letter_queue_name(queue_name))
+                for queue_name in QueueManager.RETRYABLE_QUEUES
+            }
+        }
+
+
+@router.get("/dlq/{queue_name}")
+def inspect_dead_letters(queue_name: str, limit: int = 20) -> Dict[str, Any]:
+    """Peek at dead-lettered messages without removing them"""
+    verify_retryable_queue(queue_name)
+
+    try:
+        with api_queue_manager() as queue_manager:
+            messages = queue_manager.peek_dead_letters(queue_name, limit=min(limit, 100))
+    except Exception as e:
+        logger.error(f"Failed to inspect dead letters of {queue_name}: {e}")
+        raise HTTPException(status_code=503, detail="Queue unavailable")
+
+    return {"queue": queue_name, "count": len(messages), "messages": messages}
+
+
+@router.post("/dlq/{queue_name}/replay")
+def replay_dead_letters(queue_name: str, limit: int = 100) -> Dict[str, Any]:
+    """Move dead-lettered messages back to their source queue"""
+    verify_retryable_queue(queue_name)
+
+    try:
+        with api_queue_manager() as queue_manager:
+            replayed = queue_manager.replay_dead_letters(queue_name, limit=limit)
+    except Exception as e:
+        logger.error(f"Failed to replay dead letters of {queue_name}: {e}")
+        raise HTTPException(status_code=503, detail="Queue unavailable")
+
+    logger.info(f"Replayed {replayed} messages to {queue_name}")
+    return {"status": "replayed", "queue": queue_name, "replayed": replayed}
@@ -9,11 +9,17 @@ from typing import Dict, Any
 from loguru import logger
 
 from config.database import get_db
-from config.queue import queue_manager
+from config.queue import api_queue_manager
 from config.settings import settings
 from models.message_log import MessageLog
+from api.webhook import router as webhook_router
+from api.admin import router as admin_router
+from utils.metrics import metrics_registry
+from services.circuit_breaker import wappi_circuit_breaker
 
 app = FastAPI(title="WhatsApp Gateway - Health Check API")
+app.include_router(webhook_router)
+app.include_router(admin_router)
 
 
 @app.get("/health")
@@ -33,7 +39,8 @@ async def health_check(db: Session = Depends(get_db)) -> Dict[str, Any]:
 
     # Check RabbitMQ
     try:
-        queue_manager.get_queue_size(settings.QUEUE_INCOMING_MESSAGES)
+        with api_queue_manager() as queue_manager:
+            queue_manager.get_queue_size(settings.QUEUE_INCOMING_MESSAGES)
         queue_status = "ok"
     except Exception as e:
         logger.error(f"Queue health check failed: {e}")
@@ -48,15 +55,27 @@ async def health_check(db: Session = Depends(get_db)) -> Dict[str, Any]:
     except:
         last_poll_time = None
 
+    # Wappi connectivity as seen by the circuit breaker
+    wappi_state = wappi_circuit_breaker.state
+    wappi_status = {"closed": "ok", "half_open": "recovering"}.get(wappi_state, "unavailable")
+
+    if db_status != "ok" or queue_status != "ok":
+        status = "unhealthy"
+    elif wappi_status != "ok":
+        status = "degraded"
+    else:
+        status = "healthy"
+
     return {
-        "status": "healthy" if db_status == "ok" and queue_status == "ok" else "unhealthy",
+        "status": status,
         "service": "whatsapp-gateway",
         "timestamp": datetime.now().isoformat(),
         "checks": {
             "database": db_status,
             "queue": queue_status,
-            "wappi_connection": "ok"  # Assume OK if polling is working
+            "wappi_connection": wappi_status
         },
+        "wappi_circuit": wappi_circuit_breaker.stats(),
         "last_poll_time": last_poll_time
     }
 
@@ -90,18 +109,29 @@ async def get_stats(db: Session = Depends(get_db)) -> Dict[str, Any]:
         ).count()
 
         # Get queue sizes
-        queue_sizes = {
-            "incoming": queue_manager.get_queue_size(settings.QUEUE_INCOMING_MESSAGES),
-            "outgoing": queue_manager.get_queue_size(settings.QUEUE_OUTGOING_MESSAGES),
-            "voice": queue_manager.get_queue_size(settings.QUEUE_VOICE_TRANSCRIPTION)
-        }
+        with api_queue_manager() as queue_manager:
+            queue_sizes = {
+                "incoming": queue_manager.get_queue_size(settings.QUEUE_INCOMING_MESSAGES),
+                "outgoing": queue_manager.get_queue_size(settings.QUEUE_OUTGOING_MESSAGES),
+                "outgoing_engagement": queue_manager.get_queue_size(settings.QUEUE_OUTGOING_ENGAGEMENT),
+                "outgoing_follow_up": queue_manager.get_queue_size(settings.QUEUE_OUTGOING_FOLLOW_UP),
+                "voice": queue_manager.get_queue_size(settings.QUEUE_VOICE_TRANSCRIPTION),
+                "outgoing_dead": sum(
+                    queue_manager.get_queue_size(queue_manager.dead_letter_queue_name(queue_name))
+                    for queue_name in queue_manager.OUTGOING_LANES.values()
+                ),
+                "voice_dead": queue_manager.get_queue_size(
+                    queue_manager.dead_letter_queue_name(settings.QUEUE_VOICE_TRANSCRIPTION)
+                )
+            }
 
         return {
             "date": today.isoformat(),
             "messages_received_today": messages_received_today,
             "messages_sent_today": messages_sent_today,
             "voice_transcribed_today": voice_transcribed_today,
-            "queue_sizes": queue_sizes
+            "queue_sizes": queue_sizes,
+            "runtime": metrics_registry.snapshot()
         }
 
     except Exception as e:
@@ -119,6 +149,8 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
-            "stats": "/stats"
+            "stats": "/stats",
+            "webhook": "/webhook/wappi",
+            "whitelist": "/admin/whitelist"
         }
     }
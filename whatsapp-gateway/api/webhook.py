@@ -0,0 +1,112 @@
+"""
+Webhook API for WhatsApp Gateway Service
+Receives pushed message events from Wappi instead of waiting for the next poll
+"""
+import threading
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Optional
+from loguru import logger
+
+from config.database import get_db
+from config.queue import QueueManager
+from config.settings import settings
+from services.ingestion_service import MessageIngestionService
+
+router = APIRouter(prefix="/webhook", tags=["webhook"])
+
+# Created on first request: a dedicated RabbitMQ connection for the API thread
+_ingestion_service: Optional[MessageIngestionService] = None
+_ingestion_lock = threading.Lock()
+
+
+def get_ingestion_service() -> MessageIngestionService:
+    """Get (or lazily create) the ingestion service used by the webhook"""
+    global _ingestion_service
+    with _ingestion_lock:
+        if _ingestion_service is None:
+            _ingestion_service = MessageIngestionService(queue_manager=QueueManager())
+        return _ingestion_service
+
+
+def verify_secret(token: Optional[str], header_secret: Optional[str]) -> None:
+    """Reject requests without the configured webhook secret"""
+    if not settings.WEBHOOK_SECRET:
+        return
+
+    if settings.WEBHOOK_SECRET not in (token, header_secret):
+        logger.warning("Rejected webhook call with invalid secret")
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+
+@router.post("/wappi")
+def wappi_webhook(
+    payload: Dict[str, Any],
+    token: Optional[str] = Query(default=None),
+    x_webhook_secret: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Wappi webhook endpoint
+
+    Accepts {"messages": [...]} payloads, normalizes each incoming message
+    the same way the poller does and publishes it to the AI or voice queue.
+    A plain function: the database and broker calls block, so FastAPI runs
+    it in the threadpool instead of on the event loop.
+    """
+    verify_secret(token, x_webhook_secret)
+
+    ingestion = get_ingestion_service()
+    messages = payload.get("messages") or []
+
+    received = 0
+    batch = []
+    for message in messages:
+        if not message or not isinstance(message, dict):
+            continue
+
+        # Only incoming messages, never our own outgoing echoes
+        if message.get("wh_type", "incoming_message") != "incoming_message":
+            continue
+        if message.get("fromMe", False) or not message.get("id"):
+            continue
+
+        chat_id = message.get("chatId") or message.get("from")
+        if not chat_id:
+            logger.debug(f"Webhook message {message.get('id')} has no chat id")
+            continue
+
+        received += 1
+        phone_number = ingestion.extract_phone_from_chat_id(chat_id)
+        if ingestion.is_in_whitelist(phone_number):
+            continue
+
+        sender_name = message.get("senderName") or message.get("contact_name") or ""
+        contact_info = {
+            "FirstName": sender_name,
+            "FullName": message.get("contact_name", ""),
+            "PushName": sender_name,
+            "BusinessName": ""
+        }
+
+        try:
+            batch.append(ingestion.build_message_data(message, chat_id, contact_info))
+        except Exception as e:
+            logger.error(f"Error normalizing webhook message: {e}")
+            logger.debug(f"Webhook message data: {message}")
+
+    try:
+        published = len(ingestion.ingest(batch, db)) if batch else 0
+    except Exception as e:
+        # Let Wappi retry delivery; the poller's reconciliation sweep is the backstop
+        logger.error(f"Error ingesting webhook messages: {e}")
+        raise HTTPException(status_code=503, detail="Failed to store messages")
+
+    if published > 0:
+        logger.success(f"📨 Webhook ingested {published}/{received} messages")
+
+    return {
+        "status": "ok",
+        "received": received,
+        "published": published
+    }
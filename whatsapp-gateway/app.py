@@ -10,10 +10,13 @@ from loguru import logger
 import uvicorn
 
 from config.settings import settings
-from config.database import init_db
+from config.database import init_db, get_db
 from services.polling_service import MessagePollingService
 from services.sender_service import MessageSenderService
 from services.voice_service import VoiceTranscriptionService
+from services.seen_cache import seen_message_cache
+from services.whitelist_cache import whitelist_cache
+from services.log_writer import message_log_writer
 from api.health import app as health_app
 
 
@@ -21,13 +24,21 @@ from api.health import app as health_app
 polling_service = None
 sender_service = None
 voice_service = None
+polling_task = None
+main_loop = None
 shutdown_event = asyncio.Event()
 
 
 def signal_handler(sig, frame):
-    """Handle shutdown signals"""
+    """Handle shutdown signals: stop polling so main() reaches the cleanup"""
     logger.info("🛑 Shutdown signal received")
-    shutdown_event.set()
+    if polling_service:
+        polling_service.stop_polling()
+    if main_loop:
+        # Wake the loop from its poll interval sleep instead of waiting it out
+        main_loop.call_soon_threadsafe(shutdown_event.set)
+        if polling_task:
+            main_loop.call_soon_threadsafe(polling_task.cancel)
 
 
 def run_health_api():
@@ -63,6 +74,7 @@ async def run_polling_service():
 
 async def main():
     """Main application entry point"""
+    global polling_task, main_loop
     # Validate settings
     try:
         settings.validate_required()
@@ -79,7 +91,14 @@ async def main():
         logger.error(f"❌ Database initialization failed: {e}")
         sys.exit(1)
 
+    # Warm recently-seen message ids so dedup rarely hits the database
+    db = next(get_db())
+    seen_message_cache.warm(db, settings.SEEN_CACHE_WARM_HOURS)
+    db.close()
+    whitelist_cache.refresh(force=True)
+
     # Setup signal handlers
+    main_loop = asyncio.get_running_loop()
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
@@ -87,7 +106,11 @@ async def main():
     logger.info("🚀 Starting WhatsApp Gateway Service")
     logger.info("=" * 60)
     logger.info(f"Project: {settings.PROJECT_NAME}")
-    logger.info(f"Polling Interval: {settings.POLLING_INTERVAL}s")
+    logger.info(f"Ingestion Mode: {settings.INGESTION_MODE}")
+    if settings.INGESTION_MODE == "webhook":
+        logger.info(f"Reconciliation Interval: {settings.RECONCILIATION_INTERVAL}s")
+    else:
+        logger.info(f"Polling Interval: {settings.POLLING_INTERVAL}s")
     logger.info(f"Health Check Port: {settings.HEALTH_CHECK_PORT}")
     logger.info(f"Timezone: {settings.TIMEZONE}")
     logger.info("=" * 60)
@@ -107,19 +130,22 @@ async def main():
     voice_thread.start()
     logger.info("✅ Voice transcription service started")
 
-    # Run polling service in main thread
+    # Run polling service in main thread until a shutdown signal cancels it
+    polling_task = asyncio.create_task(run_polling_service())
     try:
-        await run_polling_service()
+        await polling_task
+    except asyncio.CancelledError:
+        pass
     except Exception as e:
         logger.error(f"❌ Polling service error: {e}")
-
-    # Wait for shutdown
-    await shutdown_event.wait()
+        # Keep sender and voice threads running until shutdown
+        await shutdown_event.wait()
 
     # Cleanup
     logger.info("🧹 Cleaning up services...")
     if polling_service:
         polling_service.stop_polling()
+    message_log_writer.stop()  # Flush pending message log rows
 
     logger.info("👋 WhatsApp Gateway Service stopped")
 
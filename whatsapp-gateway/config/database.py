@@ -37,5 +37,5 @@ def get_db() -> Generator[Session, None, None]:
 
 def init_db() -> None:
     """Initialize database tables"""
-    from models import message_log, whitelist  # Import all models
+    from models import message_log, whitelist, chat_cursor, transcription_cache  # Import all models
     Base.metadata.create_all(bind=engine)
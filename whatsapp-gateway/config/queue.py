@@ -3,8 +3,10 @@ RabbitMQ Queue Manager for WhatsApp Gateway Service
 """
 import pika
 import json
+import threading
 import time
-from typing import Callable, Dict, Any
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional
 from loguru import logger
 from config.settings import settings
 
@@ -12,10 +14,21 @@ from config.settings import settings
 class QueueManager:
     """Manage RabbitMQ connections and operations"""
 
+    # Outgoing priority lanes: message class -> queue
+    OUTGOING_LANES = {
+        "live": settings.QUEUE_OUTGOING_MESSAGES,
+        "engagement": settings.QUEUE_OUTGOING_ENGAGEMENT,
+        "follow_up": settings.QUEUE_OUTGOING_FOLLOW_UP
+    }
+
+    # Queues whose failed messages go through delayed retries and a dead-letter queue
+    RETRYABLE_QUEUES = (*OUTGOING_LANES.values(), settings.QUEUE_VOICE_TRANSCRIPTION)
+
     def __init__(self):
         self.connection = None
         self.channel = None
         self.rabbitmq_url = settings.RABBITMQ_URL
+        self.retry_delays = [int(delay) for delay in settings.RETRY_DELAYS.split(",") if delay.strip()]
         self._connect()
 
     def _connect(self, max_retries: int = 5) -> None:
@@ -65,9 +78,42 @@ class QueueManager:
                     'x-message-ttl': 7200000,  # 2 hours
                     'x-max-length': 1000
                 }
+            },
+            settings.QUEUE_OUTGOING_ENGAGEMENT: {
+                'durable': True,
+                'arguments': {
+                    'x-message-ttl': 3600000,  # 1 hour
+                    'x-max-length': 5000
+                }
+            },
+            settings.QUEUE_OUTGOING_FOLLOW_UP: {
+                'durable': True,
+                'arguments': {
+                    'x-message-ttl': 86400000,  # 24 hours, follow-ups are not urgent
+                    'x-max-length': 20000
+                }
             }
         }
 
+        # Retry tiers: messages wait out the TTL, then dead-letter back to the source queue
+        for queue_name in self.RETRYABLE_QUEUES:
+            for delay in self.retry_delays:
+                queues_config[self.retry_queue_name(queue_name, delay)] = {
+                    'durable': True,
+                    'arguments': {
+                        'x-message-ttl': delay * 1000,
+                        'x-dead-letter-exchange': '',
+                        'x-dead-letter-routing-key': queue_name
+                    }
+                }
+
+            queues_config[self.dead_letter_queue_name(queue_name)] = {
+                'durable': True,
+                'arguments': {
+                    'x-max-length': 10000
+                }
+            }
+
         for queue_name, config in queues_config.items():
             self.channel.queue_declare(
                 queue=queue_name,
@@ -76,6 +122,132 @@ class QueueManager:
             )
             logger.info(f"Declared queue: {queue_name}")
 
+    @staticmethod
+    def retry_queue_name(queue_name: str, delay: int) -> str:
+        return f"{queue_name}.retry.{delay}s"
+
+    @staticmethod
+    def dead_letter_queue_name(queue_name: str) -> str:
+        return f"{queue_name}.dead"
+
+    @staticmethod
+    def retry_count(properties: Optional[pika.BasicProperties]) -> int:
+        """Number of retries a delivery has already been through"""
+        if properties and properties.headers:
+            return int(properties.headers.get("x-retry-count", 0))
+        return 0
+
+    @staticmethod
+    def _copy_properties(properties: Optional[pika.BasicProperties], headers: Dict[str, Any]) -> pika.BasicProperties:
+        """Keep persistence/content type of the original message, with new headers"""
+        return pika.BasicProperties(
+            delivery_mode=(properties.delivery_mode if properties else None) or 2,
+            content_type=(properties.content_type if properties else None) or 'application/json',
+            content_encoding=properties.content_encoding if properties else None,
+            correlation_id=properties.correlation_id if properties else None,
+            message_id=properties.message_id if properties else None,
+            timestamp=properties.timestamp if properties else None,
+            headers=headers
+        )
+
+    def publish_retry(
+        self,
+        queue_name: str,
+        body: bytes,
+        properties: Optional[pika.BasicProperties],
+        max_retries: int,
+        reason: str = ""
+    ) -> str:
+        """
+        Schedule a failed message for a delayed retry, or dead-letter it
+
+        Must be called on the thread that owns this connection (consumers in
+        worker threads go through add_callback_threadsafe).
+
+        Args:
+            queue_name: Source queue the message was consumed from
+            body: Original message body
+            properties: Original message properties (preserved)
+            max_retries: Retries allowed before the message is dead-lettered
+            reason: Failure description stored in the headers
+
+        Returns:
+            Name of the queue the message was published to
+        """
+        retry_count = self.retry_count(properties)
+        headers = dict(properties.headers or {}) if properties else {}
+        headers["x-last-error"] = reason
+
+        if retry_count >= max_retries or not self.retry_delays:
+            target = self.dead_letter_queue_name(queue_name)
+            headers["x-dead-lettered-at"] = int(time.time())
+        else:
+            delay = self.retry_delays[min(retry_count, len(self.retry_delays) - 1)]
+            target = self.retry_queue_name(queue_name, delay)
+            headers["x-retry-count"] = retry_count + 1
+
+        self.channel.basic_publish(
+            exchange='',
+            routing_key=target,
+            body=body,
+            properties=self._copy_properties(properties, headers)
+        )
+        logger.warning(f"Moved failed message from '{queue_name}' to '{target}' (retry {retry_count}/{max_retries})")
+        return target
+
+    def peek_dead_letters(self, queue_name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Read dead-lettered messages without removing them"""
+        if not self.channel or self.connection.is_closed:
+            self._connect()
+
+        dead_letter_queue = self.dead_letter_queue_name(queue_name)
+        messages = []
+        last_tag = None
+        for _ in range(limit):
+            method, properties, body = self.channel.basic_get(queue=dead_letter_queue, auto_ack=False)
+            if method is None:
+                break
+            last_tag = method.delivery_tag
+            try:
+                payload = json.loads(body.decode())
+            except Exception:
+                payload = body.decode(errors="replace")
+            messages.append({"headers": properties.headers or {}, "body": payload})
+
+        if last_tag is not None:
+            # Put everything back in its original order
+            self.channel.basic_nack(delivery_tag=last_tag, multiple=True, requeue=True)
+        return messages
+
+    def replay_dead_letters(self, queue_name: str, limit: int = 100) -> int:
+        """Move dead-lettered messages back to their source queue with a fresh retry budget"""
+        if not self.channel or self.connection.is_closed:
+            self._connect()
+
+        dead_letter_queue = self.dead_letter_queue_name(queue_name)
+        replayed = 0
+        for _ in range(limit):
+            method, properties, body = self.channel.basic_get(queue=dead_letter_queue, auto_ack=False)
+            if method is None:
+                break
+
+            headers = dict(properties.headers or {})
+            for key in ("x-retry-count", "x-last-error", "x-dead-lettered-at", "x-death"):
+                headers.pop(key, None)
+            headers["x-replayed-at"] = int(time.time())
+
+            self.channel.basic_publish(
+                exchange='',
+                routing_key=queue_name,
+                body=body,
+                properties=self._copy_properties(properties, headers)
+            )
+            self.channel.basic_ack(delivery_tag=method.delivery_tag)
+            replayed += 1
+
+        logger.info(f"Replayed {replayed} dead-lettered messages to '{queue_name}'")
+        return replayed
+
     def publish(self, queue_name: str, message: Dict[str, Any]) -> bool:
         """
         Publish a message to specified queue
@@ -115,23 +287,35 @@ class QueueManager:
             callback: Function to process messages
             prefetch_count: Number of messages to prefetch
         """
+        self.consume_many({queue_name: callback}, prefetch_count)
+
+    def consume_many(self, callbacks: Dict[str, Callable], prefetch_count: int = 1) -> None:
+        """
+        Start consuming from several queues on one channel
+
+        Args:
+            callbacks: Queue name -> function to process its messages
+            prefetch_count: Number of unacked messages per queue
+        """
+        queue_names = ", ".join(callbacks)
         try:
             if not self.channel or self.connection.is_closed:
                 self._connect()
 
             self.channel.basic_qos(prefetch_count=prefetch_count)
-            self.channel.basic_consume(
-                queue=queue_name,
-                on_message_callback=callback,
-                auto_ack=False
-            )
-            logger.info(f"Started consuming from queue: {queue_name}")
+            for queue_name, callback in callbacks.items():
+                self.channel.basic_consume(
+                    queue=queue_name,
+                    on_message_callback=callback,
+                    auto_ack=False
+                )
+            logger.info(f"Started consuming from queue: {queue_names}")
             self.channel.start_consuming()
         except KeyboardInterrupt:
             logger.info("Stopping queue consumer...")
             self.stop_consuming()
         except Exception as e:
-            logger.error(f"Error consuming from queue '{queue_name}': {e}")
+            logger.error(f"Error consuming from queue '{queue_names}': {e}")
             raise
 
     def stop_consuming(self) -> None:
@@ -166,3 +350,18 @@ class QueueManager:
 
 # Global queue manager instance
 queue_manager = QueueManager()
+
+# Created on first use: the API thread's own connection (pika connections are not thread-safe,
+# and the global one belongs to the poller on the main thread)
+_api_queue_manager: Optional[QueueManager] = None
+_api_queue_lock = threading.Lock()
+
+
+@contextmanager
+def api_queue_manager() -> Iterator[QueueManager]:
+    """Dedicated queue manager for the health/admin API, used by one request at a time"""
+    global _api_queue_manager
+    with _api_queue_lock:
+        if _api_queue_manager is None:
+            _api_queue_manager = QueueManager()
+        yield _api_queue_manager
@@ -20,6 +20,34 @@ class Settings(BaseSettings):
     WAPPI_PROFILE_ID: str = os.getenv("WAPPI_PROFILE_ID", "")
     WAPPI_PHONE_NUMBER: str = os.getenv("WAPPI_PHONE_NUMBER", "77752837306")
     WAPPI_BASE_URL: str = os.getenv("WAPPI_BASE_URL", "https://wappi.pro")
+    WAPPI_POOL_SIZE: int = int(os.getenv("WAPPI_POOL_SIZE", "20"))  # max open connections
+    WAPPI_POOL_KEEPALIVE: int = int(os.getenv("WAPPI_POOL_KEEPALIVE", "10"))  # idle connections kept alive
+    WAPPI_KEEPALIVE_EXPIRY: float = float(os.getenv("WAPPI_KEEPALIVE_EXPIRY", "60"))  # seconds
+    WAPPI_HTTP2: bool = os.getenv("WAPPI_HTTP2", "true").lower() == "true"
+
+    # Wappi rate limits (token buckets shared by all callers in the process)
+    WAPPI_READ_RATE_PER_MIN: float = float(os.getenv("WAPPI_READ_RATE_PER_MIN", "300"))
+    WAPPI_READ_BURST: int = int(os.getenv("WAPPI_READ_BURST", "30"))
+    WAPPI_SEND_RATE_PER_MIN: float = float(os.getenv("WAPPI_SEND_RATE_PER_MIN", "20"))
+    WAPPI_SEND_BURST: int = int(os.getenv("WAPPI_SEND_BURST", "5"))
+    WAPPI_MEDIA_RATE_PER_MIN: float = float(os.getenv("WAPPI_MEDIA_RATE_PER_MIN", "30"))
+    WAPPI_MEDIA_BURST: int = int(os.getenv("WAPPI_MEDIA_BURST", "5"))
+
+    # Media downloads (streamed into a spooled temp file)
+    MEDIA_MAX_BYTES: int = int(os.getenv("MEDIA_MAX_BYTES", str(16 * 1024 * 1024)))  # WhatsApp media limit
+    MEDIA_DOWNLOAD_DEADLINE: float = float(os.getenv("MEDIA_DOWNLOAD_DEADLINE", "60"))  # seconds
+    MEDIA_READ_TIMEOUT: float = float(os.getenv("MEDIA_READ_TIMEOUT", "5"))  # max wait for one chunk, also the most a stall can overrun the deadline
+    MEDIA_SPOOL_MAX_MEMORY: int = int(os.getenv("MEDIA_SPOOL_MAX_MEMORY", str(1024 * 1024)))  # spill to disk above
+    MEDIA_CHUNK_SIZE: int = int(os.getenv("MEDIA_CHUNK_SIZE", "65536"))
+
+    # Wappi circuit breaker
+    WAPPI_CB_WINDOW: int = int(os.getenv("WAPPI_CB_WINDOW", "20"))  # Recent calls considered
+    WAPPI_CB_MIN_CALLS: int = int(os.getenv("WAPPI_CB_MIN_CALLS", "10"))
+    WAPPI_CB_FAILURE_RATE: float = float(os.getenv("WAPPI_CB_FAILURE_RATE", "0.5"))
+    WAPPI_CB_SLOW_CALL_MS: float = float(os.getenv("WAPPI_CB_SLOW_CALL_MS", "10000"))
+    WAPPI_CB_SLOW_CALL_RATE: float = float(os.getenv("WAPPI_CB_SLOW_CALL_RATE", "0.8"))
+    WAPPI_CB_OPEN_SECONDS: float = float(os.getenv("WAPPI_CB_OPEN_SECONDS", "30"))
+    WAPPI_CB_HALF_OPEN_CALLS: int = int(os.getenv("WAPPI_CB_HALF_OPEN_CALLS", "3"))
 
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
@@ -27,7 +55,9 @@ class Settings(BaseSettings):
     # RabbitMQ
     RABBITMQ_URL: str = os.getenv("RABBITMQ_URL", "")
     QUEUE_INCOMING_MESSAGES: str = os.getenv("QUEUE_INCOMING_MESSAGES", "incoming_messages")
-    QUEUE_OUTGOING_MESSAGES: str = os.getenv("QUEUE_OUTGOING_MESSAGES", "outgoing_messages")
+    QUEUE_OUTGOING_MESSAGES: str = os.getenv("QUEUE_OUTGOING_MESSAGES", "outgoing_messages")  # live replies
+    QUEUE_OUTGOING_ENGAGEMENT: str = os.getenv("QUEUE_OUTGOING_ENGAGEMENT", "outgoing_engagement")
+    QUEUE_OUTGOING_FOLLOW_UP: str = os.getenv("QUEUE_OUTGOING_FOLLOW_UP", "outgoing_follow_up")
     QUEUE_VOICE_TRANSCRIPTION: str = os.getenv("QUEUE_VOICE_TRANSCRIPTION", "voice_transcription")
 
     # AI APIs (for voice transcription)
@@ -35,12 +65,101 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
 
+    # Voice transcoding (in-memory through ffmpeg pipes)
+    VOICE_OGG_PASSTHROUGH: bool = os.getenv("VOICE_OGG_PASSTHROUGH", "true").lower() == "true"  # upload OGG/Opus as is
+    VOICE_TRANSCODE_POOL: int = int(os.getenv("VOICE_TRANSCODE_POOL", "2"))  # warm ffmpeg processes
+    VOICE_TRANSCODE_BITRATE: str = os.getenv("VOICE_TRANSCODE_BITRATE", "64k")
+    VOICE_TRANSCODE_TIMEOUT: float = float(os.getenv("VOICE_TRANSCODE_TIMEOUT", "30"))  # seconds
+
+    # Voice preprocessing (16 kHz mono, energy VAD trims silence and compresses long pauses)
+    VOICE_PREPROCESS: bool = os.getenv("VOICE_PREPROCESS", "true").lower() == "true"
+    VOICE_VAD_FRAME_MS: int = int(os.getenv("VOICE_VAD_FRAME_MS", "30"))
+    VOICE_VAD_THRESHOLD_DB: float = float(os.getenv("VOICE_VAD_THRESHOLD_DB", "-45"))  # never count quieter as speech
+    VOICE_VAD_MARGIN_DB: float = float(os.getenv("VOICE_VAD_MARGIN_DB", "12"))  # speech = noise floor + margin
+    VOICE_VAD_PADDING_MS: int = int(os.getenv("VOICE_VAD_PADDING_MS", "240"))  # kept around speech
+    VOICE_VAD_MAX_PAUSE_MS: int = int(os.getenv("VOICE_VAD_MAX_PAUSE_MS", "800"))  # longer pauses are shortened
+    VOICE_PREPROCESS_BITRATE: str = os.getenv("VOICE_PREPROCESS_BITRATE", "24k")
+
+    # Chunked transcription of long notes (needs VOICE_PREPROCESS)
+    VOICE_CHUNKING: bool = os.getenv("VOICE_CHUNKING", "true").lower() == "true"
+    VOICE_CHUNK_THRESHOLD_SECONDS: float = float(os.getenv("VOICE_CHUNK_THRESHOLD_SECONDS", "60"))  # shorter notes go as one request
+    VOICE_CHUNK_MAX_SECONDS: float = float(os.getenv("VOICE_CHUNK_MAX_SECONDS", "30"))
+    VOICE_CHUNK_OVERLAP_MS: int = int(os.getenv("VOICE_CHUNK_OVERLAP_MS", "500"))  # shared by neighbouring chunks
+    VOICE_CHUNK_WORKERS: int = int(os.getenv("VOICE_CHUNK_WORKERS", "8"))  # concurrent chunk requests, all notes
+
+    # Voice pipeline (download -> transcode -> transcribe thread pools with bounded queues)
+    VOICE_DOWNLOAD_WORKERS: int = int(os.getenv("VOICE_DOWNLOAD_WORKERS", "4"))
+    VOICE_TRANSCODE_WORKERS: int = int(os.getenv("VOICE_TRANSCODE_WORKERS", "0"))  # 0 = number of CPU cores
+    VOICE_TRANSCRIBE_WORKERS: int = int(os.getenv("VOICE_TRANSCRIBE_WORKERS", "4"))
+    VOICE_STAGE_QUEUE_SIZE: int = int(os.getenv("VOICE_STAGE_QUEUE_SIZE", "4"))  # notes waiting per stage
+    VOICE_MAX_IN_FLIGHT: int = int(os.getenv("VOICE_MAX_IN_FLIGHT", "16"))  # unacked notes (consumer prefetch)
+
+    # Transcription backends
+    TRANSCRIPTION_BACKEND: str = os.getenv("TRANSCRIPTION_BACKEND", "openai")  # preferred remote: openai or gemini
+    TRANSCRIPTION_ROUTING: str = os.getenv("TRANSCRIPTION_ROUTING", "remote")  # remote, local or auto
+    LOCAL_MAX_SECONDS: float = float(os.getenv("LOCAL_MAX_SECONDS", "30"))  # auto: longer clips go remote
+    LOCAL_MAX_QUEUE: int = int(os.getenv("LOCAL_MAX_QUEUE", "4"))  # auto: notes on/waiting for local before spilling
+    LOCAL_WHISPER_MODEL: str = os.getenv("LOCAL_WHISPER_MODEL", "small")  # faster-whisper model name or path
+    LOCAL_WHISPER_COMPUTE_TYPE: str = os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+    LOCAL_WHISPER_CPU_THREADS: int = int(os.getenv("LOCAL_WHISPER_CPU_THREADS", "0"))  # 0 = cores / transcribe workers
+    LOCAL_WHISPER_CPU_AFFINITY: str = os.getenv("LOCAL_WHISPER_CPU_AFFINITY", "")  # e.g. "2-7", empty = no pinning
+    LOCAL_WHISPER_BATCH_SIZE: int = int(os.getenv("LOCAL_WHISPER_BATCH_SIZE", "8"))  # 30s windows decoded together
+
+    # Transcription cache (LRU + transcription_cache table, keyed by SHA-256 of the audio)
+    TRANSCRIPTION_CACHE_SIZE: int = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "1000"))
+    TRANSCRIPTION_CACHE_TTL: int = int(os.getenv("TRANSCRIPTION_CACHE_TTL", str(30 * 86400)))  # seconds
+
     # Settings
-    POLLING_INTERVAL: int = int(os.getenv("POLLING_INTERVAL", "5"))
+    POLLING_INTERVAL: int = int(os.getenv("POLLING_INTERVAL", "5"))  # initial interval
+    POLLING_INTERVAL_MIN: float = float(os.getenv("POLLING_INTERVAL_MIN", "1"))  # floor while chats are active
+    POLLING_INTERVAL_MAX: float = float(os.getenv("POLLING_INTERVAL_MAX", "30"))  # ceiling when idle
+    POLLING_BACKOFF_FACTOR: float = float(os.getenv("POLLING_BACKOFF_FACTOR", "1.5"))
+    POLL_FETCH_CONCURRENCY: int = int(os.getenv("POLL_FETCH_CONCURRENCY", "8"))  # parallel messages/get calls
+    POLL_DIALOG_PAGE_SIZE: int = int(os.getenv("POLL_DIALOG_PAGE_SIZE", "20"))  # chats per get_chats page
+    POLL_MAX_FETCH_PER_CYCLE: int = int(os.getenv("POLL_MAX_FETCH_PER_CYCLE", "20"))  # messages/get budget per cycle
+    POLL_HOT_SECONDS: int = int(os.getenv("POLL_HOT_SECONDS", "900"))  # active within: polled every cycle
+    POLL_WARM_SECONDS: int = int(os.getenv("POLL_WARM_SECONDS", "86400"))  # active within: polled every few cycles
+    POLL_WARM_EVERY_CYCLES: int = int(os.getenv("POLL_WARM_EVERY_CYCLES", "5"))
+    POLL_MAX_STALENESS: int = int(os.getenv("POLL_MAX_STALENESS", "600"))  # seconds, guaranteed for every chat
+    POLL_CURSOR_PAGE_SIZE: int = int(os.getenv("POLL_CURSOR_PAGE_SIZE", "5"))  # messages per page for chats with a cursor
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     TIMEZONE: str = os.getenv("TIMEZONE", "Asia/Almaty")
     HEALTH_CHECK_PORT: int = int(os.getenv("HEALTH_CHECK_PORT", "8000"))
 
+    # Seen-message cache (LRU + Bloom filter in front of message_logs)
+    SEEN_CACHE_SIZE: int = int(os.getenv("SEEN_CACHE_SIZE", "50000"))
+    SEEN_CACHE_BLOOM_CAPACITY: int = int(os.getenv("SEEN_CACHE_BLOOM_CAPACITY", "500000"))
+    SEEN_CACHE_ERROR_RATE: float = float(os.getenv("SEEN_CACHE_ERROR_RATE", "0.01"))
+    SEEN_CACHE_WARM_HOURS: int = int(os.getenv("SEEN_CACHE_WARM_HOURS", "72"))
+
+    # Whitelist cache
+    WHITELIST_CACHE_TTL: int = int(os.getenv("WHITELIST_CACHE_TTL", "60"))  # seconds between version checks
+
+    # Admin API (disabled when empty)
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+    # Ingestion
+    INGESTION_MODE: str = os.getenv("INGESTION_MODE", "polling")  # 'polling' or 'webhook'
+    RECONCILIATION_INTERVAL: int = int(os.getenv("RECONCILIATION_INTERVAL", "60"))  # seconds, webhook mode only
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+
+    # Sender workers (chats are hashed to a worker to keep per-chat order)
+    SENDER_WORKERS: int = int(os.getenv("SENDER_WORKERS", "4"))
+    SENDER_PREFETCH_PER_WORKER: int = int(os.getenv("SENDER_PREFETCH_PER_WORKER", "5"))
+    SENDER_COALESCE_MS: int = int(os.getenv("SENDER_COALESCE_MS", "300"))  # wait for more messages to the same chat
+    SENDER_COALESCE_MERGE: bool = os.getenv("SENDER_COALESCE_MERGE", "true").lower() == "true"  # merge into one send
+    SENDER_COALESCE_MAX_CHARS: int = int(os.getenv("SENDER_COALESCE_MAX_CHARS", "4000"))
+    SENDER_DEDUPE_SECONDS: int = int(os.getenv("SENDER_DEDUPE_SECONDS", "30"))  # drop identical resends
+    SENDER_LANE_WEIGHTS: str = os.getenv("SENDER_LANE_WEIGHTS", "live:8,engagement:3,follow_up:1")  # lane:weight
+
+    # Delayed retries for failed sends/transcriptions (seconds per attempt, then dead-letter queue)
+    RETRY_DELAYS: str = os.getenv("RETRY_DELAYS", "5,30,120")
+
+    # Write-behind message log (outgoing status rows)
+    LOG_WRITER_FLUSH_MS: int = int(os.getenv("LOG_WRITER_FLUSH_MS", "500"))
+    LOG_WRITER_MAX_BATCH: int = int(os.getenv("LOG_WRITER_MAX_BATCH", "100"))
+    LOG_WRITER_MAX_PENDING: int = int(os.getenv("LOG_WRITER_MAX_PENDING", "50000"))  # oldest rows dropped beyond this
+
     def validate_required(self) -> bool:
         """Validate that all required settings are present"""
         required = {
@@ -22,6 +22,8 @@ print(f"✅ DATABASE_URL loaded: {os.getenv('DATABASE_URL')[:50]}...")
 from config.database import Base, engine, get_db
 from models.message_log import MessageLog
 from models.whitelist import Whitelist
+from models.chat_cursor import ChatCursor
+from models.transcription_cache import TranscriptionCacheEntry
 from loguru import logger
 
 
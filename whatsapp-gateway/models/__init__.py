@@ -1,5 +1,7 @@
 # Database models for WhatsApp Gateway Service
 from models.message_log import MessageLog
 from models.whitelist import Whitelist
+from models.chat_cursor import ChatCursor
+from models.transcription_cache import TranscriptionCacheEntry
 
-__all__ = ["MessageLog", "Whitelist"]
+__all__ = ["MessageLog", "Whitelist", "ChatCursor", "TranscriptionCacheEntry"]
@@ -0,0 +1,21 @@
+"""
+Chat Cursor Model - High-water mark of the last seen message per chat
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+from config.database import Base
+
+
+class ChatCursor(Base):
+    """Last message seen by the poller in each chat"""
+
+    __tablename__ = "chat_cursors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(String(255), unique=True, nullable=False, index=True)
+    last_message_id = Column(String(255), nullable=True)
+    last_message_time = Column(BigInteger, nullable=True)  # Unix timestamp from Wappi
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ChatCursor(chat={self.chat_id}, last_message={self.last_message_id})>"
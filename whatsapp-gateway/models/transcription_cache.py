@@ -0,0 +1,21 @@
+"""
+Transcription Cache Model - Transcriptions keyed by the SHA-256 of the audio bytes
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from config.database import Base
+
+
+class TranscriptionCacheEntry(Base):
+    """Transcription of one audio payload, shared by forwards and redeliveries"""
+
+    __tablename__ = "transcription_cache"
+
+    audio_hash = Column(String(64), primary_key=True)  # hex SHA-256 of the downloaded bytes
+    transcription = Column(Text, nullable=False)
+    backend = Column(String(50), nullable=True)
+    transcribe_ms = Column(Integer, nullable=True)  # what the backend call cost, reported as saved on hits
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<TranscriptionCacheEntry(hash={self.audio_hash[:12]}, backend={self.backend})>"
@@ -0,0 +1,120 @@
+"""
+Chunked transcription benchmark
+Wall-clock transcription time of long voice notes: one request per note
+(the current path) versus chunked parallel transcription
+
+Needs ffmpeg and a remote backend key (OPENAI_API_KEY or GEMINI_API_KEY);
+every run makes real, billed API calls.
+
+Usage:
+    python scripts/benchmark_chunked_transcription.py note1.ogg note2.ogg --repeat 3
+    python scripts/benchmark_chunked_transcription.py long.ogg --backend gemini --chunk-seconds 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Dict, Any, List
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import settings
+from services.audio_preprocessor import AudioPreprocessor, SAMPLE_RATE, chunk_bounds
+from services.chunked_transcription import ChunkedTranscriber
+from services.transcription_backends import TranscriptionRouter
+
+
+def benchmark_file(
+    path: str,
+    backend: str,
+    preprocessor: AudioPreprocessor,
+    router: TranscriptionRouter,
+    chunker: ChunkedTranscriber,
+    repeat: int
+) -> Dict[str, Any]:
+    """Time both paths on one note, alternating so backend load drifts affect both equally"""
+    with open(path, "rb") as audio_file:
+        result = preprocessor.process(audio_file)
+    if not result:
+        raise RuntimeError(f"Could not preprocess {path} (is ffmpeg installed?)")
+
+    chunks = len(chunk_bounds(result.samples, preprocessor.frame_size, chunker.max_chunk_frames, chunker.overlap_frames))
+    single_times: List[float] = []
+    chunked_times: List[float] = []
+    single_text = chunked_text = None
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        single_text, _ = router.transcribe(backend, result.upload[1], result.upload)
+        single_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        chunked_text, _ = chunker.transcribe(backend, result.samples)
+        chunked_times.append(time.perf_counter() - started)
+
+    single = statistics.median(single_times)
+    chunked = statistics.median(chunked_times)
+    return {
+        "file": os.path.basename(path),
+        "seconds": len(result.samples) / SAMPLE_RATE,
+        "chunks": chunks,
+        "single_s": single,
+        "chunked_s": chunked,
+        "speedup": single / chunked if chunked else 0.0,
+        "single_words": len(single_text.split()) if single_text else 0,
+        "chunked_words": len(chunked_text.split()) if chunked_text else 0
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="Voice notes to transcribe (any format ffmpeg reads)")
+    parser.add_argument("--backend", default=settings.TRANSCRIPTION_BACKEND, choices=["openai", "gemini"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path and file (median is reported)")
+    parser.add_argument("--chunk-seconds", type=float, default=settings.VOICE_CHUNK_MAX_SECONDS)
+    parser.add_argument("--overlap-ms", type=int, default=settings.VOICE_CHUNK_OVERLAP_MS)
+    parser.add_argument("--workers", type=int, default=settings.VOICE_CHUNK_WORKERS)
+    args = parser.parse_args()
+
+    preprocessor = AudioPreprocessor(
+        pool_size=2,
+        frame_ms=settings.VOICE_VAD_FRAME_MS,
+        threshold_db=settings.VOICE_VAD_THRESHOLD_DB,
+        margin_db=settings.VOICE_VAD_MARGIN_DB,
+        padding_ms=settings.VOICE_VAD_PADDING_MS,
+        max_pause_ms=settings.VOICE_VAD_MAX_PAUSE_MS,
+        bitrate=settings.VOICE_PREPROCESS_BITRATE,
+        output_format="ogg" if settings.VOICE_OGG_PASSTHROUGH else "mp3",
+        timeout=settings.VOICE_TRANSCODE_TIMEOUT
+    )
+    if not preprocessor.available:
+        sys.exit("ffmpeg is required")
+
+    router = TranscriptionRouter(mode="remote", primary=args.backend, local_workers=1)
+    if args.backend not in router.backends:
+        sys.exit(f"Backend '{args.backend}' is not configured (missing API key)")
+
+    chunker = ChunkedTranscriber(
+        preprocessor,
+        router,
+        workers=args.workers,
+        threshold_seconds=0,
+        chunk_seconds=args.chunk_seconds,
+        overlap_ms=args.overlap_ms
+    )
+
+    rows = [benchmark_file(path, args.backend, preprocessor, router, chunker, args.repeat) for path in args.files]
+
+    print(f"\nbackend={args.backend} chunk={args.chunk_seconds:.0f}s overlap={args.overlap_ms}ms workers={args.workers} repeat={args.repeat}")
+    print(f"{'file':<30} {'audio_s':>8} {'chunks':>6} {'single_s':>9} {'chunked_s':>10} {'speedup':>8} {'words':>11}")
+    for row in rows:
+        print(
+            f"{row['file'][:30]:<30} {row['seconds']:>8.1f} {row['chunks']:>6} {row['single_s']:>9.2f} "
+            f"{row['chunked_s']:>10.2f} {row['speedup']:>7.2f}x {row['single_words']:>5}/{row['chunked_words']:<5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
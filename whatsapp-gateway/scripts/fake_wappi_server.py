@@ -0,0 +1,257 @@
+"""
+Fake Wappi server for local load testing
+Implements the Wappi endpoints the gateway uses, with generated chat traffic,
+configurable latency and injected 429/5xx responses
+
+Usage:
+    python scripts/fake_wappi_server.py --chats 500 --rate 20
+    python scripts/fake_wappi_server.py --latency-ms 150 --latency-dist lognormal --error-rate 0.02 --rate-limit-rate 0.01
+
+Point the gateway at it with WAPPI_BASE_URL=http://localhost:8090
+Control endpoints:
+    GET  /fake/stats  - API call counts, generated and sent messages
+    GET  /fake/sent   - Messages received via send/reply, with receive times
+    POST /fake/reset  - Clear counters and sent messages
+"""
+import argparse
+import asyncio
+import math
+import random
+import shutil
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+class FakeWappiState:
+    """Chats, generated messages and call counters"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.chats: Dict[str, Dict[str, Any]] = {}
+        self.messages: Dict[str, List[Dict[str, Any]]] = defaultdict(list)  # chat_id -> newest last
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.injected: Dict[str, int] = defaultdict(int)
+        self.sent: List[Dict[str, Any]] = []
+        self.generated = 0
+        self.started_at = time.time()
+        self.voice_payload = synthetic_ogg(args.voice_seconds)
+
+        for i in range(args.chats):
+            chat_id = f"7700{i:07d}@c.us"
+            self.chats[chat_id] = {
+                "id": chat_id,
+                "last_time": int(time.time()) - random.randint(3600, 30 * 86400),
+                "last_message_data": {},
+                "contact": {
+                    "FirstName": f"Customer {i}",
+                    "FullName": f"Load Test Customer {i}",
+                    "PushName": f"Customer {i}",
+                    "BusinessName": ""
+                }
+            }
+
+    def pick_chat(self) -> str:
+        """Hot chats get most of the traffic, the rest is spread over all chats"""
+        chat_ids = list(self.chats)
+        hot_count = max(1, int(len(chat_ids) * self.args.hot_fraction))
+        if random.random() < self.args.hot_share:
+            return chat_ids[random.randrange(hot_count)]
+        return random.choice(chat_ids)
+
+    def add_message(self, chat_id: str) -> Dict[str, Any]:
+        """Generate an incoming message; the text carries the arrival time"""
+        now = time.time()
+        self.generated += 1
+        voice = random.random() < self.args.voice_fraction
+        message = {
+            "id": f"fake_{uuid.uuid4().hex}",
+            "type": "ptt" if voice else "chat",
+            "body": {"PTT": True, "mimetype": "audio/ogg; codecs=opus"} if voice else f"lt:{now:.6f} message {self.generated}",
+            "from": chat_id,
+            "chatId": chat_id,
+            "fromMe": False,
+            "time": int(now)
+        }
+        self.messages[chat_id].append(message)
+
+        chat = self.chats[chat_id]
+        chat["last_time"] = message["time"]
+        chat["last_message_data"] = {"id": message["id"], "time": message["time"]}
+        return message
+
+
+def synthetic_ogg(seconds: float) -> bytes:
+    """OGG/Opus tone made with ffmpeg; falls back to a bare OGG header without it"""
+    if shutil.which("ffmpeg"):
+        result = subprocess.run(
+            [
+                "ffmpeg", "-loglevel", "error", "-f", "lavfi",
+                "-i", f"sine=frequency=440:duration={seconds}",
+                "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k", "-f", "ogg", "pipe:1"
+            ],
+            capture_output=True
+        )
+        if result.returncode == 0 and result.stdout:
+            return result.stdout
+
+    print("⚠️  ffmpeg with libopus not available, serving a placeholder OGG payload")
+    return b"OggS" + bytes(4096)
+
+
+def create_app(state: FakeWappiState) -> FastAPI:
+    """Build the fake Wappi API"""
+    args = state.args
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        traffic = asyncio.create_task(generate_traffic(state)) if args.rate > 0 else None
+        yield
+        if traffic:
+            traffic.cancel()
+
+    app = FastAPI(title="Fake Wappi", lifespan=lifespan)
+
+    def latency() -> float:
+        """Sample a response delay in seconds"""
+        mean = args.latency_ms / 1000
+        if args.latency_dist == "uniform":
+            return random.uniform(0, 2 * mean)
+        if args.latency_dist == "lognormal":
+            sigma = 0.8
+            return random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0
+        return mean
+
+    async def simulate(endpoint: str) -> Optional[Response]:
+        """Count the call, wait, and maybe inject a failure"""
+        state.calls[endpoint] += 1
+        await asyncio.sleep(latency())
+
+        roll = random.random()
+        if roll < args.rate_limit_rate:
+            state.injected["429"] += 1
+            return JSONResponse({"status": "error", "detail": "rate limited"}, status_code=429,
+                                headers={"Retry-After": str(args.retry_after)})
+        if roll < args.rate_limit_rate + args.error_rate:
+            state.injected["5xx"] += 1
+            return JSONResponse({"status": "error", "detail": "injected failure"}, status_code=503)
+        return None
+
+    @app.post("/api/sync/chats/get")
+    async def chats_get(limit: int = 100, offset: int = 0):
+        failure = await simulate("chats/get")
+        if failure:
+            return failure
+
+        dialogs = sorted(state.chats.values(), key=lambda c: c["last_time"], reverse=True)
+        return {"status": "done", "dialogs": dialogs[offset:offset + limit]}
+
+    @app.get("/api/sync/messages/get")
+    async def messages_get(chat_id: str, limit: int = 20, offset: int = 0, order: str = "desc"):
+        failure = await simulate("messages/get")
+        if failure:
+            return failure
+
+        messages = state.messages.get(chat_id, [])
+        ordered = list(reversed(messages)) if order == "desc" else messages
+        return {"status": "done", "messages": ordered[offset:offset + limit]}
+
+    async def record_sent(endpoint: str, request: Request) -> Dict[str, Any]:
+        data = await request.json()
+        message_id = f"fake_out_{uuid.uuid4().hex}"
+        state.sent.append({
+            "endpoint": endpoint,
+            "message_id": message_id,
+            "body": data.get("body", ""),
+            "received_at": time.time()
+        })
+        return {"status": "done", "message_id": message_id}
+
+    @app.post("/api/sync/message/send")
+    async def message_send(request: Request):
+        failure = await simulate("message/send")
+        return failure or await record_sent("message/send", request)
+
+    @app.post("/api/sync/message/reply")
+    async def message_reply(request: Request):
+        failure = await simulate("message/reply")
+        return failure or await record_sent("message/reply", request)
+
+    @app.post("/api/sync/message/mark/read")
+    async def message_mark_read():
+        failure = await simulate("message/mark/read")
+        return failure or {"status": "done"}
+
+    @app.get("/api/sync/message/media/download")
+    async def media_download(message_id: str):
+        failure = await simulate("message/media/download")
+        # Salted per message (trailing bytes after the last OGG page are ignored by decoders),
+        # so every note hashes differently and the gateway's transcription cache does not
+        # turn a load test into cache hits
+        salt = f"\nlt-salt:{message_id}:{uuid.uuid4().hex}".encode()
+        return failure or Response(content=state.voice_payload + salt, media_type="audio/ogg")
+
+    @app.get("/fake/stats")
+    async def fake_stats():
+        return {
+            "uptime_seconds": round(time.time() - state.started_at, 1),
+            "chats": len(state.chats),
+            "generated_messages": state.generated,
+            "sent_messages": len(state.sent),
+            "calls": dict(state.calls),
+            "injected": dict(state.injected)
+        }
+
+    @app.get("/fake/sent")
+    async def fake_sent():
+        return {"sent": state.sent}
+
+    @app.post("/fake/reset")
+    async def fake_reset():
+        state.calls.clear()
+        state.injected.clear()
+        state.sent.clear()
+        return {"status": "done"}
+
+    return app
+
+
+async def generate_traffic(state: FakeWappiState) -> None:
+    """Poisson arrivals at --rate messages per second"""
+    rate = state.args.rate
+    while True:
+        await asyncio.sleep(random.expovariate(rate))
+        state.add_message(state.pick_chat())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Wappi API for load testing")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--chats", type=int, default=200, help="Number of chats")
+    parser.add_argument("--rate", type=float, default=5.0, help="Incoming messages per second (0 disables)")
+    parser.add_argument("--hot-fraction", type=float, default=0.05, help="Share of chats that are hot")
+    parser.add_argument("--hot-share", type=float, default=0.8, help="Share of traffic going to hot chats")
+    parser.add_argument("--voice-fraction", type=float, default=0.0, help="Share of generated messages that are voice")
+    parser.add_argument("--voice-seconds", type=float, default=10.0, help="Duration of the synthetic OGG")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Mean response latency")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=2, help="Retry-After seconds sent with 429")
+    args = parser.parse_args()
+
+    state = FakeWappiState(args)
+    print(f"🧪 Fake Wappi on http://{args.host}:{args.port} ({args.chats} chats, {args.rate} msg/s)")
+    uvicorn.run(create_app(state), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
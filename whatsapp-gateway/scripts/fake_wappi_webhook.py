@@ -0,0 +1,57 @@
+"""
+Fake Wappi webhook sender for local testing of the webhook ingestion endpoint
+
+Usage:
+    python scripts/fake_wappi_webhook.py --count 5
+    python scripts/fake_wappi_webhook.py --phone 77001234567 --voice
+"""
+import argparse
+import time
+import uuid
+import httpx
+
+
+def build_message(phone: str, text: str, voice: bool = False) -> dict:
+    """Build a message event in the shape Wappi pushes to webhooks"""
+    chat_id = f"{phone}@c.us"
+    return {
+        "wh_type": "incoming_message",
+        "profile_id": "fake-profile",
+        "id": f"fake_{uuid.uuid4().hex}",
+        "body": {"PTT": True, "mimetype": "audio/ogg; codecs=opus"} if voice else text,
+        "type": "ptt" if voice else "chat",
+        "from": chat_id,
+        "chatId": chat_id,
+        "senderName": "Test Customer",
+        "contact_name": "Test Customer",
+        "fromMe": False,
+        "time": int(time.time())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send fake Wappi webhook events")
+    parser.add_argument("--url", default="http://localhost:8000/webhook/wappi")
+    parser.add_argument("--phone", default="77000000001")
+    parser.add_argument("--count", type=int, default=1, help="Number of messages to send")
+    parser.add_argument("--voice", action="store_true", help="Send voice (ptt) messages")
+    parser.add_argument("--secret", default="", help="Webhook secret, if configured")
+    parser.add_argument("--duplicate", action="store_true", help="Send every event twice to check dedup")
+    args = parser.parse_args()
+
+    headers = {"X-Webhook-Secret": args.secret} if args.secret else {}
+
+    with httpx.Client(timeout=10) as client:
+        for i in range(args.count):
+            payload = {"messages": [build_message(args.phone, f"Test message {i + 1}", args.voice)]}
+            attempts = 2 if args.duplicate else 1
+
+            for _ in range(attempts):
+                started = time.perf_counter()
+                response = client.post(args.url, json=payload, headers=headers)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                print(f"{response.status_code} {response.text} ({elapsed_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Gateway load test harness
+Drives the polling, sender and voice services against scripts/fake_wappi_server.py
+and reports throughput, end-to-end latency percentiles and Wappi calls per message
+
+Needs the gateway's RabbitMQ and PostgreSQL (use a dev environment: test rows are
+written to message_logs). Every gateway queue is renamed with --queue-prefix
+(default "loadtest_"), so a run never consumes or publishes production traffic;
+--purge-queues empties only those prefixed queues afterwards.
+
+Usage:
+    python scripts/fake_wappi_server.py --chats 500 --rate 20 &
+    python scripts/load_test_gateway.py --component poll --duration 60
+    python scripts/load_test_gateway.py --component send --messages 500
+    python scripts/load_test_gateway.py --component voice --messages 50 --transcription skip
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LATENCY_MARKER = re.compile(r"lt:(\d+\.\d+)")
+
+# Queue name settings and their defaults (config/settings.py), renamed with --queue-prefix
+QUEUE_SETTINGS = {
+    "QUEUE_INCOMING_MESSAGES": "incoming_messages",
+    "QUEUE_OUTGOING_MESSAGES": "outgoing_messages",
+    "QUEUE_OUTGOING_ENGAGEMENT": "outgoing_engagement",
+    "QUEUE_OUTGOING_FOLLOW_UP": "outgoing_follow_up",
+    "QUEUE_VOICE_TRANSCRIPTION": "voice_transcription"
+}
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Point the gateway at the fake server; must run before importing gateway modules"""
+    os.environ["WAPPI_BASE_URL"] = args.wappi_url
+    os.environ.setdefault("WAPPI_TOKEN", "load-test")
+    os.environ.setdefault("WAPPI_PROFILE_ID", "load-test")
+
+    if not args.queue_prefix:
+        sys.exit("--queue-prefix must not be empty: the load test would use the production queues")
+    for name, default in QUEUE_SETTINGS.items():
+        os.environ[name] = args.queue_prefix + os.environ.get(name, default)
+
+    if not args.real_limits:
+        # Measure the gateway, not the production Wappi budgets
+        for name in ("WAPPI_READ_RATE_PER_MIN", "WAPPI_SEND_RATE_PER_MIN", "WAPPI_MEDIA_RATE_PER_MIN"):
+            os.environ[name] = "1000000"
+        for name in ("WAPPI_READ_BURST", "WAPPI_SEND_BURST", "WAPPI_MEDIA_BURST"):
+            os.environ[name] = "1000"
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p90/p99/max in milliseconds"""
+    if not values:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+
+    ordered = sorted(values)
+
+    def pick(p: float) -> float:
+        index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+        return round(ordered[index] * 1000, 1)
+
+    return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": pick(1.0)}
+
+
+class FakeWappi:
+    """Control API of the fake server"""
+
+    def __init__(self, url: str):
+        self.http = httpx.Client(base_url=url, timeout=10)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.http.get("/fake/stats").json()
+
+    def sent(self) -> List[Dict[str, Any]]:
+        return self.http.get("/fake/sent").json()["sent"]
+
+    def reset(self) -> None:
+        self.http.post("/fake/reset")
+
+
+def build_report(
+    component: str,
+    messages: int,
+    elapsed: float,
+    latencies: List[float],
+    before: Dict[str, Any],
+    after: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Throughput, latency and API call counts for one component run"""
+    calls = {
+        endpoint: count - before["calls"].get(endpoint, 0)
+        for endpoint, count in after["calls"].items()
+        if count - before["calls"].get(endpoint, 0)
+    }
+    total_calls = sum(calls.values())
+    injected = {
+        kind: count - before["injected"].get(kind, 0)
+        for kind, count in after["injected"].items()
+    }
+
+    return {
+        "component": component,
+        "messages": messages,
+        "elapsed_seconds": round(elapsed, 2),
+        "messages_per_second": round(messages / elapsed, 2) if elapsed else 0.0,
+        "latency": percentiles(latencies),
+        "api_calls": total_calls,
+        "api_calls_per_message": round(total_calls / messages, 2) if messages else None,
+        "api_calls_by_endpoint": calls,
+        "injected_failures": injected
+    }
+
+
+def run_polling(args: argparse.Namespace, fake: FakeWappi) -> Dict[str, Any]:
+    """Poll the fake server for --duration seconds; latency is arrival at Wappi -> published"""
+    from services.polling_service import MessagePollingService
+
+    service = MessagePollingService()
+    latencies = []
+    published = [0]
+    publish_message = service.ingestion.publish_message
+
+    def timed_publish(message_data: Dict[str, Any]) -> bool:
+        result = publish_message(message_data)
+        published[0] += 1
+        match = LATENCY_MARKER.search(message_data.get("message_text") or "")
+        if match:
+            latencies.append(time.time() - float(match.group(1)))
+        return result
+
+    service.ingestion.publish_message = timed_publish
+
+    async def run() -> None:
+        task = asyncio.create_task(service.start_polling())
+        await asyncio.sleep(args.duration)
+        service.stop_polling()
+        await task
+
+    before = fake.stats()
+    started = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - started
+
+    return build_report("poll", published[0], elapsed, latencies, before, fake.stats())
+
+
+def wait_until(condition, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not condition():
+        time.sleep(0.5)
+
+
+def run_sender(args: argparse.Namespace, fake: FakeWappi) -> Dict[str, Any]:
+    """Enqueue --messages outgoing messages and send them; latency is enqueue -> received by Wappi"""
+    from config.queue import QueueManager
+    from config.settings import settings
+    from services.sender_service import MessageSenderService
+
+    fake.reset()
+    producer = QueueManager()
+    for i in range(args.messages):
+        producer.publish(settings.QUEUE_OUTGOING_MESSAGES, {
+            "phone_number": f"7700{i % 1000:07d}",
+            "message_text": f"lt:{time.time():.6f} load test reply {i}",
+            "message_class": "live",
+            "enqueued_at": time.time()
+        })
+
+    before = fake.stats()
+    started = time.perf_counter()
+    threading.Thread(target=MessageSenderService().start_consuming, daemon=True).start()
+
+    wait_until(lambda: fake.stats()["sent_messages"] >= args.messages, args.timeout)
+    elapsed = time.perf_counter() - started
+
+    latencies = []
+    for sent in fake.sent():
+        match = LATENCY_MARKER.search(sent["body"] or "")
+        if match:
+            latencies.append(sent["received_at"] - float(match.group(1)))
+
+    return build_report("send", len(latencies), elapsed, latencies, before, fake.stats())
+
+
+def run_voice(args: argparse.Namespace, fake: FakeWappi) -> Dict[str, Any]:
+    """Enqueue --messages voice messages and transcribe them; latency is enqueue -> transcription published"""
+    from config.queue import QueueManager
+    from config.settings import settings
+    from services.voice_service import VoiceTranscriptionService
+
+    from services.transcription_cache import transcription_cache
+
+    service = VoiceTranscriptionService()
+    if args.transcription == "skip":
+        # Exercise download, preprocessing and queueing only; no calls to the transcription API
+        service.router.transcribe = lambda backend, audio_file, upload=None: ("load test transcription", "skip")
+
+    if not args.voice_cache:
+        # Every note goes through preprocess/transcode/transcribe
+        transcription_cache.get = lambda audio_hash: None
+    if not args.voice_cache or args.transcription == "skip":
+        # Never store load test (or fake "skip") transcriptions in the real cache table
+        transcription_cache.put = lambda audio_hash, transcription, cost_seconds, backend: None
+    cache_before = transcription_cache.stats()
+
+    latencies = []
+    publish_transcription = service.publish_transcription
+
+    def timed_publish(original_data: Dict[str, Any], transcription: str) -> None:
+        publish_transcription(original_data, transcription)
+        latencies.append(time.time() - original_data["lt_enqueued_at"])
+
+    service.publish_transcription = timed_publish
+
+    producer = QueueManager()
+    for i in range(args.messages):
+        producer.publish(settings.QUEUE_VOICE_TRANSCRIPTION, {
+            "message_id": f"lt_voice_{uuid.uuid4().hex}",
+            "chat_id": f"7700{i % 1000:07d}@c.us",
+            "phone_number": f"7700{i % 1000:07d}",
+            "message_text": "[Voice message]",
+            "is_voice": True,
+            "lt_enqueued_at": time.time()
+        })
+
+    before = fake.stats()
+    started = time.perf_counter()
+    threading.Thread(target=service.start_consuming, daemon=True).start()
+
+    wait_until(lambda: len(latencies) >= args.messages, args.timeout)
+    elapsed = time.perf_counter() - started
+
+    report = build_report("voice", len(latencies), elapsed, latencies, before, fake.stats())
+    cache_after = transcription_cache.stats()
+    report["cache_hits"] = {
+        "enabled": args.voice_cache,
+        "memory": cache_after["memory_hits"] - cache_before["memory_hits"],
+        "db": cache_after["db_hits"] - cache_before["db_hits"]
+    }
+    return report
+
+
+def purge_queues(prefix: str) -> None:
+    """Drop test messages the run left in its prefixed queues (and their retry/dead-letter queues)"""
+    from config.queue import QueueManager
+    from config.settings import settings
+
+    manager = QueueManager()
+    queues = [getattr(settings, name) for name in QUEUE_SETTINGS]
+    for queue_name in QueueManager.RETRYABLE_QUEUES:
+        queues += [QueueManager.retry_queue_name(queue_name, delay) for delay in manager.retry_delays]
+        queues.append(QueueManager.dead_letter_queue_name(queue_name))
+
+    for queue in queues:
+        if not queue.startswith(prefix):
+            # Never touch a queue the run did not own
+            print(f"⚠️  Not purging {queue}: missing prefix {prefix!r}")
+            continue
+        try:
+            manager.channel.queue_purge(queue)
+        except Exception as e:
+            print(f"⚠️  Could not purge {queue}: {e}")
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency"]
+    print(f"\n=== {report['component']} ===")
+    print(f"messages:            {report['messages']} in {report['elapsed_seconds']}s")
+    print(f"throughput:          {report['messages_per_second']} msg/s")
+    print(
+        f"latency (ms):        p50={latency['p50_ms']} p90={latency['p90_ms']} "
+        f"p99={latency['p99_ms']} max={latency['max_ms']}"
+    )
+    print(f"api calls:           {report['api_calls']} ({report['api_calls_per_message']} per message)")
+    for endpoint, count in sorted(report["api_calls_by_endpoint"].items()):
+        print(f"  {endpoint:<24} {count}")
+    if "cache_hits" in report:
+        cache = report["cache_hits"]
+        state = "on" if cache["enabled"] else "off"
+        print(f"cache hits:          memory={cache['memory']} db={cache['db']} (cache {state})")
+    if any(report["injected_failures"].values()):
+        print(f"injected failures:   {report['injected_failures']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the gateway against the fake Wappi server")
+    parser.add_argument("--component", choices=["poll", "send", "voice", "all"], default="all")
+    parser.add_argument("--wappi-url", default="http://localhost:8090", help="Fake Wappi base URL")
+    parser.add_argument("--duration", type=float, default=60, help="Polling run length in seconds")
+    parser.add_argument("--messages", type=int, default=200, help="Messages to enqueue for send/voice runs")
+    parser.add_argument("--timeout", type=float, default=300, help="Max seconds to wait for send/voice runs")
+    parser.add_argument("--transcription", choices=["real", "skip"], default="skip",
+                        help="Call the configured transcription API or skip it")
+    parser.add_argument("--voice-cache", action="store_true",
+                        help="Keep the transcription cache on for the voice run (off by default; never written with --transcription skip)")
+    parser.add_argument("--real-limits", action="store_true", help="Keep the configured Wappi rate limits")
+    parser.add_argument("--queue-prefix", default="loadtest_",
+                        help="Prefix for every gateway queue name, keeps the run off the production queues")
+    parser.add_argument("--purge-queues", action="store_true",
+                        help="Empty the prefixed queues (only those) after the run")
+    parser.add_argument("--json", action="store_true", help="Print reports as JSON")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    fake = FakeWappi(args.wappi_url)
+
+    runners = {"poll": run_polling, "send": run_sender, "voice": run_voice}
+    components = list(runners) if args.component == "all" else [args.component]
+
+    reports = [runners[component](args, fake) for component in components]
+
+    if args.purge_queues:
+        purge_queues(args.queue_prefix)
+
+    if args.json:
+        from utils.metrics import metrics_registry
+        print(json.dumps({"reports": reports, "runtime": metrics_registry.snapshot()}, indent=2, default=str))
+    else:
+        for report in reports:
+            print_report(report)
+
+
+if __name__ == "__main__":
+    main()
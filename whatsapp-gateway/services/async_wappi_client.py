@@ -0,0 +1,170 @@
+"""
+Asyncio Wappi.pro API Client
+Same method surface as WappiClient, with non-blocking requests and backoff
+"""
+import asyncio
+import time
+from typing import Dict, Any, Optional
+import httpx
+from loguru import logger
+
+from services.rate_limiter import wappi_rate_limiter
+from services.circuit_breaker import wappi_circuit_breaker
+from services.wappi_client import (
+    BaseWappiClient,
+    RequestTimer,
+    http_client_options,
+    wappi_http_metrics
+)
+
+
+class AsyncWappiClient(BaseWappiClient):
+    """
+    Async client for interacting with Wappi.pro WhatsApp API
+
+    Must be used from a single event loop; the pooled httpx.AsyncClient is
+    created lazily inside that loop. The sync WappiClient stays available
+    for thread-based consumers.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Pooled keep-alive async HTTP client"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(**http_client_options())
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Make HTTP request to Wappi API with retry logic
+
+        Retries and backoff use asyncio.sleep, so the event loop keeps
+        running other requests while this one waits.
+
+        Returns:
+            Response JSON or None if failed
+        """
+        url = f"{self.base_url}{endpoint}"
+
+        for attempt in range(self.max_retries):
+            if not wappi_circuit_breaker.allow_request():
+                # Fail fast while Wappi is degraded
+                return None
+
+            started = time.perf_counter()
+            try:
+                await wappi_rate_limiter.acquire_async(endpoint)
+                timer = RequestTimer()
+                started = time.perf_counter()
+                response = await self.http.request(
+                    method=method,
+                    url=url,
+                    headers=self.headers,
+                    params=params,
+                    json=data,
+                    timeout=self.timeout,
+                    extensions={"trace": timer.atrace}
+                )
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                wappi_http_metrics.record(endpoint, timer, elapsed_ms, response.http_version)
+
+                action, value = self._handle_response(response, attempt, elapsed_ms)
+                if action == "retry":
+                    if value:
+                        await asyncio.sleep(value)
+                    continue
+                return value
+
+            except Exception as e:
+                wait = self._handle_exception(e, attempt, (time.perf_counter() - started) * 1000)
+                if wait is None:
+                    return None
+                await asyncio.sleep(wait)
+
+        return None
+
+    async def get_chats(self, limit: int = 100, offset: int = 0, show_all: bool = False) -> Optional[Dict[str, Any]]:
+        """Get list of chats from WhatsApp"""
+        return self._chats_result(await self._make_request(**self._chats_request(limit, offset, show_all)))
+
+    async def get_messages(
+        self,
+        chat_id: str,
+        limit: int = 1,
+        offset: int = 0,
+        mark_all: bool = False,
+        order: str = "desc"
+    ) -> Optional[Dict[str, Any]]:
+        """Get messages from specific chat"""
+        return await self._make_request(**self._messages_request(chat_id, limit, offset, mark_all, order))
+
+    async def send_message(self, recipient: str, body: str) -> Optional[Dict[str, Any]]:
+        """Send text message to WhatsApp contact"""
+        request = self._send_request(recipient, body)
+        if request is None:
+            return None
+
+        return self._send_result(await self._make_request(**request), recipient)
+
+    async def reply_to_message(self, message_id: str, body: str, url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Reply to specific message"""
+        request = self._reply_request(message_id, body, url)
+        if request is None:
+            return None
+
+        return self._reply_result(await self._make_request(**request), message_id)
+
+    async def mark_as_read(self, message_id: str, mark_all: bool = False) -> bool:
+        """Mark message as read"""
+        response = await self._make_request(**self._mark_read_request(message_id, mark_all))
+        return self._mark_read_result(response, message_id)
+
+    async def get_message_file(self, message_id: str) -> Optional[bytes]:
+        """Download file (voice message, image, etc.) from message"""
+        request = self._file_request(message_id)
+        if not wappi_circuit_breaker.allow_request():
+            return None
+
+        started = time.perf_counter()
+        try:
+            await wappi_rate_limiter.acquire_async(request["endpoint"])
+            url = f"{self.base_url}{request['endpoint']}"
+            timer = RequestTimer()
+            started = time.perf_counter()
+            response = await self.http.get(
+                url,
+                headers=self.headers,
+                params=request["params"],
+                timeout=self.timeout,
+                extensions={"trace": timer.atrace}
+            )
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            wappi_http_metrics.record(request["endpoint"], timer, elapsed_ms, response.http_version)
+            if response.status_code >= 500:
+                wappi_circuit_breaker.record_failure(elapsed_ms)
+            else:
+                wappi_circuit_breaker.record_success(elapsed_ms)
+
+            return self._file_result(response, message_id)
+
+        except Exception as e:
+            if isinstance(e, httpx.TransportError):
+                wappi_circuit_breaker.record_failure((time.perf_counter() - started) * 1000)
+            logger.error(f"Error downloading file: {str(e)}")
+            return None
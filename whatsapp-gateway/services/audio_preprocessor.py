@@ -0,0 +1,286 @@
+"""
+Audio Preprocessor
+Decodes voice notes to 16 kHz mono, trims silence with an energy-based VAD
+and compresses long pauses before transcription; splits long notes at pauses
+"""
+import io
+import os
+import shutil
+import threading
+from typing import Dict, Any, IO, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from services.audio_transcoder import FFmpegProcessPool
+
+SAMPLE_RATE = 16000
+
+
+def frame_energy_db(samples: np.ndarray, frame_size: int) -> np.ndarray:
+    """RMS energy of each full frame in dBFS"""
+    count = len(samples) // frame_size
+    frames = samples[:count * frame_size].astype(np.float32).reshape(count, frame_size) / 32768.0
+    return 20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10)
+
+
+def speech_frames(
+    samples: np.ndarray,
+    frame_size: int,
+    threshold_db: float,
+    margin_db: float,
+    padding_frames: int
+) -> np.ndarray:
+    """
+    Voiced/unvoiced flag per frame from frame RMS energy
+
+    The threshold adapts to the recording: `margin_db` above the noise
+    floor (10th percentile of frame energy), lowered so a note without
+    pauses does not count as silence, but never below `threshold_db`:
+    a note whose loudest frames stay under it has no speech at all.
+    Voiced regions are widened by `padding_frames` on both sides so word
+    onsets and tails survive.
+    """
+    energy_db = frame_energy_db(samples, frame_size)
+
+    noise_floor, loud = np.percentile(energy_db, [10, 95])
+    threshold = max(threshold_db, min(noise_floor + margin_db, loud - margin_db))
+    voiced = energy_db > threshold
+
+    if padding_frames:
+        voiced = np.convolve(voiced, np.ones(2 * padding_frames + 1), mode="same") > 0
+    return voiced
+
+
+def keep_mask(voiced: np.ndarray, max_pause_frames: int) -> np.ndarray:
+    """
+    Frames to keep: leading/trailing silence dropped, internal pauses
+    longer than `max_pause_frames` shortened to that length
+    """
+    count = len(voiced)
+    voiced_at = np.flatnonzero(voiced)
+    if not len(voiced_at):
+        return np.zeros(count, dtype=bool)
+
+    first, last = voiced_at[0], voiced_at[-1]
+    keep = np.zeros(count, dtype=bool)
+    keep[first:last + 1] = True
+
+    # Silent runs inside the speech: [start, end) frame ranges
+    inner = voiced[first:last + 1].astype(np.int8)
+    edges = np.diff(inner)
+    starts = np.flatnonzero(edges == -1) + 1 + first
+    ends = np.flatnonzero(edges == 1) + 1 + first
+
+    long_runs = (ends - starts) > max_pause_frames
+    if long_runs.any():
+        half = max_pause_frames // 2
+        drop = np.zeros(count + 1, dtype=np.int32)
+        np.add.at(drop, starts[long_runs] + half, 1)
+        np.add.at(drop, ends[long_runs] - (max_pause_frames - half), -1)
+        keep &= np.cumsum(drop)[:count] <= 0
+
+    return keep
+
+
+def chunk_bounds(
+    samples: np.ndarray,
+    frame_size: int,
+    max_chunk_frames: int,
+    overlap_frames: int
+) -> List[Tuple[int, int]]:
+    """
+    Sample ranges of at most `max_chunk_frames` (plus overlap) covering `samples`
+
+    Each cut is placed on the quietest frame in the second half of the
+    chunk, which is a pause whenever the speaker took one. Neighbouring
+    chunks share `overlap_frames` on both sides of the cut so a word cut
+    in the middle is heard whole by at least one of them.
+    """
+    count = len(samples) // frame_size
+    if count <= max_chunk_frames:
+        return [(0, len(samples))]
+
+    energy_db = frame_energy_db(samples, frame_size)
+    bounds = []
+    start = 0
+    while count - start > max_chunk_frames:
+        window_start = start + max_chunk_frames // 2
+        cut = window_start + int(np.argmin(energy_db[window_start:start + max_chunk_frames]))
+        bounds.append((max(0, start - overlap_frames) * frame_size, (cut + overlap_frames) * frame_size))
+        start = cut
+    bounds.append((max(0, start - overlap_frames) * frame_size, len(samples)))
+    return bounds
+
+
+class PreprocessResult:
+    """Preprocessed audio plus what was removed"""
+
+    def __init__(
+        self,
+        upload: Optional[Tuple[str, IO[bytes]]],
+        samples: np.ndarray,
+        bytes_in: int,
+        seconds_in: float,
+        seconds_out: float
+    ):
+        self.upload = upload  # None when the note has no speech
+        self.samples = samples  # trimmed 16 kHz PCM, for chunking
+        self.bytes_in = bytes_in
+        self.bytes_out = upload[1].getbuffer().nbytes if upload else 0
+        self.seconds_in = seconds_in
+        self.seconds_out = seconds_out
+
+    @property
+    def has_speech(self) -> bool:
+        return self.upload is not None
+
+    @property
+    def seconds_removed(self) -> float:
+        return self.seconds_in - self.seconds_out
+
+
+class AudioPreprocessor:
+    """
+    Downmix/resample, VAD trim and re-encode, all through ffmpeg pipes
+
+    Decoding and encoding each use a pool of warm ffmpeg processes; the
+    VAD itself is numpy over the whole sample array. Output is OGG/Opus
+    (or MP3 when `output_format` is "mp3").
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        frame_ms: int,
+        threshold_db: float,
+        margin_db: float,
+        padding_ms: int,
+        max_pause_ms: int,
+        bitrate: str,
+        output_format: str,
+        timeout: float
+    ):
+        self.frame_ms = frame_ms
+        self.frame_size = SAMPLE_RATE * frame_ms // 1000
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.padding_frames = padding_ms // frame_ms
+        self.max_pause_frames = max(1, max_pause_ms // frame_ms)
+        self.filename = f"voice.{output_format}"
+        self.timeout = timeout
+        self.available = shutil.which("ffmpeg") is not None
+
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.no_speech = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds_in = 0.0
+        self.seconds_out = 0.0
+
+        self.decoders: Optional[FFmpegProcessPool] = None
+        self.encoders: Optional[FFmpegProcessPool] = None
+        if not self.available:
+            logger.warning("ffmpeg not found, voice preprocessing disabled")
+            return
+
+        codec = ["-c:a", "libmp3lame", "-f", "mp3"] if output_format == "mp3" else ["-c:a", "libopus", "-f", "ogg"]
+        self.decoders = FFmpegProcessPool(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-i", "pipe:0",
+                "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"
+            ],
+            pool_size
+        )
+        self.encoders = FFmpegProcessPool(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "pipe:0",
+                "-b:a", bitrate, *codec, "pipe:1"
+            ],
+            pool_size
+        )
+
+    def process(self, audio_file: IO[bytes]) -> Optional[PreprocessResult]:
+        """
+        Convert to 16 kHz mono and cut silence
+
+        Args:
+            audio_file: Downloaded audio (any container ffmpeg can probe)
+
+        Returns:
+            Re-encoded audio with sizes and durations (no upload if the note
+            has no speech), or None if ffmpeg failed (callers then send the
+            original audio)
+        """
+        if not self.available:
+            return None
+
+        # Streamed from the spooled download into ffmpeg, not copied into memory first
+        size = audio_file.seek(0, os.SEEK_END)
+        audio_file.seek(0)
+        pcm = self.decoders.pipe(audio_file, self.timeout)
+        audio_file.seek(0)
+        if not pcm:
+            with self.lock:
+                self.failed += 1
+            return None
+
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        seconds_in = len(samples) / SAMPLE_RATE
+
+        trimmed = samples
+        if len(samples) >= self.frame_size:
+            voiced = speech_frames(samples, self.frame_size, self.threshold_db, self.margin_db, self.padding_frames)
+            keep = keep_mask(voiced, self.max_pause_frames)
+            if not keep.any():
+                # Silence or only noise under threshold_db: nothing worth a transcription call
+                with self.lock:
+                    self.processed += 1
+                    self.no_speech += 1
+                    self.bytes_in += size
+                    self.seconds_in += seconds_in
+                return PreprocessResult(None, samples[:0], size, seconds_in, 0.0)
+            trimmed = samples[:len(keep) * self.frame_size][np.repeat(keep, self.frame_size)]
+
+        encoded = self.encode(trimmed)
+        if not encoded:
+            with self.lock:
+                self.failed += 1
+            return None
+
+        result = PreprocessResult(
+            (self.filename, encoded),
+            trimmed,
+            size,
+            seconds_in,
+            len(trimmed) / SAMPLE_RATE
+        )
+        with self.lock:
+            self.processed += 1
+            self.bytes_in += result.bytes_in
+            self.bytes_out += result.bytes_out
+            self.seconds_in += result.seconds_in
+            self.seconds_out += result.seconds_out
+        return result
+
+    def encode(self, samples: np.ndarray) -> Optional[io.BytesIO]:
+        """Encode 16 kHz mono PCM to the output format (None if ffmpeg failed)"""
+        encoded = self.encoders.pipe(memoryview(np.ascontiguousarray(samples)).cast("B"), self.timeout)
+        return io.BytesIO(encoded) if encoded else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "ffmpeg_available": self.available,
+                "processed": self.processed,
+                "no_speech": self.no_speech,
+                "failed": self.failed,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "seconds_in": round(self.seconds_in, 1),
+                "seconds_removed": round(self.seconds_in - self.seconds_out, 1),
+                "removed_ratio": round(1 - self.seconds_out / self.seconds_in, 4) if self.seconds_in else None
+            }
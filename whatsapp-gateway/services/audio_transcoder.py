@@ -0,0 +1,250 @@
+"""
+Audio Transcoder
+In-memory ffmpeg transcoding through stdin/stdout pipes, with pre-spawned processes
+"""
+import atexit
+import io
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, IO, List, Optional, Union
+from loguru import logger
+
+from utils.metrics import metrics_registry
+
+
+class FFmpegProcessPool:
+    """
+    Warm ffmpeg processes waiting on stdin
+
+    An ffmpeg process converts exactly one input stream, so a process cannot
+    be reused for the next file. Instead `size` processes are started ahead
+    of time and every process taken is replaced from a background thread,
+    which keeps process startup off the transcoding path.
+    """
+
+    def __init__(self, args: List[str], size: int):
+        self.args = args
+        self.size = max(0, size)
+        self.idle: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.warm_starts = 0
+        self.cold_starts = 0
+        self.closed = False
+
+        for _ in range(self.size):
+            self.idle.put(self._spawn())
+        atexit.register(self.close)
+
+    def _spawn(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            self.args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+    def _refill(self) -> None:
+        if not self.closed:
+            self.idle.put(self._spawn())
+
+    def acquire(self) -> subprocess.Popen:
+        """Take a warm process (spawning one inline if none is ready) and start its replacement"""
+        while True:
+            try:
+                process = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    self.cold_starts += 1
+                return self._spawn()
+
+            if process.poll() is None:
+                with self.lock:
+                    self.warm_starts += 1
+                threading.Thread(target=self._refill, name="ffmpeg-refill", daemon=True).start()
+                return process
+
+            # Died while idle (e.g. killed by the OS); replace it and try the next one
+            self._refill()
+
+    def pipe(self, source: Union[bytes, memoryview, IO[bytes]], timeout: float) -> Optional[bytes]:
+        """
+        Feed `source` to a warm process and return its stdout (None on error or timeout)
+
+        A file object is streamed into stdin in chunks from a writer thread
+        (never read into memory whole) while this thread drains stdout and
+        another drains stderr, so large files cannot deadlock on full pipes.
+        """
+        process = self.acquire()
+        errors: List[bytes] = []
+        timed_out = threading.Event()
+
+        def feed() -> None:
+            try:
+                if isinstance(source, (bytes, memoryview)):
+                    process.stdin.write(source)
+                else:
+                    shutil.copyfileobj(source, process.stdin)
+            except OSError:
+                pass  # ffmpeg exited early (bad input or killed); stderr/returncode say why
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        def expire() -> None:
+            timed_out.set()
+            process.kill()
+
+        writer = threading.Thread(target=feed, name="ffmpeg-stdin", daemon=True)
+        reader = threading.Thread(target=lambda: errors.append(process.stderr.read()), name="ffmpeg-stderr", daemon=True)
+        killer = threading.Timer(timeout, expire)
+        writer.start()
+        reader.start()
+        killer.start()
+        try:
+            output = process.stdout.read()
+            process.wait()
+        finally:
+            killer.cancel()
+            writer.join()
+            reader.join()
+            process.stdout.close()
+            process.stderr.close()
+
+        if timed_out.is_set():
+            logger.error(f"ffmpeg timed out after {timeout:.0f}s")
+            return None
+
+        if process.returncode != 0 or not output:
+            message = errors[0].decode(errors="replace").strip()[:300] if errors else ""
+            logger.error(f"ffmpeg failed: {message}")
+            return None
+
+        return output
+
+    def close(self) -> None:
+        """Kill idle processes"""
+        self.closed = True
+        while True:
+            try:
+                process = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            process.kill()
+            process.wait()
+
+
+class AudioTranscoder:
+    """Converts voice notes to MP3 fully in memory (no temp files)"""
+
+    def __init__(self, pool_size: int, bitrate: str, timeout: float):
+        self.timeout = timeout
+        self.available = shutil.which("ffmpeg") is not None
+        self.pool: Optional[FFmpegProcessPool] = None
+
+        self.lock = threading.Lock()
+        self.transcoded = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        if self.available:
+            self.pool = FFmpegProcessPool(
+                [
+                    "ffmpeg", "-hide_banner", "-loglevel", "error",
+                    "-i", "pipe:0",
+                    "-vn", "-ac", "1", "-c:a", "libmp3lame", "-b:a", bitrate,
+                    "-f", "mp3", "pipe:1"
+                ],
+                pool_size
+            )
+        else:
+            logger.warning("ffmpeg not found, voice notes can only be sent to transcription as OGG")
+
+    def to_mp3(self, audio_file: IO[bytes]) -> Optional[io.BytesIO]:
+        """
+        Pipe audio through ffmpeg and return the MP3 bytes
+
+        Args:
+            audio_file: Downloaded audio (any container ffmpeg can probe)
+
+        Returns:
+            In-memory MP3 or None if ffmpeg is missing or the conversion failed
+        """
+        if not self.pool:
+            return None
+
+        size = audio_file.seek(0, os.SEEK_END)
+        audio_file.seek(0)
+        output = self.pool.pipe(audio_file, self.timeout)
+        audio_file.seek(0)
+        if not output:
+            with self.lock:
+                self.failed += 1
+            return None
+
+        with self.lock:
+            self.transcoded += 1
+            self.bytes_in += size
+            self.bytes_out += len(output)
+        return io.BytesIO(output)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "ffmpeg_available": self.available,
+                "warm_processes": self.pool.idle.qsize() if self.pool else 0,
+                "warm_starts": self.pool.warm_starts if self.pool else 0,
+                "cold_starts": self.pool.cold_starts if self.pool else 0,
+                "transcoded": self.transcoded,
+                "failed": self.failed,
+                "avg_bytes_in": round(self.bytes_in / self.transcoded) if self.transcoded else 0,
+                "avg_bytes_out": round(self.bytes_out / self.transcoded) if self.transcoded else 0
+            }
+
+
+class VoiceStageMetrics:
+    """Per-stage timings of the voice pipeline (download, preprocess, transcode, upload, transcribe)"""
+
+    STAGES = ("download", "preprocess", "transcode", "upload", "transcribe", "total")
+
+    def __init__(self, window: int = 200):
+        self.lock = threading.Lock()
+        self.samples = {stage: deque(maxlen=window) for stage in self.STAGES}
+        self.counts = {stage: 0 for stage in self.STAGES}
+        self.passthrough = 0
+
+    def record(self, stage: str, started: float) -> None:
+        """Record a stage that began at `started` (time.perf_counter())"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.samples[stage].append(elapsed_ms)
+            self.counts[stage] += 1
+
+    def record_passthrough(self) -> None:
+        """Count a note uploaded as OGG without transcoding"""
+        with self.lock:
+            self.passthrough += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stages = {}
+            for stage, samples in self.samples.items():
+                ordered = sorted(samples)
+                stages[stage] = {
+                    "count": self.counts[stage],
+                    "avg_ms": round(sum(ordered) / len(ordered), 1) if ordered else 0.0,
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 1) if ordered else 0.0
+                }
+            return {"stages": stages, "ogg_passthrough": self.passthrough}
+
+
+# Global stage timings for the voice service
+voice_stage_metrics = VoiceStageMetrics()
+metrics_registry.register("voice_pipeline", voice_stage_metrics.stats)
@@ -0,0 +1,141 @@
+"""
+Chat Cursor Store
+Per-chat high-water mark so the poller can skip dialogs that have not changed
+"""
+from typing import Dict, Any, Optional, Set
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import func
+from loguru import logger
+
+from models.chat_cursor import ChatCursor
+
+
+class ChatCursorStore:
+    """In-memory chat cursors, persisted to the gateway DB once per poll cycle"""
+
+    def __init__(self):
+        # chat_id -> {"message_id": str | None, "message_time": int | None}
+        self.cursors: Dict[str, Dict[str, Any]] = {}
+        self.dirty: Set[str] = set()
+
+    def dialog_head(self, dialog: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract newest message id/time from a get_chats dialog summary"""
+        last_message = dialog.get("last_message_data") or dialog.get("last_message") or {}
+        if not isinstance(last_message, dict):
+            last_message = {}
+
+        message_time = last_message.get("time") or dialog.get("last_time") or dialog.get("timestamp")
+        try:
+            message_time = int(message_time) if message_time else None
+        except (TypeError, ValueError):
+            message_time = None
+
+        return {"message_id": last_message.get("id"), "message_time": message_time}
+
+    def message_cursor(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a cursor from a raw Wappi message"""
+        message_time = message.get("time")
+        try:
+            message_time = int(message_time) if message_time else None
+        except (TypeError, ValueError):
+            message_time = None
+
+        return {"message_id": message.get("id"), "message_time": message_time}
+
+    def get(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """Get the cursor for a chat"""
+        return self.cursors.get(chat_id)
+
+    def is_unchanged(self, dialog: Dict[str, Any]) -> bool:
+        """
+        Check whether a dialog's newest message matches the stored cursor
+
+        Returns False when there is no cursor or the summary has nothing to compare,
+        so unknown dialogs are always fetched
+        """
+        cursor = self.cursors.get(dialog.get("id"))
+        if not cursor:
+            return False
+
+        head = self.dialog_head(dialog)
+        if head["message_id"] and cursor["message_id"]:
+            return head["message_id"] == cursor["message_id"]
+        if head["message_time"] and cursor["message_time"]:
+            return head["message_time"] <= cursor["message_time"]
+
+        return False
+
+    def is_at_or_before(self, chat_id: str, message: Dict[str, Any]) -> bool:
+        """Check whether a message is the cursor message or older than it"""
+        cursor = self.cursors.get(chat_id)
+        if not cursor:
+            return False
+
+        if cursor["message_id"] and message.get("id") == cursor["message_id"]:
+            return True
+
+        message_time = self.message_cursor(message)["message_time"]
+        # Strictly older only: several messages can share the same second
+        return bool(message_time and cursor["message_time"] and message_time < cursor["message_time"])
+
+    def advance(self, chat_id: str, cursor: Dict[str, Any]) -> None:
+        """Move the chat cursor forward (never backwards)"""
+        if not cursor["message_id"] and not cursor["message_time"]:
+            return
+
+        current = self.cursors.get(chat_id)
+        if current and current["message_id"] == cursor["message_id"]:
+            return
+        if current and current["message_time"] and cursor["message_time"] and cursor["message_time"] < current["message_time"]:
+            return
+
+        self.cursors[chat_id] = cursor
+        self.dirty.add(chat_id)
+
+    def load(self, db: Session) -> None:
+        """Load all cursors from the database"""
+        try:
+            rows = db.query(ChatCursor).all()
+            self.cursors = {
+                row.chat_id: {"message_id": row.last_message_id, "message_time": row.last_message_time}
+                for row in rows
+            }
+            self.dirty.clear()
+            logger.info(f"Loaded {len(self.cursors)} chat cursors")
+        except Exception as e:
+            logger.error(f"Failed to load chat cursors: {e}")
+            db.rollback()
+
+    def flush(self, db: Session) -> None:
+        """Persist changed cursors in a single upsert"""
+        if not self.dirty:
+            return
+
+        rows = [
+            {
+                "chat_id": chat_id,
+                "last_message_id": self.cursors[chat_id]["message_id"],
+                "last_message_time": self.cursors[chat_id]["message_time"]
+            }
+            for chat_id in self.dirty
+        ]
+
+        try:
+            stmt = insert(ChatCursor).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ChatCursor.chat_id],
+                set_={
+                    "last_message_id": stmt.excluded.last_message_id,
+                    "last_message_time": stmt.excluded.last_message_time,
+                    "updated_at": func.now()
+                }
+            )
+            db.execute(stmt)
+            db.commit()
+            self.dirty.clear()
+            logger.debug(f"Persisted {len(rows)} chat cursors")
+        except Exception as e:
+            # Keep cursors dirty and retry on the next cycle
+            logger.error(f"Failed to persist chat cursors: {e}")
+            db.rollback()
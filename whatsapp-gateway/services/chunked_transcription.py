@@ -0,0 +1,128 @@
+"""
+Chunked Transcription
+Splits long voice notes at pauses, transcribes the chunks concurrently and
+stitches the text back in order
+"""
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from services.audio_preprocessor import AudioPreprocessor, SAMPLE_RATE, chunk_bounds
+from services.transcription_backends import TranscriptionRouter
+
+WORD = re.compile(r"\w+")
+
+
+def stitch(texts: List[str], max_overlap_words: int = 8) -> str:
+    """
+    Join chunk transcripts, dropping words repeated across a boundary
+
+    The audio overlap means the last words of one chunk are often the first
+    words of the next; the longest such run (compared case- and
+    punctuation-insensitively) is removed from the start of the later chunk.
+    """
+    words: List[str] = []
+    for text in texts:
+        following = text.split()
+        limit = min(max_overlap_words, len(words), len(following))
+        for size in range(limit, 0, -1):
+            tail = [WORD.findall(word.lower()) for word in words[-size:]]
+            head = [WORD.findall(word.lower()) for word in following[:size]]
+            if tail == head:
+                following = following[size:]
+                break
+        words.extend(following)
+    return " ".join(words)
+
+
+class ChunkedTranscriber:
+    """
+    Parallel transcription of long notes on remote backends
+
+    Notes longer than `threshold_seconds` are cut into chunks of at most
+    `chunk_seconds` (see chunk_bounds), each chunk is encoded and sent to the
+    routed backend on its own thread, and the transcripts are stitched in
+    order. The local model is never chunked: it is CPU-bound and already
+    batches a clip's windows itself.
+    """
+
+    def __init__(
+        self,
+        preprocessor: AudioPreprocessor,
+        router: TranscriptionRouter,
+        workers: int,
+        threshold_seconds: float,
+        chunk_seconds: float,
+        overlap_ms: int
+    ):
+        self.preprocessor = preprocessor
+        self.router = router
+        self.threshold_seconds = threshold_seconds
+        self.max_chunk_frames = max(2, int(chunk_seconds * 1000) // preprocessor.frame_ms)
+        self.overlap_frames = overlap_ms // preprocessor.frame_ms
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="voice-chunk")
+
+        self.lock = threading.Lock()
+        self.notes = 0
+        self.chunks = 0
+        self.failed = 0
+        self.wall_ms: deque = deque(maxlen=200)
+
+    def should_chunk(self, backend: Optional[str], samples: Optional[np.ndarray]) -> bool:
+        return (
+            samples is not None
+            and backend not in (None, "local")
+            and len(samples) / SAMPLE_RATE > self.threshold_seconds
+        )
+
+    def transcribe_chunk(self, backend: str, chunk: np.ndarray) -> Tuple[Optional[str], Optional[str]]:
+        encoded = self.preprocessor.encode(chunk)
+        if not encoded:
+            return None, None
+        return self.router.transcribe(backend, encoded, (self.preprocessor.filename, encoded))
+
+    def transcribe(self, backend: str, samples: np.ndarray) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Transcribe a long note as concurrent chunks
+
+        Args:
+            backend: Routed remote backend (others are the per-chunk fallback)
+            samples: Trimmed 16 kHz mono PCM of the whole note
+
+        Returns:
+            (stitched transcription, backend of the first chunk) or (None, None)
+            if any chunk failed, so the caller can fall back to one request
+        """
+        started = time.perf_counter()
+        bounds = chunk_bounds(samples, self.preprocessor.frame_size, self.max_chunk_frames, self.overlap_frames)
+        futures = [self.executor.submit(self.transcribe_chunk, backend, samples[start:end]) for start, end in bounds]
+        results = [future.result() for future in futures]
+
+        if not all(text for text, _ in results):
+            with self.lock:
+                self.failed += 1
+            logger.warning(f"{sum(1 for text, _ in results if not text)}/{len(bounds)} voice chunks failed")
+            return None, None
+
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.notes += 1
+            self.chunks += len(bounds)
+            self.wall_ms.append(elapsed * 1000)
+        logger.info(f"✂️  Transcribed {len(samples) / SAMPLE_RATE:.0f}s note as {len(bounds)} chunks in {elapsed:.1f}s")
+        return stitch([text for text, _ in results]), results[0][1]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "threshold_seconds": self.threshold_seconds,
+                "notes": self.notes,
+                "failed": self.failed,
+                "avg_chunks": round(self.chunks / self.notes, 1) if self.notes else 0.0,
+                "avg_wall_ms": round(sum(self.wall_ms) / len(self.wall_ms), 1) if self.wall_ms else 0.0
+            }
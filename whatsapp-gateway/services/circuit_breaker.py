@@ -0,0 +1,192 @@
+"""
+Circuit Breaker
+Fails Wappi calls fast while the API is erroring or too slow
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Any
+from loguru import logger
+
+from config.settings import settings
+from utils.metrics import metrics_registry
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker over a sliding window of recent calls
+
+    - closed: calls pass; once `min_calls` outcomes are in the window and the
+      failure rate or slow-call rate reaches its threshold, the breaker opens
+    - open: calls are rejected without touching the network for `open_seconds`
+    - half-open: up to `half_open_calls` probe calls pass; all succeeding
+      closes the breaker, any failure opens it again. A probe round that has
+      not finished after `open_seconds` (an admitted call never reported its
+      outcome) is restarted, so a lost probe cannot hold the breaker shut
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_ms: float = 10000,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 30,
+        half_open_calls: int = 3
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+
+        self.state = self.CLOSED
+        self.window = deque(maxlen=window_size)  # (failed, slow) per call
+        self.opened_at = 0.0
+        self.half_opened_at = 0.0
+        self.probes_admitted = 0
+        self.probes_succeeded = 0
+        self.lock = threading.Lock()
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _transition(self, state: str) -> None:
+        previous = self.state
+        self.state = state
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            logger.error(f"🔌 Circuit {self.name}: {previous} -> open for {self.open_seconds}s")
+        elif state == self.HALF_OPEN:
+            self.half_opened_at = time.monotonic()
+            self.probes_admitted = 0
+            self.probes_succeeded = 0
+            logger.warning(f"🔌 Circuit {self.name}: open -> half_open, probing")
+        else:
+            self.window.clear()
+            logger.success(f"🔌 Circuit {self.name}: {previous} -> closed")
+
+    def _expire_probes(self) -> None:
+        """Restart a half-open round whose probes are all out but unresolved (call with the lock held)"""
+        if (
+            self.state == self.HALF_OPEN
+            and self.probes_admitted >= self.half_open_calls
+            and time.monotonic() - self.half_opened_at >= self.open_seconds
+        ):
+            logger.warning(f"🔌 Circuit {self.name}: half-open probes unresolved after {self.open_seconds}s, probing again")
+            self.half_opened_at = time.monotonic()
+            self.probes_admitted = 0
+            self.probes_succeeded = 0
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now (admits half-open probes)"""
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._transition(self.HALF_OPEN)
+
+            self._expire_probes()
+            if self.state == self.HALF_OPEN:
+                if self.probes_admitted >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self.probes_admitted += 1
+
+            return True
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (does not admit probes)"""
+        with self.lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at < self.open_seconds
+            self._expire_probes()
+            if self.state == self.HALF_OPEN:
+                return self.probes_admitted >= self.half_open_calls
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets probe calls through"""
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self, duration_ms: float) -> None:
+        """Record a call that got a non-5xx response"""
+        self._record(False, duration_ms)
+
+    def record_failure(self, duration_ms: float) -> None:
+        """Record a 5xx, timeout or connection error"""
+        self._record(True, duration_ms)
+
+    def _record(self, failed: bool, duration_ms: float) -> None:
+        slow = duration_ms >= self.slow_call_ms
+
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                if failed or slow:
+                    self._transition(self.OPEN)
+                    return
+                self.probes_succeeded += 1
+                if self.probes_succeeded >= self.half_open_calls:
+                    self._transition(self.CLOSED)
+                return
+
+            if self.state == self.OPEN:
+                # Late result of a call admitted before the breaker opened
+                return
+
+            self.window.append((failed, slow))
+            calls = len(self.window)
+            if calls < self.min_calls:
+                return
+
+            failures = sum(1 for f, _ in self.window if f)
+            slow_calls = sum(1 for _, s in self.window if s)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._transition(self.OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state and current window rates"""
+        with self.lock:
+            calls = len(self.window)
+            failures = sum(1 for f, _ in self.window if f)
+            slow_calls = sum(1 for _, s in self.window if s)
+            retry_in = (
+                max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+                if self.state == self.OPEN else 0.0
+            )
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "slow_call_rate": round(slow_calls / calls, 3) if calls else 0.0,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected,
+                "retry_in_seconds": round(retry_in, 1)
+            }
+
+
+# Global breaker shared by every Wappi client in the process
+wappi_circuit_breaker = CircuitBreaker(
+    "wappi",
+    window_size=settings.WAPPI_CB_WINDOW,
+    min_calls=settings.WAPPI_CB_MIN_CALLS,
+    failure_rate=settings.WAPPI_CB_FAILURE_RATE,
+    slow_call_ms=settings.WAPPI_CB_SLOW_CALL_MS,
+    slow_call_rate=settings.WAPPI_CB_SLOW_CALL_RATE,
+    open_seconds=settings.WAPPI_CB_OPEN_SECONDS,
+    half_open_calls=settings.WAPPI_CB_HALF_OPEN_CALLS
+)
+metrics_registry.register("wappi_circuit_breaker", wappi_circuit_breaker.stats)
@@ -0,0 +1,170 @@
+"""
+Tiered Dialog Scheduler
+Decides which chats the poller lists and fetches each cycle
+"""
+import heapq
+import time
+from typing import Dict, Any, List, Tuple
+
+
+class TieredDialogScheduler:
+    """
+    Hot/warm/cold chat polling over a rotating window of the full dialog list
+
+    Listing: every cycle gets the head page of get_chats (most recent activity)
+    plus one sweep page whose offset rotates through the whole list.
+
+    Fetching: a chat listed this cycle has a fresh summary, so the cursor
+    decides if it needs messages/get. Chats not listed this cycle are fetched
+    by tier: hot every cycle, warm every `warm_every` cycles, cold only when
+    they exceed `max_staleness`. Due chats are ordered by a priority queue
+    (overdue first, then most recent activity).
+    """
+
+    def __init__(
+        self,
+        page_size: int,
+        hot_seconds: int,
+        warm_seconds: int,
+        warm_every: int,
+        max_staleness: int
+    ):
+        self.page_size = page_size
+        self.hot_seconds = hot_seconds
+        self.warm_seconds = warm_seconds
+        self.warm_every = max(1, warm_every)
+        self.max_staleness = max_staleness
+
+        # chat_id -> {"dialog", "last_activity", "last_polled_at", "last_polled_cycle"}
+        self.chats: Dict[str, Dict[str, Any]] = {}
+        self.listed: set = set()
+        self.cycle = 0
+        self.sweep_offset = 0
+        self.sweeps_completed = 0
+
+    def start_cycle(self) -> List[int]:
+        """Begin a new cycle and return the get_chats offsets to list"""
+        self.cycle += 1
+        self.listed = set()
+        offsets = [0]
+        if self.sweep_offset > 0:
+            offsets.append(self.sweep_offset)
+        return offsets
+
+    def observe_listing(self, offset: int, dialogs: List[Dict[str, Any]], activity: Dict[str, int]) -> None:
+        """
+        Record a listed page of dialogs
+
+        Args:
+            offset: Offset the page was requested with
+            dialogs: Dialogs returned by get_chats
+            activity: chat_id -> last activity unix time from the dialog summaries
+        """
+        for dialog in dialogs:
+            chat_id = dialog.get("id") if isinstance(dialog, dict) else None
+            if not chat_id:
+                continue
+
+            state = self.chats.setdefault(chat_id, {
+                "last_activity": 0,
+                "last_polled_at": 0.0,
+                "last_polled_cycle": 0
+            })
+            state["dialog"] = dialog
+            state["last_activity"] = max(state["last_activity"], activity.get(chat_id) or 0)
+            self.listed.add(chat_id)
+
+        if len(dialogs) > self.page_size:
+            # Wappi ignored the limit and returned the full list: nothing left to sweep
+            self.sweep_offset = 0
+            return
+
+        # Advance the sweep window on its own page; wrap at the end of the list
+        if offset != self.sweep_offset:
+            return
+
+        if len(dialogs) < self.page_size:
+            if self.sweep_offset > 0:
+                self.sweeps_completed += 1
+            self.sweep_offset = 0
+        else:
+            self.sweep_offset = offset + self.page_size
+
+    def tier(self, state: Dict[str, Any], now: float) -> str:
+        """Classify a chat by its last activity"""
+        idle = now - state["last_activity"]
+        if idle <= self.hot_seconds:
+            return "hot"
+        if idle <= self.warm_seconds:
+            return "warm"
+        return "cold"
+
+    def select(self, now: float = None) -> List[Tuple[Dict[str, Any], bool]]:
+        """
+        Chats to consider this cycle, highest priority first
+
+        Returns:
+            (dialog, listed_this_cycle) pairs; listed dialogs carry a fresh summary
+        """
+        now = now or time.time()
+        wall_now = time.monotonic()
+        heap = []
+
+        for chat_id, state in self.chats.items():
+            listed = chat_id in self.listed
+            staleness = wall_now - state["last_polled_at"] if state["last_polled_at"] else float("inf")
+            overdue = staleness >= self.max_staleness
+            cycles_since = self.cycle - state["last_polled_cycle"]
+            tier = self.tier(state, now)
+
+            due = (
+                listed
+                or overdue
+                or tier == "hot"
+                or (tier == "warm" and cycles_since >= self.warm_every)
+            )
+            if not due:
+                continue
+
+            priority = (0 if overdue else 1, -state["last_activity"])
+            heapq.heappush(heap, (priority, chat_id))
+
+        selected = []
+        while heap:
+            _, chat_id = heapq.heappop(heap)
+            selected.append((self.chats[chat_id]["dialog"], chat_id in self.listed))
+        return selected
+
+    def mark_polled(self, chat_id: str) -> None:
+        """Record that a chat was verified up to date this cycle"""
+        state = self.chats.get(chat_id)
+        if state:
+            state["last_polled_at"] = time.monotonic()
+            state["last_polled_cycle"] = self.cycle
+
+    def record_activity(self, chat_id: str, message_time: int) -> None:
+        """Bump a chat's last activity after new messages were found"""
+        state = self.chats.get(chat_id)
+        if state and message_time:
+            state["last_activity"] = max(state["last_activity"], message_time)
+
+    def stats(self) -> Dict[str, Any]:
+        """Tier sizes and sweep progress"""
+        now = time.time()
+        wall_now = time.monotonic()
+        tiers = {"hot": 0, "warm": 0, "cold": 0}
+        max_staleness_seen = 0.0
+        for state in self.chats.values():
+            tiers[self.tier(state, now)] += 1
+            if state["last_polled_at"]:
+                max_staleness_seen = max(max_staleness_seen, wall_now - state["last_polled_at"])
+
+        return {
+            "known_chats": len(self.chats),
+            "tiers": tiers,
+            "cycle": self.cycle,
+            "sweep_offset": self.sweep_offset,
+            "sweeps_completed": self.sweeps_completed,
+            "max_staleness_seconds": self.max_staleness,
+            "current_max_staleness_seconds": round(max_staleness_seen, 1)
+        }
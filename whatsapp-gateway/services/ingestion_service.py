@@ -0,0 +1,208 @@
+"""
+Message Ingestion Service
+Normalizes Wappi message payloads and routes them to RabbitMQ queues.
+Shared by the polling service and the webhook receiver.
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Set
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from loguru import logger
+
+from config.queue import QueueManager, queue_manager as default_queue_manager
+from config.settings import settings
+from models.message_log import MessageLog
+from services.seen_cache import seen_message_cache
+from services.whitelist_cache import whitelist_cache
+
+
+class MessageIngestionService:
+    """Normalize, deduplicate, persist and publish incoming WhatsApp messages"""
+
+    def __init__(self, queue_manager: Optional[QueueManager] = None):
+        self.queue_manager = queue_manager or default_queue_manager
+        self.publish_lock = threading.Lock()  # webhook requests publish from several threadpool threads
+
+    def extract_phone_from_chat_id(self, chat_id: str) -> str:
+        """Extract phone number from chat_id"""
+        # Remove @c.us or @g.us suffix
+        return chat_id.replace("@c.us", "").replace("@g.us", "")
+
+    def is_in_whitelist(self, phone_number: str) -> bool:
+        """Check if phone number is in whitelist (in-memory cache)"""
+        # Remove @c.us suffix if present
+        clean_phone = phone_number.replace("@c.us", "")
+
+        return whitelist_cache.contains(clean_phone)
+
+    def find_processed_ids(self, message_ids: List[str], db: Session) -> Set[str]:
+        """
+        Return the subset of message ids already in the log
+
+        The seen-message cache answers most ids in memory; only ids it is
+        uncertain about go to the database, in a single IN query
+        """
+        seen, _, uncertain = seen_message_cache.classify(message_ids)
+        if not uncertain:
+            return seen
+
+        rows = db.query(MessageLog.message_id).filter(
+            MessageLog.message_id.in_(uncertain)
+        ).all()
+
+        found = {row[0] for row in rows}
+        seen_message_cache.add(found)
+        return seen | found
+
+    def describe_message_body(self, message_text: Any, message_type: str) -> str:
+        """Convert a Wappi message body into display text (media bodies are dicts)"""
+        if not isinstance(message_text, dict):
+            return message_text or ""
+
+        # For media messages, extract meaningful text description
+        if "title" in message_text:
+            # PDF or document with title
+            return f"[{message_text.get('mimetype', 'document')}] {message_text.get('title', 'untitled')}"
+        elif "PTT" in message_text or message_type in ["ptt", "audio"]:
+            # Voice message
+            return "[Voice message]"
+        elif "vcard" in message_text:
+            # Contact card
+            return f"[Contact] {message_text.get('display_name', 'unknown')}"
+        elif "buttonText" in message_text:
+            # Interactive message
+            return f"[Interactive] {message_text.get('buttonText', 'button message')}"
+        elif "URL" in message_text or "url" in message_text:
+            # Image, video or other media with URL
+            mimetype = message_text.get("mimetype", "media")
+            return f"[{mimetype}]"
+        else:
+            # Generic media message
+            return f"[Media: {message_type}]"
+
+    def build_message_data(
+        self,
+        message: Dict[str, Any],
+        chat_id: str,
+        contact_info: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the queue payload for a single Wappi message
+
+        Args:
+            message: Raw message from Wappi (messages/get or webhook)
+            chat_id: Chat ID the message belongs to
+            contact_info: Contact block from the dialog summary
+
+        Returns:
+            Normalized message data published to RabbitMQ
+        """
+        if not contact_info or not isinstance(contact_info, dict):
+            contact_info = {}
+
+        phone_number = self.extract_phone_from_chat_id(chat_id)
+        message_type = message.get("type", "chat")
+        message_text = self.describe_message_body(message.get("body", ""), message_type)
+        timestamp = message.get("time") or int(datetime.now().timestamp())
+
+        return {
+            "message_id": message.get("id"),
+            "chat_id": chat_id,
+            "phone_number": phone_number,
+            "sender_name": contact_info.get("FirstName", ""),
+            "message_text": message_text,
+            "is_voice": message_type in ["ptt", "audio"],
+            "timestamp": datetime.fromtimestamp(int(timestamp)).isoformat(),
+            "contact_info": {
+                "FirstName": contact_info.get("FirstName", ""),
+                "FullName": contact_info.get("FullName", ""),
+                "PushName": contact_info.get("PushName", ""),
+                "BusinessName": contact_info.get("BusinessName", "")
+            }
+        }
+
+    def save_messages(self, messages_data: List[Dict[str, Any]], db: Session) -> Set[str]:
+        """
+        Save incoming messages to the log in one transaction
+
+        Uses INSERT ... ON CONFLICT (message_id) DO NOTHING so concurrent writers
+        (poller and webhook) cannot double-insert.
+
+        Returns:
+            Message ids that were actually inserted
+
+        Raises:
+            Exception: database errors are re-raised after rollback
+        """
+        rows = []
+        seen = set()
+        for message_data in messages_data:
+            message_id = message_data["message_id"]
+            if not message_id or message_id in seen:
+                continue
+            seen.add(message_id)
+            rows.append({
+                "message_id": message_id,
+                "phone_number": message_data["phone_number"],
+                "direction": "incoming",
+                "message_text": message_data["message_text"],
+                "is_voice": message_data["is_voice"],
+                "queue_status": "queued",
+                "wappi_status": "received"
+            })
+
+        if not rows:
+            return set()
+
+        try:
+            stmt = insert(MessageLog).values(rows).on_conflict_do_nothing(
+                index_elements=[MessageLog.message_id]
+            ).returning(MessageLog.message_id)
+            inserted = {row[0] for row in db.execute(stmt)}
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to save messages to database: {e}")
+            db.rollback()
+            raise
+
+        # Inserted or conflicting, every id is now in the log
+        seen_message_cache.add(row["message_id"] for row in rows)
+
+        if inserted:
+            logger.success(f"💾 Saved {len(inserted)} new messages ({len(rows) - len(inserted)} duplicates)")
+        return inserted
+
+    def publish_message(self, message_data: Dict[str, Any]) -> bool:
+        """Route message to the voice transcription or AI queue"""
+        queue_name = settings.QUEUE_VOICE_TRANSCRIPTION if message_data["is_voice"] else settings.QUEUE_INCOMING_MESSAGES
+        # pika connections are not thread-safe
+        with self.publish_lock:
+            published = self.queue_manager.publish(queue_name, message_data)
+
+        if message_data["is_voice"]:
+            logger.info(f"📢 Published voice message to transcription queue")
+        else:
+            logger.info(f"📢 Published text message to AI queue")
+
+        return published
+
+    def ingest(self, messages_data: List[Dict[str, Any]], db: Session) -> List[Dict[str, Any]]:
+        """
+        Save and publish normalized messages
+
+        Only rows that were actually inserted are published, in input order.
+
+        Returns:
+            Messages that were new and have been published
+        """
+        inserted = self.save_messages(messages_data, db)
+
+        published = []
+        for message_data in messages_data:
+            if message_data["message_id"] in inserted:
+                inserted.discard(message_data["message_id"])
+                self.publish_message(message_data)
+                published.append(message_data)
+
+        return published
@@ -0,0 +1,271 @@
+"""
+Message Log Writer
+Write-behind buffer that persists outgoing message status rows in bulk
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from loguru import logger
+
+from config.database import SessionLocal
+from config.settings import settings
+from models.message_log import MessageLog
+from utils.metrics import metrics_registry
+
+Row = Tuple[str, str, Dict[str, Any]]  # ("outgoing" | "replied", message_id, row or status change)
+
+
+def is_transient(error: Exception) -> bool:
+    """Database unreachable or connection lost, as opposed to a row the database rejects"""
+    if isinstance(error, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class MessageLogWriter:
+    """
+    Collects status changes in memory and flushes them from a background thread
+
+    A flush runs every `flush_interval_ms` or as soon as `max_batch` rows are
+    pending: one INSERT ... ON CONFLICT DO UPDATE for outgoing rows plus one
+    UPDATE per status for the incoming messages that were replied to. Rows of
+    a flush that failed because the database was unreachable are put back and
+    retried (at-least-once), up to `max_pending` buffered rows. A batch the
+    database rejects is retried in halves, so a single bad row (NUL byte, too
+    long a value) is dropped and counted instead of blocking every later
+    flush. stop() flushes whatever is left.
+    """
+
+    def __init__(self, flush_interval_ms: int, max_batch: int, max_pending: int):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.max_pending = max(self.max_batch, max_pending)
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.outgoing: Dict[str, Dict[str, Any]] = {}  # message_id -> row, latest wins
+        self.replied: Dict[str, Dict[str, Any]] = {}  # incoming message_id -> status update
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failed_flushes = 0
+        self.rejected_rows = 0  # refused by the database on their own
+        self.overflow_rows = 0  # dropped because the buffer was full
+        self.flush_ms_total = 0.0
+
+    def start(self) -> None:
+        """Start the background flusher (idempotent)"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="message-log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+        logger.info(f"📝 Message log writer started (every {self.flush_interval * 1000:.0f}ms or {self.max_batch} rows)")
+
+    def stop(self) -> None:
+        """Stop the flusher and persist everything still pending"""
+        if not self.running:
+            return
+        self.running = False
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+        self.flush()
+
+    def record_outgoing(
+        self,
+        message_id: str,
+        phone_number: str,
+        message_text: str,
+        status: str,
+        reply_to_ids: Optional[List[str]] = None
+    ) -> None:
+        """
+        Queue an outgoing message row (and the status of the messages it replies to)
+
+        Args:
+            message_id: Wappi message id of the sent message (or a generated id for failures)
+            phone_number: Recipient phone number
+            message_text: Text that was sent
+            status: 'sent' or 'failed'
+            reply_to_ids: Incoming messages this answers (several when sends were coalesced)
+        """
+        now = datetime.now()
+        with self.lock:
+            self.outgoing[message_id] = {
+                "message_id": message_id,
+                "phone_number": phone_number,
+                "direction": "outgoing",
+                "message_text": message_text,
+                "is_voice": False,
+                "queue_status": status,
+                "wappi_status": status,
+                "processed_at": now
+            }
+            for reply_to_id in reply_to_ids or []:
+                self.replied[reply_to_id] = {"status": status, "processed_at": now}
+
+            self._trim()
+            pending = len(self.outgoing) + len(self.replied)
+
+        if pending >= self.max_batch:
+            self.wake.set()
+
+    def _trim(self) -> None:
+        """Drop the oldest rows beyond max_pending (call with the lock held)"""
+        overflow = len(self.outgoing) + len(self.replied) - self.max_pending
+        if overflow <= 0:
+            return
+
+        for buffer in (self.outgoing, self.replied):
+            while overflow > 0 and buffer:
+                del buffer[next(iter(buffer))]
+                overflow -= 1
+                self.overflow_rows += 1
+        logger.warning(f"Message log buffer full ({self.max_pending} rows), dropped the oldest rows")
+
+    def run(self) -> None:
+        while self.running:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def _write(self, rows: List[Row]) -> None:
+        """Write rows in one transaction (raises on failure)"""
+        outgoing = [row for kind, _, row in rows if kind == "outgoing"]
+        replied = [(message_id, change) for kind, message_id, change in rows if kind == "replied"]
+
+        db = SessionLocal()
+        try:
+            if outgoing:
+                stmt = insert(MessageLog).values(outgoing)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[MessageLog.message_id],
+                    set_={
+                        "queue_status": stmt.excluded.queue_status,
+                        "wappi_status": stmt.excluded.wappi_status,
+                        "processed_at": stmt.excluded.processed_at
+                    }
+                )
+                db.execute(stmt)
+
+            # One UPDATE per status for the replied-to incoming rows
+            by_status: Dict[str, list] = {}
+            for message_id, change in replied:
+                by_status.setdefault(change["status"], []).append(message_id)
+            for status, message_ids in by_status.items():
+                db.execute(
+                    update(MessageLog)
+                    .where(MessageLog.message_id.in_(message_ids))
+                    .values(queue_status=status, wappi_status=status, processed_at=datetime.now())
+                )
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_halves(self, rows: List[Row], error: Exception) -> Tuple[int, int]:
+        """
+        Retry a rejected batch in halves down to single rows
+
+        Returns:
+            (rows written, rows dropped); transient errors propagate so the
+            caller can put the batch back
+        """
+        if len(rows) == 1:
+            kind, message_id, _ = rows[0]
+            logger.error(f"Dropping {kind} message log row {message_id}: {error}")
+            return 0, 1
+
+        written = dropped = 0
+        middle = len(rows) // 2
+        for half in (rows[:middle], rows[middle:]):
+            try:
+                self._write(half)
+                written += len(half)
+            except Exception as e:
+                if is_transient(e):
+                    raise
+                half_written, half_dropped = self._write_halves(half, e)
+                written += half_written
+                dropped += half_dropped
+        return written, dropped
+
+    def flush(self) -> int:
+        """Write pending rows; returns the number of rows written"""
+        with self.flush_lock:
+            with self.lock:
+                outgoing, self.outgoing = self.outgoing, {}
+                replied, self.replied = self.replied, {}
+
+            if not outgoing and not replied:
+                return 0
+
+            rows: List[Row] = [("outgoing", message_id, row) for message_id, row in outgoing.items()]
+            rows += [("replied", message_id, change) for message_id, change in replied.items()]
+
+            started = time.perf_counter()
+            dropped = 0
+            try:
+                try:
+                    self._write(rows)
+                except Exception as e:
+                    if is_transient(e):
+                        raise
+                    self.failed_flushes += 1
+                    logger.warning(f"Message log batch of {len(rows)} rows rejected ({e}), retrying in halves")
+                    _, dropped = self._write_halves(rows, e)
+                    self.rejected_rows += dropped
+            except Exception as e:
+                logger.error(f"Failed to flush {len(rows)} message log rows: {e}")
+                self.failed_flushes += 1
+
+                # Put rows back ahead of newer ones (oldest are trimmed first), newer changes win
+                with self.lock:
+                    self.outgoing = {**outgoing, **self.outgoing}
+                    self.replied = {**replied, **self.replied}
+                    self._trim()
+                return 0
+
+            written = len(rows) - dropped
+            self.flushes += 1
+            self.rows_flushed += written
+            self.flush_ms_total += (time.perf_counter() - started) * 1000
+            logger.debug(f"💾 Flushed {len(outgoing)} outgoing rows and {len(replied)} reply statuses")
+            return written
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            pending = len(self.outgoing) + len(self.replied)
+        return {
+            "pending_rows": pending,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "failed_flushes": self.failed_flushes,
+            "dropped_rows": self.rejected_rows + self.overflow_rows,
+            "rejected_rows": self.rejected_rows,
+            "overflow_rows": self.overflow_rows,
+            "avg_rows_per_flush": round(self.rows_flushed / self.flushes, 1) if self.flushes else 0.0,
+            "avg_flush_ms": round(self.flush_ms_total / self.flushes, 1) if self.flushes else 0.0
+        }
+
+
+# Global writer shared by the sender workers
+message_log_writer = MessageLogWriter(
+    flush_interval_ms=settings.LOG_WRITER_FLUSH_MS,
+    max_batch=settings.LOG_WRITER_MAX_BATCH,
+    max_pending=settings.LOG_WRITER_MAX_PENDING
+)
+metrics_registry.register("message_log_writer", message_log_writer.stats)
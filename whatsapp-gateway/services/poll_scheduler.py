@@ -0,0 +1,91 @@
+"""
+Adaptive Poll Scheduler
+Chooses the next polling interval from recent chat activity and Wappi rate limits
+"""
+import time
+from collections import deque
+from typing import Dict, Any
+from loguru import logger
+
+
+class AdaptivePollScheduler:
+    """
+    Polling interval that follows activity
+
+    - cycles with new messages shrink the interval toward `floor`
+    - empty cycles back off exponentially toward `ceiling`
+    - a 429 from Wappi backs off immediately and honors Retry-After
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        floor: float,
+        ceiling: float,
+        backoff_factor: float = 1.5,
+        speedup_factor: float = 0.5,
+        history_size: int = 50
+    ):
+        self.floor = floor
+        self.ceiling = max(floor, ceiling)
+        self.backoff_factor = backoff_factor
+        self.speedup_factor = speedup_factor
+        self.interval = min(max(initial, self.floor), self.ceiling)
+        self.history = deque(maxlen=history_size)
+
+        self.cycles = 0
+        self.busy_cycles = 0
+        self.empty_cycles = 0
+        self.rate_limited_cycles = 0
+
+    def record_cycle(self, new_messages: int, rate_limited: bool = False, retry_after: float = 0) -> float:
+        """
+        Record the outcome of a poll cycle and compute the next interval
+
+        Args:
+            new_messages: Messages published in the cycle
+            rate_limited: Wappi answered 429 during the cycle
+            retry_after: Largest Retry-After seen, in seconds
+
+        Returns:
+            Seconds to wait before the next cycle
+        """
+        previous = self.interval
+        self.cycles += 1
+
+        if rate_limited:
+            self.rate_limited_cycles += 1
+            self.interval = min(self.ceiling, max(previous * self.backoff_factor, retry_after))
+            reason = "rate_limited"
+        elif new_messages > 0:
+            self.busy_cycles += 1
+            self.interval = max(self.floor, previous * self.speedup_factor)
+            reason = "activity"
+        else:
+            self.empty_cycles += 1
+            self.interval = min(self.ceiling, previous * self.backoff_factor)
+            reason = "idle"
+
+        if self.interval != previous:
+            logger.debug(f"Polling interval {previous:.1f}s -> {self.interval:.1f}s ({reason})")
+
+        self.history.append({
+            "time": time.time(),
+            "new_messages": new_messages,
+            "reason": reason,
+            "interval": round(self.interval, 2)
+        })
+        return self.interval
+
+    def stats(self) -> Dict[str, Any]:
+        """Current interval and recent decisions"""
+        return {
+            "current_interval": round(self.interval, 2),
+            "floor": self.floor,
+            "ceiling": self.ceiling,
+            "cycles": self.cycles,
+            "busy_cycles": self.busy_cycles,
+            "empty_cycles": self.empty_cycles,
+            "rate_limited_cycles": self.rate_limited_cycles,
+            "history": list(self.history)
+        }
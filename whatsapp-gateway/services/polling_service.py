@@ -1,97 +1,167 @@
 """
 Message Polling Service
-Polls Wappi API every 5 seconds for new messages
+Polls Wappi API every 5 seconds for new messages.
+In webhook ingestion mode it runs as a low-frequency reconciliation sweep.
 """
 import asyncio
-import json
-from datetime import datetime
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, Tuple
 from sqlalchemy.orm import Session
 from loguru import logger
 
-from services.wappi_client import WappiClient
-from config.queue import queue_manager
+from services.async_wappi_client import AsyncWappiClient
+from services.ingestion_service import MessageIngestionService
+from services.chat_cursor import ChatCursorStore
+from services.poll_scheduler import AdaptivePollScheduler
+from services.dialog_scheduler import TieredDialogScheduler
+from services.circuit_breaker import wappi_circuit_breaker
 from config.database import get_db
 from config.settings import settings
-from models.message_log import MessageLog
-from models.whitelist import Whitelist
+from utils.metrics import metrics_registry
 
 
 class MessagePollingService:
     """Service to poll WhatsApp messages from Wappi API"""
 
     def __init__(self):
-        self.wappi_client = WappiClient()
-        self.polling_interval = settings.POLLING_INTERVAL
+        self.wappi_client = AsyncWappiClient()
+        self.ingestion = MessageIngestionService()
+        self.cursor_store = ChatCursorStore()
+        self.reconciliation_mode = settings.INGESTION_MODE == "webhook"
+        self.polling_interval = (
+            settings.RECONCILIATION_INTERVAL if self.reconciliation_mode else settings.POLLING_INTERVAL
+        )
         self.is_running = False
+        self.skipped_cycles = 0  # Cycles skipped while the Wappi circuit was open
+
+        # Webhook mode keeps a fixed reconciliation interval
+        if self.reconciliation_mode:
+            self.scheduler = AdaptivePollScheduler(
+                initial=self.polling_interval,
+                floor=self.polling_interval,
+                ceiling=self.polling_interval
+            )
+        else:
+            self.scheduler = AdaptivePollScheduler(
+                initial=settings.POLLING_INTERVAL,
+                floor=settings.POLLING_INTERVAL_MIN,
+                ceiling=settings.POLLING_INTERVAL_MAX,
+                backoff_factor=settings.POLLING_BACKOFF_FACTOR
+            )
+        metrics_registry.register("poll_scheduler", self.scheduler.stats)
+
+        # Hot/warm/cold chat tiers over a rotating window of get_chats pages
+        self.dialog_page_size = settings.POLL_DIALOG_PAGE_SIZE
+        self.max_fetch_per_cycle = settings.POLL_MAX_FETCH_PER_CYCLE
+        self.dialog_scheduler = TieredDialogScheduler(
+            page_size=self.dialog_page_size,
+            hot_seconds=settings.POLL_HOT_SECONDS,
+            warm_seconds=settings.POLL_WARM_SECONDS,
+            warm_every=settings.POLL_WARM_EVERY_CYCLES,
+            max_staleness=settings.POLL_MAX_STALENESS
+        )
+        metrics_registry.register("dialog_scheduler", self.dialog_scheduler.stats)
 
-    def is_in_whitelist(self, phone_number: str, db: Session) -> bool:
-        """Check if phone number is in whitelist"""
-        # Remove @c.us suffix if present
-        clean_phone = phone_number.replace("@c.us", "")
-
-        whitelist_entry = db.query(Whitelist).filter(
-            Whitelist.phone_number == clean_phone
-        ).first()
-
-        return whitelist_entry is not None
-
-    def is_message_processed(self, message_id: str, db: Session) -> bool:
-        """Check if message was already processed"""
-        existing = db.query(MessageLog).filter(
-            MessageLog.message_id == message_id
-        ).first()
-
-        return existing is not None
+        self.max_messages_per_chat = 20  # Catch rapid sequential messages
+        self.cursor_page_size = settings.POLL_CURSOR_PAGE_SIZE
 
-    def extract_phone_from_chat_id(self, chat_id: str) -> str:
-        """Extract phone number from chat_id"""
-        # Remove @c.us or @g.us suffix
-        return chat_id.replace("@c.us", "").replace("@g.us", "")
+        # Cap on concurrent per-dialog message fetches
+        self.fetch_concurrency = max(1, settings.POLL_FETCH_CONCURRENCY)
 
-    def process_chats(self, db: Session) -> None:
-        """Get all chats and check for new messages"""
+    async def process_chats(self, db: Session) -> int:
+        """
+        Get all chats and check for new messages
+        Returns the number of new messages published
+        """
         try:
-            # Get recent chats from Wappi (limit to 20 to avoid too many API calls)
-            response = self.wappi_client.get_chats(limit=20, offset=0, show_all=True)
-
-            if not response or response.get("status") != "done":
-                logger.warning("Failed to get chats from Wappi")
-                return
-
-            dialogs = response.get("dialogs", [])
-            logger.info(f"Retrieved {len(dialogs)} chats from API, will process first 20")
+            # List the head page plus the current sweep page of chats
+            for offset in self.dialog_scheduler.start_cycle():
+                response = await self.wappi_client.get_chats(limit=self.dialog_page_size, offset=offset, show_all=True)
+
+                if not response or response.get("status") != "done":
+                    logger.warning(f"Failed to get chats from Wappi (offset {offset})")
+                    if offset == 0:
+                        return 0
+                    continue
 
-            # Limit to 20 chats to avoid API overload (Wappi API ignores limit parameter with show_all=True)
-            dialogs_to_process = dialogs[:20] if len(dialogs) > 20 else dialogs
+                dialogs = response.get("dialogs", []) or []
+                logger.info(f"Retrieved {len(dialogs)} chats from API (offset {offset})")
 
-            processed = 0
-            for dialog in dialogs_to_process:
+                activity = {
+                    d["id"]: self.cursor_store.dialog_head(d)["message_time"]
+                    for d in dialogs if isinstance(d, dict) and d.get("id")
+                }
+                self.dialog_scheduler.observe_listing(offset, dialogs, activity)
+
+            # Due chats in priority order; listed chats skip messages/get when the cursor matches
+            dialogs_to_process = []
+            skipped = 0
+            for dialog, listed in self.dialog_scheduler.select():
+                if not self.should_fetch_dialog(dialog):
+                    self.dialog_scheduler.mark_polled(dialog["id"])
+                    continue
+                if listed and self.cursor_store.is_unchanged(dialog):
+                    self.dialog_scheduler.mark_polled(dialog["id"])
+                    skipped += 1
+                    continue
+                dialogs_to_process.append(dialog)
+
+            if skipped:
+                logger.debug(f"Skipped {skipped} unchanged chats")
+
+            # Cap messages/get calls per cycle; deferred chats get more overdue and move up
+            if len(dialogs_to_process) > self.max_fetch_per_cycle:
+                logger.debug(f"Deferring {len(dialogs_to_process) - self.max_fetch_per_cycle} chats to next cycle")
+                dialogs_to_process = dialogs_to_process[:self.max_fetch_per_cycle]
+
+            # Fetch stage: all dialogs concurrently, results in dialog order
+            fetch_started = time.monotonic()
+            fetched = await self.fetch_dialogs_messages(dialogs_to_process)
+            logger.debug(
+                f"Fetched messages for {len(dialogs_to_process)} chats in "
+                f"{time.monotonic() - fetch_started:.2f}s (concurrency: {self.fetch_concurrency})"
+            )
+
+            # Collect candidates from every chat, then dedup and store them in bulk
+            candidates = []
+            cursor_updates = {}
+            for dialog, messages in fetched:
                 try:
-                    # Skip None dialogs
-                    if not dialog:
-                        logger.debug("Skipping None dialog")
-                        continue
-
-                    if self.process_dialog_with_messages(dialog, db):
-                        processed += 1
+                    dialog_candidates, newest = self.collect_dialog_messages(dialog, messages)
                 except Exception as e:
                     logger.error(f"Error processing dialog: {e}")
                     logger.debug(f"Dialog data: {dialog}")
                     continue
 
-            if processed > 0:
-                logger.success(f"✅ Processed {processed} chats with new messages")
+                candidates.extend(dialog_candidates)
+                if newest:
+                    cursor_updates[dialog["id"]] = newest
+
+            published = self.ingest_candidates(candidates, db)
+
+            # Advance cursors only after the batch is safely stored
+            if published is not None:
+                for chat_id, newest in cursor_updates.items():
+                    self.cursor_store.advance(chat_id, newest)
+                    self.dialog_scheduler.mark_polled(chat_id)
+                    self.dialog_scheduler.record_activity(chat_id, newest["message_time"])
+
+            if published:
+                chats = len({message["chat_id"] for message in published})
+                logger.success(f"✅ Processed {len(published)} new messages from {chats} chats")
+                if self.reconciliation_mode:
+                    logger.warning(f"🔁 Reconciliation recovered {len(published)} messages missed by webhook")
+
+            self.cursor_store.flush(db)
+            return len(published or [])
 
         except Exception as e:
             logger.error(f"Error in process_chats: {e}")
+            return 0
 
-    def process_dialog_with_messages(self, dialog: Dict[str, Any], db: Session) -> bool:
-        """
-        Process a single dialog by fetching its latest messages
-        Returns True if a new message was processed
-        """
-        # Validate dialog
+    def should_fetch_dialog(self, dialog: Dict[str, Any]) -> bool:
+        """Validate dialog and check whitelist before fetching its messages"""
+        # Skip None dialogs
         if not dialog or not isinstance(dialog, dict):
             logger.debug("Dialog is None or not a dict")
             return False
@@ -101,166 +171,187 @@ class MessagePollingService:
             logger.debug("Chat ID is None")
             return False
 
-        phone_number = self.extract_phone_from_chat_id(chat_id)
+        phone_number = self.ingestion.extract_phone_from_chat_id(chat_id)
+        return not self.ingestion.is_in_whitelist(phone_number)
 
-        # Check whitelist
-        if self.is_in_whitelist(phone_number, db):
-            return False
+    async def fetch_dialog_messages(self, dialog: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Fetch latest messages of a single dialog
 
-        # Get contact info - handle None safely
-        contact_info = dialog.get("contact") if dialog else None
-        if not contact_info or not isinstance(contact_info, dict):
-            contact_info = {}
+        Without a cursor, gets the last 20 messages. With a cursor, pages back
+        only until the cursor message is reached.
+        Returns messages newest first, or None if a request failed
+        """
+        chat_id = dialog["id"]
+        has_cursor = self.cursor_store.get(chat_id) is not None
+        page_size = self.cursor_page_size if has_cursor else self.max_messages_per_chat
 
-        # Get latest messages from this chat using /messages/get endpoint
-        # Get up to 20 recent messages to catch rapid sequential messages
-        messages_response = self.wappi_client.get_messages(
-            chat_id=chat_id,
-            limit=20,  # Get last 20 messages to catch rapid sequences
-            order="desc"  # From newest to oldest
-        )
+        collected = []
+        offset = 0
+        while offset < self.max_messages_per_chat:
+            try:
+                messages_response = await self.wappi_client.get_messages(
+                    chat_id=chat_id,
+                    limit=page_size,
+                    offset=offset,
+                    order="desc"  # From newest to oldest
+                )
+            except Exception as e:
+                logger.error(f"Error fetching messages for {chat_id}: {e}")
+                return None
 
-        if not messages_response or messages_response.get("status") != "done":
-            return False
+            if not messages_response or messages_response.get("status") != "done":
+                return None
 
-        messages = messages_response.get("messages", [])
-        if not messages:
-            return False
+            page = messages_response.get("messages", []) or []
+            for msg in page:
+                if msg is None:
+                    continue
+                if self.cursor_store.is_at_or_before(chat_id, msg):
+                    return collected
+                collected.append(msg)
 
-        # Process all unread messages (not already in DB and not from me)
-        new_messages = []
-        for msg in reversed(messages):  # Process oldest to newest
-            if msg is None:
-                continue
+            if len(page) < page_size:
+                break
+            offset += page_size
 
-            msg_id = msg.get("id")
-            from_me = msg.get("fromMe", False)
+        return collected
 
-            # Skip if already processed or from bot
-            if from_me or self.is_message_processed(msg_id, db):
-                continue
+    async def fetch_dialogs_messages(
+        self,
+        dialogs: List[Dict[str, Any]]
+    ) -> List[Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]]:
+        """
+        Fetch messages for all dialogs with bounded parallelism
 
-            new_messages.append(msg)
+        Returns (dialog, messages) pairs in the same order as the input dialogs,
+        so dedup and publishing stay deterministic per chat
+        """
+        if not dialogs:
+            return []
 
-        # If no new messages, return
-        if not new_messages:
-            return False
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
 
-        logger.info(f"📬 Found {len(new_messages)} new messages from {phone_number}")
-
-        # Process each new message
-        processed_count = 0
-        for message in new_messages:
-            message_id = message.get("id")
-            message_text = message.get("body", "")
-            message_type = message.get("type", "chat")
-            timestamp = message.get("time", int(datetime.now().timestamp()))
-
-            # Handle media messages (body can be dict instead of string)
-            if isinstance(message_text, dict):
-                # For media messages, extract meaningful text description
-                if "title" in message_text:
-                    # PDF or document with title
-                    message_text = f"[{message_text.get('mimetype', 'document')}] {message_text.get('title', 'untitled')}"
-                elif "PTT" in message_text or message_type in ["ptt", "audio"]:
-                    # Voice message
-                    message_text = "[Voice message]"
-                elif "vcard" in message_text:
-                    # Contact card
-                    message_text = f"[Contact] {message_text.get('display_name', 'unknown')}"
-                elif "buttonText" in message_text:
-                    # Interactive message
-                    message_text = f"[Interactive] {message_text.get('buttonText', 'button message')}"
-                elif "URL" in message_text or "url" in message_text:
-                    # Image, video or other media with URL
-                    mimetype = message_text.get("mimetype", "media")
-                    message_text = f"[{mimetype}]"
-                else:
-                    # Generic media message - convert to JSON string
-                    message_text = f"[Media: {message_type}]"
-
-            # Check if voice message
-            is_voice = message_type in ["ptt", "audio"]
-
-            # Create message data
-            message_data = {
-                "message_id": message_id,
-                "chat_id": chat_id,
-                "phone_number": phone_number,
-                "sender_name": contact_info.get("FirstName", ""),
-                "message_text": message_text,
-                "is_voice": is_voice,
-                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
-                "contact_info": {
-                    "FirstName": contact_info.get("FirstName", ""),
-                    "FullName": contact_info.get("FullName", ""),
-                    "PushName": contact_info.get("PushName", ""),
-                    "BusinessName": contact_info.get("BusinessName", "")
-                }
-            }
+        async def fetch(dialog: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+            async with semaphore:
+                return await self.fetch_dialog_messages(dialog)
 
-            # Save to database
-            try:
-                # Check if message already exists
-                existing_message = db.query(MessageLog).filter(
-                    MessageLog.message_id == message_id
-                ).first()
-
-                if existing_message:
-                    logger.debug(f"Message {message_id} already exists in database, skipping save")
-                else:
-                    message_log = MessageLog(
-                        message_id=message_id,
-                        phone_number=phone_number,
-                        direction="incoming",
-                        message_text=message_text,
-                        is_voice=is_voice,
-                        queue_status="queued",
-                        wappi_status="received"
-                    )
-                    db.add(message_log)
-                    db.commit()
-                    logger.success(f"💾 Saved message from {phone_number}: {message_text[:50]}")
-            except Exception as e:
-                logger.error(f"Failed to save message to database: {e}")
-                db.rollback()
+        # gather preserves input order regardless of completion order
+        results = await asyncio.gather(*(fetch(dialog) for dialog in dialogs))
+        return list(zip(dialogs, results))
+
+    def collect_dialog_messages(
+        self,
+        dialog: Dict[str, Any],
+        messages: Optional[List[Dict[str, Any]]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Normalize incoming messages of a single dialog using its fetched messages
+
+        Returns:
+            (candidate messages oldest to newest, new cursor for the chat or None)
+        """
+        chat_id = dialog["id"]
+
+        # Fetch failed: keep the cursor so the chat is retried next cycle
+        if messages is None:
+            return [], None
+
+        newest_message = next((m for m in messages if m), None)
+        if newest_message is None:
+            # Summary changed but nothing newer than the cursor (e.g. edits)
+            return [], self.cursor_store.dialog_head(dialog)
+
+        # Get contact info - handle None safely
+        contact_info = dialog.get("contact")
+        if not contact_info or not isinstance(contact_info, dict):
+            contact_info = {}
+
+        candidates = []
+        for msg in reversed(messages):  # Process oldest to newest
+            # Skip empty messages and messages from bot
+            if msg is None or msg.get("fromMe", False) or not msg.get("id"):
                 continue
 
-            # Route to appropriate queue
-            if is_voice:
-                # Publish to voice transcription queue
-                queue_manager.publish(
-                    settings.QUEUE_VOICE_TRANSCRIPTION,
-                    message_data
-                )
-                logger.info(f"📢 Published voice message to transcription queue")
-            else:
-                # Publish to incoming messages queue
-                queue_manager.publish(
-                    settings.QUEUE_INCOMING_MESSAGES,
-                    message_data
-                )
-                logger.info(f"📢 Published text message to AI queue")
+            candidates.append(self.ingestion.build_message_data(msg, chat_id, contact_info))
+
+        return candidates, self.cursor_store.message_cursor(newest_message)
+
+    def ingest_candidates(
+        self,
+        candidates: List[Dict[str, Any]],
+        db: Session
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Bulk dedup and store candidate messages, then publish the new ones
+
+        One IN lookup filters already processed ids, and the remainder is
+        inserted in a single transaction. Returns published messages, or None
+        if the batch could not be stored.
+        """
+        if not candidates:
+            return []
+
+        processed_ids = self.ingestion.find_processed_ids(
+            [message["message_id"] for message in candidates], db
+        )
+        new_messages = [m for m in candidates if m["message_id"] not in processed_ids]
+        if not new_messages:
+            return []
 
-            processed_count += 1
+        logger.info(f"📬 Found {len(new_messages)} new messages")
 
-        logger.success(f"✅ Processed {processed_count}/{len(new_messages)} messages from {phone_number}")
-        return processed_count > 0
+        try:
+            return self.ingestion.ingest(new_messages, db)
+        except Exception as e:
+            logger.error(f"Failed to ingest polled messages: {e}")
+            return None
 
     async def start_polling(self) -> None:
         """Start continuous polling loop"""
         self.is_running = True
-        logger.info(f"🚀 Started polling service (interval: {self.polling_interval}s)")
+        mode = "reconciliation" if self.reconciliation_mode else "polling"
+        logger.info(
+            f"🚀 Started polling service in {mode} mode "
+            f"(interval: {self.scheduler.floor}-{self.scheduler.ceiling}s)"
+        )
+
+        db = next(get_db())
+        self.cursor_store.load(db)
+        db.close()
 
+        try:
+            await self.poll_loop()
+        finally:
+            await self.wappi_client.aclose()
+
+    async def poll_loop(self) -> None:
+        """Poll cycles until stop_polling()"""
         while self.is_running:
+            if wappi_circuit_breaker.is_open():
+                # Wappi is degraded: skip the cycle instead of queueing calls behind it
+                self.skipped_cycles += 1
+                wait = max(1.0, wappi_circuit_breaker.retry_in())
+                logger.warning(f"⏸️  Wappi circuit open, skipping poll cycle for {wait:.0f}s")
+                await asyncio.sleep(wait)
+                continue
+
+            new_messages = 0
+            rate_limit_hits = self.wappi_client.rate_limit_hits
             try:
                 db = next(get_db())
-                self.process_chats(db)
+                new_messages = await self.process_chats(db)
                 db.close()
             except Exception as e:
                 logger.error(f"Error in polling loop: {e}")
 
-            # Wait for next poll
+            # Wait for next poll, adapted to activity and rate limits
+            rate_limited = self.wappi_client.rate_limit_hits > rate_limit_hits
+            self.polling_interval = self.scheduler.record_cycle(
+                new_messages,
+                rate_limited=rate_limited,
+                retry_after=self.wappi_client.last_retry_after if rate_limited else 0
+            )
             await asyncio.sleep(self.polling_interval)
 
     def stop_polling(self) -> None:
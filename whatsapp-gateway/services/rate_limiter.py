@@ -0,0 +1,138 @@
+"""
+Wappi Rate Limiter
+Process-wide token buckets shared by every Wappi caller (poller, sender, voice)
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Any
+from loguru import logger
+
+from config.settings import settings
+from utils.metrics import metrics_registry
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with reservations
+
+    reserve() takes a token immediately (the balance may go negative) and
+    returns how long the caller must wait before using it, so sync and async
+    callers can share one bucket and are served in arrival order.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: int):
+        if rate_per_minute <= 0:
+            # A zero rate would never refill (and divide by zero in reserve())
+            logger.warning(f"Rate limit of {rate_per_minute}/min is not positive, using 1/min")
+            rate_per_minute = 1.0
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.acquired = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, tokens: int = 1) -> float:
+        """Take tokens and return seconds to wait before they are available"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= tokens
+
+            ready_at = self.updated + max(0.0, -self.tokens) / self.rate
+            wait = max(0.0, ready_at - now)
+
+            self.acquired += 1
+            if wait > 0:
+                self.waits += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def drain(self, seconds: float) -> None:
+        """Empty the bucket and stop refilling for `seconds`"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = max(self.updated, now + seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self._refill(time.monotonic())
+            return {
+                "rate_per_minute": round(self.rate * 60, 2),
+                "capacity": self.capacity,
+                "tokens": round(self.tokens, 2),
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "total_wait_seconds": round(self.total_wait, 2),
+                "avg_wait_seconds": round(self.total_wait / self.waits, 3) if self.waits else 0.0,
+                "max_wait_seconds": round(self.max_wait, 2)
+            }
+
+
+class WappiRateLimiter:
+    """Per endpoint class budgets: read, send and media"""
+
+    ENDPOINT_CLASSES = {
+        "/api/sync/message/send": "send",
+        "/api/sync/message/reply": "send",
+        "/api/sync/message/media/download": "media"
+    }
+
+    def __init__(self):
+        self.buckets = {
+            "read": TokenBucket(settings.WAPPI_READ_RATE_PER_MIN, settings.WAPPI_READ_BURST),
+            "send": TokenBucket(settings.WAPPI_SEND_RATE_PER_MIN, settings.WAPPI_SEND_BURST),
+            "media": TokenBucket(settings.WAPPI_MEDIA_RATE_PER_MIN, settings.WAPPI_MEDIA_BURST)
+        }
+        self.drains = 0
+
+    def endpoint_class(self, endpoint: str) -> str:
+        """Budget class for an endpoint (everything else counts as read)"""
+        return self.ENDPOINT_CLASSES.get(endpoint, "read")
+
+    def acquire(self, endpoint: str) -> float:
+        """Block the calling thread until a token is available; returns seconds waited"""
+        wait = self.buckets[self.endpoint_class(endpoint)].reserve()
+        if wait > 0:
+            logger.debug(f"Rate limiter: waiting {wait:.2f}s for {endpoint}")
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, endpoint: str) -> float:
+        """Wait for a token without blocking the event loop; returns seconds waited"""
+        wait = self.buckets[self.endpoint_class(endpoint)].reserve()
+        if wait > 0:
+            logger.debug(f"Rate limiter: waiting {wait:.2f}s for {endpoint}")
+            await asyncio.sleep(wait)
+        return wait
+
+    def drain(self, retry_after: float) -> None:
+        """Honor Retry-After for every caller: pause all budgets"""
+        self.drains += 1
+        for bucket in self.buckets.values():
+            bucket.drain(retry_after)
+        logger.warning(f"Rate limiter drained for {retry_after}s after 429")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "drains": self.drains,
+            "classes": {name: bucket.stats() for name, bucket in self.buckets.items()}
+        }
+
+
+# Global rate limiter instance
+wappi_rate_limiter = WappiRateLimiter()
+metrics_registry.register("wappi_rate_limiter", wappi_rate_limiter.stats)
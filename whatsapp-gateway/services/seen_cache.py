@@ -0,0 +1,170 @@
+"""
+Recently-Seen Message Cache
+Bounded LRU of recent message ids backed by a Bloom filter, in front of message_logs
+"""
+import hashlib
+import math
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, Set, Tuple
+from sqlalchemy.orm import Session
+from loguru import logger
+
+from config.settings import settings
+from models.message_log import MessageLog
+from utils.metrics import metrics_registry
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        # Optimal bit count and hash count for the target false-positive rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        """Double hashing: k positions from one 128-bit digest"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str) -> None:
+        """Add key to the filter"""
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def memory_bytes(self) -> int:
+        """Size of the bit array"""
+        return len(self.bits)
+
+
+class SeenMessageCache:
+    """
+    Answers "seen" / "definitely new" / "uncertain" for message ids
+
+    - LRU hit: seen, no database access
+    - Bloom miss: never seen by this cache, skip the lookup and let
+      INSERT ... ON CONFLICT DO NOTHING decide
+    - Bloom hit without LRU hit: uncertain, confirm against message_logs
+
+    The database stays the source of truth: a "new" answer only skips the
+    SELECT, never the conflict check on insert.
+    """
+
+    def __init__(self, lru_size: int, bloom_capacity: int, error_rate: float):
+        self.lru_size = max(1, lru_size)
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.lru: "OrderedDict[str, None]" = OrderedDict()
+        self.bloom = BloomFilter(bloom_capacity, error_rate)
+        self.lock = threading.Lock()
+
+        self.lru_hits = 0
+        self.definitely_new = 0
+        self.uncertain = 0
+        self.bloom_resets = 0
+
+    def classify(self, message_ids: Iterable[str]) -> Tuple[Set[str], Set[str], Set[str]]:
+        """
+        Split message ids by what the cache knows about them
+
+        Returns:
+            (seen, definitely_new, uncertain) id sets
+        """
+        seen, new, uncertain = set(), set(), set()
+        with self.lock:
+            for message_id in message_ids:
+                if not message_id:
+                    continue
+                if message_id in self.lru:
+                    self.lru.move_to_end(message_id)
+                    seen.add(message_id)
+                elif message_id not in self.bloom:
+                    new.add(message_id)
+                else:
+                    uncertain.add(message_id)
+
+            self.lru_hits += len(seen)
+            self.definitely_new += len(new)
+            self.uncertain += len(uncertain)
+
+        return seen, new, uncertain
+
+    def add(self, message_ids: Iterable[str]) -> None:
+        """Record message ids that are stored in message_logs"""
+        with self.lock:
+            for message_id in message_ids:
+                if not message_id:
+                    continue
+                self.lru[message_id] = None
+                self.lru.move_to_end(message_id)
+                if message_id not in self.bloom:
+                    self.bloom.add(message_id)
+
+            while len(self.lru) > self.lru_size:
+                self.lru.popitem(last=False)
+
+            # Bloom filters cannot delete: rebuild from the LRU once saturated
+            if self.bloom.count > self.bloom_capacity:
+                self.bloom = BloomFilter(self.bloom_capacity, self.error_rate)
+                for message_id in self.lru:
+                    self.bloom.add(message_id)
+                self.bloom_resets += 1
+
+    def warm(self, db: Session, hours: int) -> None:
+        """Load message ids from the last N hours of the message log"""
+        try:
+            since = datetime.now() - timedelta(hours=hours)
+            rows = db.query(MessageLog.message_id).filter(
+                MessageLog.created_at >= since
+            ).order_by(MessageLog.created_at.desc()).limit(self.bloom_capacity).all()
+
+            # Oldest first so the most recent ids end up at the hot end of the LRU
+            self.add(row[0] for row in reversed(rows))
+            logger.info(f"Warmed seen-message cache with {len(rows)} ids from the last {hours}h")
+        except Exception as e:
+            logger.error(f"Failed to warm seen-message cache: {e}")
+            db.rollback()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate and memory usage"""
+        with self.lock:
+            lookups = self.lru_hits + self.definitely_new + self.uncertain
+            lru_bytes = sys.getsizeof(self.lru) + sum(sys.getsizeof(key) for key in self.lru)
+            return {
+                "lru_entries": len(self.lru),
+                "lru_size": self.lru_size,
+                "bloom_entries": self.bloom.count,
+                "bloom_capacity": self.bloom_capacity,
+                "lookups": lookups,
+                "lru_hits": self.lru_hits,
+                "definitely_new": self.definitely_new,
+                "db_checks": self.uncertain,
+                "hit_rate": round((self.lru_hits + self.definitely_new) / lookups, 4) if lookups else None,
+                "bloom_resets": self.bloom_resets,
+                "memory_bytes": {
+                    "lru": lru_bytes,
+                    "bloom": self.bloom.memory_bytes()
+                }
+            }
+
+
+# Global seen-message cache instance
+seen_message_cache = SeenMessageCache(
+    lru_size=settings.SEEN_CACHE_SIZE,
+    bloom_capacity=settings.SEEN_CACHE_BLOOM_CAPACITY,
+    error_rate=settings.SEEN_CACHE_ERROR_RATE
+)
+metrics_registry.register("seen_message_cache", seen_message_cache.stats)
@@ -2,58 +2,222 @@
 Message Sender Service
 Consumes messages from outgoing queue and sends via Wappi API
 """
+import functools
 import json
+import threading
 import time
-from datetime import datetime
-from typing import Dict, Any
-from sqlalchemy.orm import Session
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from loguru import logger
 import pika
 
 from services.wappi_client import WappiClient
+from services.circuit_breaker import wappi_circuit_breaker
+from services.log_writer import message_log_writer
 from config.queue import QueueManager
-from config.database import get_db
 from config.settings import settings
-from models.message_log import MessageLog
+from utils.metrics import metrics_registry
+
+
+class SenderWorker:
+    """
+    One sender thread with its own local lane queues
+
+    Every chat hashes to exactly one worker, so messages to the same phone
+    are sent in order while different chats are sent in parallel. The next
+    chat to serve is picked from the non-empty lanes by smooth weighted
+    round robin, so live replies overtake a follow-up backlog without
+    starving it. After picking up a message the worker waits
+    `coalesce_window` seconds and hands all of that chat's pending
+    messages to the handler together.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        handler: Callable,
+        lane_weights: Dict[str, int],
+        coalesce_window: float = 0.0,
+        latency_window: int = 200
+    ):
+        self.index = index
+        self.handler = handler
+        self.coalesce_window = coalesce_window
+        self.lane_weights = lane_weights
+        self.lanes: Dict[str, deque] = {lane: deque() for lane in lane_weights}
+        self.credits: Dict[str, int] = {lane: 0 for lane in lane_weights}
+        self.ready = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name=f"sender-worker-{index}", daemon=True)
+        self.lock = threading.Lock()
+
+        self.busy = False
+        self.processed = 0
+        self.errors = 0
+        self.wait_ms = deque(maxlen=latency_window)  # received -> picked up
+        self.total_ms = deque(maxlen=latency_window)  # received -> handled
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def submit(self, delivery: tuple, lane: str) -> None:
+        """Queue a delivery: (ch, method, properties, body, message_data)"""
+        with self.ready:
+            self.lanes[lane].append((time.perf_counter(), delivery))
+            self.ready.notify()
+
+    def pick_lane(self) -> str:
+        """Smooth weighted round robin over the non-empty lanes (call with `ready` held)"""
+        active = [lane for lane, pending in self.lanes.items() if pending]
+        for lane in active:
+            self.credits[lane] += self.lane_weights[lane]
+        chosen = max(active, key=lambda lane: self.credits[lane])
+        self.credits[chosen] -= sum(self.lane_weights[lane] for lane in active)
+        return chosen
+
+    def next_batch(self) -> List[Tuple[float, tuple]]:
+        """Pick the next delivery, wait out the coalescing window, then take that chat's other pending deliveries"""
+        with self.ready:
+            while not any(self.lanes.values()):
+                self.ready.wait()
+            first = self.lanes[self.pick_lane()].popleft()
+
+        remaining = first[0] + self.coalesce_window - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+        phone_number = first[1][4].get("phone_number")
+        batch = [first]
+        with self.ready:
+            for pending in self.lanes.values():
+                same_chat = [item for item in pending if item[1][4].get("phone_number") == phone_number]
+                for item in same_chat:
+                    pending.remove(item)
+                batch.extend(same_chat)
+
+        batch.sort(key=lambda item: item[0])
+        return batch
+
+    def run(self) -> None:
+        while True:
+            batch = self.next_batch()
+            started = time.perf_counter()
+            with self.lock:
+                self.busy = True
+
+            failed = 0
+            try:
+                self.handler([delivery for _, delivery in batch])
+            except Exception as e:
+                logger.error(f"Sender worker {self.index} error: {e}")
+                failed = 1
+
+            finished = time.perf_counter()
+            with self.lock:
+                self.busy = False
+                self.processed += len(batch)
+                self.errors += failed
+                for received_at, _ in batch:
+                    self.wait_ms.append((started - received_at) * 1000)
+                    self.total_ms.append((finished - received_at) * 1000)
+
+    @staticmethod
+    def _percentile(values: List[float], p: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            wait_ms = list(self.wait_ms)
+            total_ms = list(self.total_ms)
+        with self.ready:
+            lane_depths = {lane: len(pending) for lane, pending in self.lanes.items()}
+            return {
+                "queue_depth": sum(lane_depths.values()),
+                "lane_depths": lane_depths,
+                "busy": self.busy,
+                "processed": self.processed,
+                "errors": self.errors,
+                "avg_wait_ms": round(sum(wait_ms) / len(wait_ms), 1) if wait_ms else 0.0,
+                "avg_latency_ms": round(sum(total_ms) / len(total_ms), 1) if total_ms else 0.0,
+                "p95_latency_ms": self._percentile(total_ms, 0.95)
+            }
 
 
 class MessageSenderService:
     """Service to send WhatsApp messages via Wappi API"""
 
-    def __init__(self):
+    def __init__(self, num_workers: int = None):
         self.wappi_client = WappiClient()
         self.queue_manager = QueueManager()  # Dedicated instance for this consumer
-        self.max_messages_per_minute = 20
-        self.message_count = 0
-        self.minute_start = time.time()
-
-    def throttle_if_needed(self) -> None:
-        """Implement rate limiting (20 messages per minute)"""
-        current_time = time.time()
-        elapsed = current_time - self.minute_start
-
-        # Reset counter every minute
-        if elapsed >= 60:
-            self.message_count = 0
-            self.minute_start = current_time
-            return
-
-        # Check if limit reached
-        if self.message_count >= self.max_messages_per_minute:
-            wait_time = 60 - elapsed
-            logger.warning(f"Rate limit reached. Waiting {wait_time:.1f} seconds...")
-            time.sleep(wait_time)
-            self.message_count = 0
-            self.minute_start = time.time()
+        self.max_retries = 3
+
+        # Priority lanes: live replies, engagement and follow-up messages each have a queue
+        self.lane_weights = self.parse_lane_weights(settings.SENDER_LANE_WEIGHTS)
+        self.lane_by_queue = {queue_name: lane for lane, queue_name in QueueManager.OUTGOING_LANES.items()}
+        self.lane_latency = {lane: deque(maxlen=500) for lane in self.lane_weights}  # enqueued -> sent
+        self.lane_sent = {lane: 0 for lane in self.lane_weights}
+
+        # Chats are hashed to workers; all share the Wappi rate budget and connection pool
+        self.num_workers = max(1, num_workers or settings.SENDER_WORKERS)
+        self.workers = [
+            SenderWorker(index, self.handle_outgoing_messages, self.lane_weights, settings.SENDER_COALESCE_MS / 1000)
+            for index in range(self.num_workers)
+        ]
+
+        # Burst coalescing per recipient and duplicate suppression
+        self.coalesce_merge = settings.SENDER_COALESCE_MERGE
+        self.coalesce_max_chars = settings.SENDER_COALESCE_MAX_CHARS
+        self.dedupe_seconds = settings.SENDER_DEDUPE_SECONDS
+        self.recent_sends: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self.recent_lock = threading.Lock()
+        self.counter_lock = threading.Lock()  # merge/dedupe/lane counters, updated by every worker
+        self.merged_sends = 0
+        self.merged_messages = 0
+        self.duplicates_dropped = 0
+
+        metrics_registry.register("sender_workers", self.stats)
+
+    @staticmethod
+    def parse_lane_weights(value: str) -> Dict[str, int]:
+        """"live:8,engagement:3,follow_up:1" -> weights for every lane (unlisted lanes get 1)"""
+        weights = {lane: 1 for lane in QueueManager.OUTGOING_LANES}
+        for item in value.split(","):
+            lane, _, weight = item.partition(":")
+            if lane.strip() in weights and weight.strip():
+                weights[lane.strip()] = max(1, int(weight))
+        return weights
+
+    def lane_of(self, method: pika.spec.Basic.Deliver) -> str:
+        """Lane of a delivery, from the queue it was routed to"""
+        return self.lane_by_queue.get(method.routing_key, "live")
+
+    def worker_for(self, phone_number: str) -> SenderWorker:
+        """Stable phone -> worker mapping (crc32, unlike hash(), is not salted per process)"""
+        return self.workers[zlib.crc32((phone_number or "").encode()) % self.num_workers]
+
+    def _threadsafe(self, callback: Callable) -> None:
+        """Run a channel operation on the consumer's connection thread"""
+        self.queue_manager.connection.add_callback_threadsafe(callback)
+
+    def ack(self, ch: pika.channel.Channel, method: pika.spec.Basic.Deliver) -> None:
+        self._threadsafe(functools.partial(ch.basic_ack, delivery_tag=method.delivery_tag))
+
+    def nack(self, ch: pika.channel.Channel, method: pika.spec.Basic.Deliver, requeue: bool = True) -> None:
+        self._threadsafe(functools.partial(ch.basic_nack, delivery_tag=method.delivery_tag, requeue=requeue))
 
     def send_via_wappi(
         self,
         phone_number: str,
         message_text: str,
         reply_to_id: str = None
-    ) -> bool:
+    ) -> Optional[Dict[str, Any]]:
         """
         Send message via Wappi API
+        (rate limited by the shared Wappi "send" budget)
 
         Args:
             phone_number: Recipient phone number
@@ -61,12 +225,9 @@ class MessageSenderService:
             reply_to_id: Optional message ID to reply to
 
         Returns:
-            bool: True if successful
+            Wappi response (with the sent message_id) or None if failed
         """
         try:
-            # Throttle if needed
-            self.throttle_if_needed()
-
             # Send message
             if reply_to_id:
                 response = self.wappi_client.reply_to_message(reply_to_id, message_text)
@@ -74,129 +235,281 @@ class MessageSenderService:
                 response = self.wappi_client.send_message(phone_number, message_text)
 
             if response and response.get("status") == "done":
-                self.message_count += 1
                 logger.success(f"✅ Sent message to {phone_number}")
-                return True
+                return response
 
             logger.error(f"❌ Failed to send message to {phone_number}")
-            return False
+            return None
 
         except Exception as e:
             logger.error(f"Error sending message: {e}")
-            return False
+            return None
 
-    def mark_message_as_sent(self, message_id: str, db: Session, status: str = "sent") -> None:
-        """Update message status in database"""
-        try:
-            msg_id = message_id or f"outgoing_{int(datetime.now().timestamp())}"
-
-            # Check if message already exists
-            existing_message = db.query(MessageLog).filter(
-                MessageLog.message_id == msg_id
-            ).first()
-
-            if existing_message:
-                # Update existing message
-                existing_message.queue_status = status
-                existing_message.wappi_status = status
-                existing_message.processed_at = datetime.now()
-                db.commit()
-                logger.debug(f"Updated existing message {msg_id} status to {status}")
-            else:
-                # Create new message log
-                message_log = MessageLog(
-                    message_id=msg_id,
-                    phone_number="unknown",
-                    direction="outgoing",
-                    message_text="",
-                    queue_status=status,
-                    wappi_status=status,
-                    processed_at=datetime.now()
-                )
-                db.add(message_log)
-                db.commit()
-        except Exception as e:
-            logger.error(f"Failed to update message status: {e}")
-            db.rollback()
+    def wait_for_wappi(self, deliveries: List[tuple]) -> None:
+        """
+        Leave messages in the queue while the Wappi circuit is open
+
+        Only this worker waits; the consumer thread keeps heartbeats flowing.
+        The messages are requeued without counting a retry.
+        """
+        wait = max(1.0, wappi_circuit_breaker.retry_in())
+        logger.warning(f"⏸️  Wappi circuit open, requeueing {len(deliveries)} outgoing message(s) in {wait:.0f}s")
+        time.sleep(wait)
+        for ch, method, *_ in deliveries:
+            self.nack(ch, method, requeue=True)
 
     def process_outgoing_message(
         self,
         ch: pika.channel.Channel,
         method: pika.spec.Basic.Deliver,
         properties: pika.spec.BasicProperties,
-        body: bytes
+        body: bytes,
+        lane: str = "live"
     ) -> None:
-        """Process message from outgoing queue"""
-        db = next(get_db())
-
+        """Dispatch a message from an outgoing lane queue to its chat's worker"""
         try:
-            # Parse message
             message_data = json.loads(body.decode())
-            logger.info(f"📤 Processing outgoing message: {message_data}")
+        except Exception as e:
+            logger.error(f"Invalid outgoing message: {e}")
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
 
-            phone_number = message_data.get("phone_number")
-            message_text = message_data.get("message_text")
-            reply_to_id = message_data.get("reply_to_message_id")
-            mark_as_read = message_data.get("mark_as_read", False)
+        worker = self.worker_for(message_data.get("phone_number"))
+        worker.submit((ch, method, properties, body, message_data), lane)
+
+    @staticmethod
+    def dedupe_key(message_data: Dict[str, Any]) -> Tuple[str, str, str]:
+        return (
+            message_data.get("phone_number") or "",
+            message_data.get("reply_to_message_id") or "",
+            message_data.get("message_text") or ""
+        )
+
+    def is_recent_duplicate(self, key: Tuple[str, str, str]) -> bool:
+        """Whether the exact same message was sent to this chat within SENDER_DEDUPE_SECONDS"""
+        now = time.monotonic()
+        with self.recent_lock:
+            while self.recent_sends:
+                sent_at = next(iter(self.recent_sends.values()))
+                if now - sent_at < self.dedupe_seconds:
+                    break
+                self.recent_sends.popitem(last=False)
+            return key in self.recent_sends
+
+    def remember_sent(self, keys: List[Tuple[str, str, str]]) -> None:
+        now = time.monotonic()
+        with self.recent_lock:
+            for key in keys:
+                self.recent_sends[key] = now
+                self.recent_sends.move_to_end(key)
+
+    def coalesce(self, deliveries: List[tuple]) -> List[List[tuple]]:
+        """
+        Split one chat's deliveries into sends, in order
+
+        Only consecutive messages from the same lane that quote the same
+        customer message (or none) are merged, while the text fits one
+        message; anything else is sent back to back on its own, so every
+        reply keeps its quote and lanes are never mixed in one text.
+        """
+        if not self.coalesce_merge:
+            return [[delivery] for delivery in deliveries]
+
+        groups: List[List[tuple]] = []
+        current: List[tuple] = []
+        current_key = None
+        length = 0
+        for delivery in deliveries:
+            key = (self.lane_of(delivery[1]), delivery[4].get("reply_to_message_id") or None)
+            text_length = len(delivery[4]["message_text"])
+            if current and (key != current_key or length + 2 + text_length > self.coalesce_max_chars):
+                groups.append(current)
+                current, length = [], 0
+            current_key = key
+            length += text_length + (2 if current else 0)
+            current.append(delivery)
+
+        if current:
+            groups.append(current)
+        return groups
+
+    def handle_outgoing_messages(self, deliveries: List[tuple]) -> None:
+        """Send one chat's messages from a coalescing window (runs on a worker thread)"""
+        if wappi_circuit_breaker.is_open():
+            self.wait_for_wappi(deliveries)
+            return
+
+        pending = []
+        window_keys = set()
+        for delivery in deliveries:
+            ch, method, properties, body, message_data = delivery
+            logger.info(f"📤 Processing outgoing message: {message_data}")
 
-            if not phone_number or not message_text:
+            if not message_data.get("phone_number") or not message_data.get("message_text"):
                 logger.error("Missing phone_number or message_text")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
+                self.ack(ch, method)
+                continue
+
+            # Exact duplicates (same chat, reply target and text) are dropped
+            key = self.dedupe_key(message_data)
+            if key in window_keys or self.is_recent_duplicate(key):
+                logger.info(f"🔁 Dropping duplicate outgoing message to {message_data['phone_number']}")
+                with self.counter_lock:
+                    self.duplicates_dropped += 1
+                self.ack(ch, method)
+                continue
+
+            window_keys.add(key)
+            pending.append(delivery)
+
+        for group in self.coalesce(pending):
+            self.send_group(group)
+
+    def send_group(self, group: List[tuple]) -> None:
+        """Send one (possibly merged) message and settle all of its deliveries"""
+        messages = [delivery[4] for delivery in group]
+        phone_number = messages[0]["phone_number"]
+        message_text = "\n\n".join(message["message_text"] for message in messages)
+        # coalesce() only groups messages quoting the same customer message
+        reply_to_id = messages[0].get("reply_to_message_id") or None
+
+        if len(group) > 1:
+            with self.counter_lock:
+                self.merged_sends += 1
+                self.merged_messages += len(group)
+            logger.info(f"🧩 Coalesced {len(group)} messages to {phone_number} into one send")
 
+        try:
             # Send message
-            success = self.send_via_wappi(phone_number, message_text, reply_to_id)
+            response = self.send_via_wappi(phone_number, message_text, reply_to_id)
 
-            if success:
+            if response:
                 # Mark as read if requested
-                if mark_as_read and reply_to_id:
+                if reply_to_id and any(message.get("mark_as_read") for message in messages):
                     self.wappi_client.mark_as_read(reply_to_id)
 
-                # Update database
-                self.mark_message_as_sent(reply_to_id, db, "sent")
+                # Log write-behind; the flush happens off the send path
+                message_log_writer.record_outgoing(
+                    response.get("message_id") or f"outgoing_{uuid.uuid4().hex}",
+                    phone_number,
+                    message_text,
+                    "sent",
+                    [reply_to_id] if reply_to_id else None
+                )
+                self.remember_sent([self.dedupe_key(message) for message in messages])
 
-                # Acknowledge message
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                # Acknowledge messages
+                sent_at = time.time()
+                for ch, method, _, _, message_data in group:
+                    self.ack(ch, method)
+                    self.record_lane_latency(self.lane_of(method), message_data, sent_at)
                 logger.success(f"✅ Message sent successfully to {phone_number}")
+            elif wappi_circuit_breaker.is_open():
+                # Circuit opened during this send; not the messages' fault
+                self.wait_for_wappi(group)
             else:
-                # Retry logic: reject and requeue (will retry up to 3 times)
-                retry_count = properties.headers.get("x-retry-count", 0) if properties.headers else 0
-
-                if retry_count < 3:
-                    logger.warning(f"Retrying message (attempt {retry_count + 1}/3)")
-
-                    # Update retry count
-                    headers = properties.headers or {}
-                    headers["x-retry-count"] = retry_count + 1
-
-                    # Requeue with updated headers
-                    ch.basic_publish(
-                        exchange='',
-                        routing_key=settings.QUEUE_OUTGOING_MESSAGES,
-                        body=body,
-                        properties=pika.BasicProperties(headers=headers)
-                    )
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
-                else:
-                    # Max retries reached, log as failed
-                    logger.error(f"❌ Failed to send after 3 retries: {phone_number}")
-                    self.mark_message_as_sent(reply_to_id, db, "failed")
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                for delivery in group:
+                    self.schedule_retry(*delivery)
 
         except Exception as e:
             logger.error(f"Error processing outgoing message: {e}")
             # Acknowledge to remove from queue
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            for ch, method, *_ in group:
+                self.ack(ch, method)
 
-        finally:
-            db.close()
+    def schedule_retry(
+        self,
+        ch: pika.channel.Channel,
+        method: pika.spec.Basic.Deliver,
+        properties: pika.spec.BasicProperties,
+        body: bytes,
+        message_data: Dict[str, Any]
+    ) -> None:
+        """Delayed retry (5s/30s/2min tiers), then the dead-letter queue"""
+        phone_number = message_data["phone_number"]
+        retry_count = QueueManager.retry_count(properties)
+
+        if retry_count < self.max_retries:
+            logger.warning(f"Scheduling delayed retry (attempt {retry_count + 1}/{self.max_retries})")
+        else:
+            logger.error(f"❌ Failed to send after {self.max_retries} retries, dead-lettering: {phone_number}")
+            reply_to_id = message_data.get("reply_to_message_id")
+            message_log_writer.record_outgoing(
+                f"failed_{uuid.uuid4().hex}",
+                phone_number,
+                message_data["message_text"],
+                "failed",
+                [reply_to_id] if reply_to_id else None
+            )
+
+        # Publish before ack, both on the connection thread; retries return to the same lane
+        self._threadsafe(functools.partial(
+            self.queue_manager.publish_retry,
+            QueueManager.OUTGOING_LANES[self.lane_of(method)],
+            body,
+            properties,
+            self.max_retries,
+            f"send failed for {phone_number}"
+        ))
+        self.ack(ch, method)
+
+    def record_lane_latency(self, lane: str, message_data: Dict[str, Any], sent_at: float) -> None:
+        """Producer enqueue -> sent latency, from the `enqueued_at` tag set by the AI agent"""
+        enqueued_at = message_data.get("enqueued_at")
+        with self.counter_lock:
+            self.lane_sent[lane] += 1
+            if isinstance(enqueued_at, (int, float)):
+                self.lane_latency[lane].append(max(0.0, sent_at - enqueued_at) * 1000)
+
+    def lane_stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for lane, weight in self.lane_weights.items():
+            with self.counter_lock:
+                latency = list(self.lane_latency[lane])
+                sent = self.lane_sent[lane]
+            lanes[lane] = {
+                "queue": QueueManager.OUTGOING_LANES[lane],
+                "weight": weight,
+                "sent": sent,
+                "avg_latency_ms": round(sum(latency) / len(latency), 1) if latency else 0.0,
+                "p95_latency_ms": SenderWorker._percentile(latency, 0.95)
+            }
+        return lanes
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-lane and per-worker queue depth and latency, coalescing and dedupe counts"""
+        with self.counter_lock:
+            coalescing = {
+                "window_ms": settings.SENDER_COALESCE_MS,
+                "merged_sends": self.merged_sends,
+                "merged_messages": self.merged_messages,
+                "sends_saved": self.merged_messages - self.merged_sends,
+                "duplicates_dropped": self.duplicates_dropped
+            }
+        return {
+            "workers": self.num_workers,
+            "lanes": self.lane_stats(),
+            "coalescing": coalescing,
+            "per_worker": {f"worker_{worker.index}": worker.stats() for worker in self.workers}
+        }
 
     def start_consuming(self) -> None:
-        """Start consuming messages from outgoing queue"""
-        logger.info(f"🚀 Started sender service, consuming from {settings.QUEUE_OUTGOING_MESSAGES}")
+        """Start worker threads and consume from the outgoing lane queues"""
+        message_log_writer.start()
+        for worker in self.workers:
+            worker.start()
+
+        # Prefetch applies per lane consumer, so a follow-up backlog cannot take the live lane's slots
+        prefetch_count = self.num_workers * settings.SENDER_PREFETCH_PER_WORKER
+        logger.info(
+            f"🚀 Started sender service with {self.num_workers} workers "
+            f"(prefetch {prefetch_count} per lane), lane weights {self.lane_weights}"
+        )
 
-        self.queue_manager.consume(
-            queue_name=settings.QUEUE_OUTGOING_MESSAGES,
-            callback=self.process_outgoing_message,
-            prefetch_count=1
+        self.queue_manager.consume_many(
+            {
+                QueueManager.OUTGOING_LANES[lane]: functools.partial(self.process_outgoing_message, lane=lane)
+                for lane in self.lane_weights
+            },
+            prefetch_count=prefetch_count
         )
@@ -0,0 +1,430 @@
+"""
+Transcription Backends
+OpenAI Whisper, Gemini and an optional local faster-whisper engine behind one interface,
+plus the router that picks one per voice note
+"""
+import os
+import threading
+import time
+import traceback
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Any, IO, List, Optional, Tuple
+from loguru import logger
+import google.generativeai as genai
+from openai import OpenAI, BadRequestError
+
+from services.audio_transcoder import AudioTranscoder, voice_stage_metrics
+from config.settings import settings
+from utils.metrics import metrics_registry
+
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+try:
+    from faster_whisper import BatchedInferencePipeline
+except ImportError:
+    BatchedInferencePipeline = None
+
+Upload = Tuple[str, IO[bytes]]
+
+
+def ogg_duration(audio_file: IO[bytes]) -> Optional[float]:
+    """
+    Duration of an OGG/Opus file from its last page's granule position
+
+    Reads only the header and the tail of the file. Returns None for
+    anything that is not OGG/Opus.
+    """
+    try:
+        audio_file.seek(0)
+        head = audio_file.read(64)
+        if not head.startswith(b"OggS") or b"OpusHead" not in head:
+            return None
+        opus_head = head.index(b"OpusHead")
+        pre_skip = int.from_bytes(head[opus_head + 10:opus_head + 12], "little")
+
+        audio_file.seek(0, os.SEEK_END)
+        size = audio_file.tell()
+        audio_file.seek(max(0, size - 65536))
+        tail = audio_file.read()
+        last_page = tail.rfind(b"OggS")
+        if last_page < 0 or last_page + 14 > len(tail):
+            return None
+
+        granule = int.from_bytes(tail[last_page + 6:last_page + 14], "little")
+        return max(0.0, (granule - pre_skip) / 48000)  # Opus granules are always 48 kHz
+    except Exception as e:
+        logger.debug(f"Could not read OGG duration: {e}")
+        return None
+    finally:
+        audio_file.seek(0)
+
+
+class TranscriptionBackend(ABC):
+    """One engine that turns a voice note into text"""
+
+    name = "backend"
+    remote = True
+
+    @abstractmethod
+    def transcribe(self, audio_file: IO[bytes], upload: Optional[Upload] = None) -> Optional[str]:
+        """
+        Transcribe a voice note
+
+        Args:
+            audio_file: Downloaded audio (OGG/Opus from WhatsApp)
+            upload: Preprocessed or pre-transcoded audio from the transcode stage, if any
+
+        Returns:
+            Transcription text or None if it failed
+        """
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """OpenAI Whisper API (OGG passthrough, MP3 via ffmpeg otherwise)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str):
+        logger.info("Initializing OpenAI Whisper API for voice transcription...")
+        self.client = OpenAI(api_key=api_key)
+
+        # Warm ffmpeg processes are only needed when MP3 is the primary upload format
+        self.transcoder = AudioTranscoder(
+            pool_size=0 if settings.VOICE_OGG_PASSTHROUGH else settings.VOICE_TRANSCODE_POOL,
+            bitrate=settings.VOICE_TRANSCODE_BITRATE,
+            timeout=settings.VOICE_TRANSCODE_TIMEOUT
+        )
+        metrics_registry.register("voice_transcoder", self.transcoder.stats)
+        logger.success("OpenAI Whisper API initialized successfully")
+
+    @property
+    def needs_mp3(self) -> bool:
+        return not settings.VOICE_OGG_PASSTHROUGH
+
+    def transcode_to_mp3(self, audio_file: IO[bytes]) -> Optional[Upload]:
+        """Pipe audio through a warm ffmpeg process; returns an upload tuple or None"""
+        started = time.perf_counter()
+        mp3_buffer = self.transcoder.to_mp3(audio_file)
+        voice_stage_metrics.record("transcode", started)
+
+        if not mp3_buffer:
+            return None
+
+        logger.debug(f"Converted OGG to MP3 ({mp3_buffer.getbuffer().nbytes} bytes)")
+        return ("voice.mp3", mp3_buffer)
+
+    def whisper_request(self, upload: Upload) -> str:
+        """One Whisper API call (upload and transcription are a single request)"""
+        upload[1].seek(0)
+        started = time.perf_counter()
+        try:
+            transcript = self.client.audio.transcriptions.create(
+                model="whisper-1",
+                file=upload,
+                language="ru"  # Russian/Kazakh transcription
+            )
+        finally:
+            voice_stage_metrics.record("transcribe", started)
+        return transcript.text.strip()
+
+    def transcribe(self, audio_file: IO[bytes], upload: Optional[Upload] = None) -> Optional[str]:
+        try:
+            if upload:
+                # Already preprocessed/converted by the transcode stage
+                transcription = self.whisper_request(upload)
+            elif not self.needs_mp3:
+                # Whisper accepts OGG/Opus directly: no decode or encode at all
+                audio_file.seek(0)
+                voice_stage_metrics.record_passthrough()
+                try:
+                    transcription = self.whisper_request(("voice.ogg", audio_file))
+                except BadRequestError as e:
+                    logger.warning(f"Whisper rejected the OGG upload ({e}), retrying as MP3")
+                    upload = self.transcode_to_mp3(audio_file)
+                    if not upload:
+                        return None
+                    transcription = self.whisper_request(upload)
+            else:
+                upload = self.transcode_to_mp3(audio_file)
+                if not upload:
+                    return None
+                transcription = self.whisper_request(upload)
+
+            if transcription:
+                logger.success(f"OpenAI Whisper transcribed: {transcription[:100]}...")
+                return transcription
+            else:
+                logger.warning("OpenAI Whisper returned empty transcription")
+                return None
+
+        except Exception as e:
+            logger.error(f"OpenAI Whisper transcription error: {e}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            return None
+
+
+class GeminiBackend(TranscriptionBackend):
+    """Google Gemini (file upload + generate_content)"""
+
+    name = "gemini"
+
+    PROMPT = "Транскрибируй это голосовое сообщение на русском или казахском языке. Верни только текст транскрипции, без комментариев и пояснений."
+
+    def __init__(self, api_key: str, model_name: str):
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name=model_name)
+        logger.success(f"Gemini transcription initialized ({model_name})")
+
+    def transcribe(self, audio_file: IO[bytes], upload: Optional[Upload] = None) -> Optional[str]:
+        try:
+            # Upload the (preprocessed) file object with explicit MIME type
+            # WhatsApp voice messages are typically Opus codec in OGG container
+            source, mime_type = audio_file, "audio/ogg"
+            if upload:
+                source, mime_type = upload[1], "audio/mpeg" if upload[0].endswith(".mp3") else "audio/ogg"
+            source.seek(0)
+            started = time.perf_counter()
+            uploaded_file = genai.upload_file(
+                path=source,
+                mime_type=mime_type  # Explicitly set MIME type, file objects have no extension
+            )
+            voice_stage_metrics.record("upload", started)
+            logger.debug(f"Uploaded audio file to Gemini: {uploaded_file.name}")
+
+            # Generate transcription
+            started = time.perf_counter()
+            response = self.model.generate_content([self.PROMPT, uploaded_file])
+            voice_stage_metrics.record("transcribe", started)
+            transcription = response.text.strip()
+
+            # Delete uploaded file from Gemini to save quota
+            try:
+                genai.delete_file(uploaded_file.name)
+                logger.debug(f"Deleted uploaded file from Gemini: {uploaded_file.name}")
+            except Exception as e:
+                logger.warning(f"Failed to delete file from Gemini: {e}")
+
+            if transcription:
+                logger.success(f"Gemini transcribed: {transcription[:100]}...")
+                return transcription
+            else:
+                logger.warning("Gemini returned empty transcription")
+                return None
+
+        except Exception as e:
+            logger.error(f"Gemini transcription error: {e}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            return None
+
+
+def parse_cpu_list(value: str) -> List[int]:
+    """"0-3,6" -> [0, 1, 2, 3, 6]"""
+    cores = []
+    for part in value.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cores.extend(range(int(start), int(end) + 1))
+        elif part:
+            cores.append(int(part))
+    return cores
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Offline CPU transcription with faster-whisper (CTranslate2, int8 quantized)
+
+    The model is loaded once and shared: `num_workers` lets that many
+    transcribe threads run on it concurrently, each with `cpu_threads`
+    intra-op threads. With LOCAL_WHISPER_CPU_AFFINITY the model is loaded
+    from a thread pinned to those cores, so the CTranslate2 threads it
+    starts inherit the pinning; the rest of the gateway is not pinned.
+    """
+
+    name = "local"
+    remote = False
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self.cores = parse_cpu_list(settings.LOCAL_WHISPER_CPU_AFFINITY) if settings.LOCAL_WHISPER_CPU_AFFINITY else []
+        core_count = len(self.cores) or os.cpu_count() or 1
+        self.cpu_threads = settings.LOCAL_WHISPER_CPU_THREADS or max(1, core_count // self.workers)
+        self.model = None
+        self.batched = None
+
+        started = time.perf_counter()
+        loader = threading.Thread(target=self._load, name="local-whisper-loader")
+        loader.start()
+        loader.join()
+        if not self.model:
+            raise RuntimeError("local Whisper model failed to load")
+        logger.success(
+            f"Local Whisper '{settings.LOCAL_WHISPER_MODEL}' ({settings.LOCAL_WHISPER_COMPUTE_TYPE}) loaded in "
+            f"{time.perf_counter() - started:.1f}s: {self.workers} workers x {self.cpu_threads} threads"
+            + (f", pinned to cores {self.cores}" if self.cores else "")
+        )
+
+    def _load(self) -> None:
+        try:
+            if self.cores and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, self.cores)  # this thread only; CTranslate2 threads inherit it
+
+            self.model = WhisperModel(
+                settings.LOCAL_WHISPER_MODEL,
+                device="cpu",
+                compute_type=settings.LOCAL_WHISPER_COMPUTE_TYPE,
+                cpu_threads=self.cpu_threads,
+                num_workers=self.workers
+            )
+            if BatchedInferencePipeline and settings.LOCAL_WHISPER_BATCH_SIZE > 1:
+                self.batched = BatchedInferencePipeline(model=self.model)
+        except Exception as e:
+            logger.error(f"Failed to load local Whisper model: {e}")
+
+    def transcribe(self, audio_file: IO[bytes], upload: Optional[Upload] = None) -> Optional[str]:
+        try:
+            source = upload[1] if upload else audio_file
+            source.seek(0)
+            started = time.perf_counter()
+            if self.batched:
+                # Decodes the clip's 30s windows as one batch instead of one after another
+                segments, info = self.batched.transcribe(
+                    source, language="ru", batch_size=settings.LOCAL_WHISPER_BATCH_SIZE
+                )
+            else:
+                segments, info = self.model.transcribe(source, language="ru", beam_size=1)
+            transcription = " ".join(segment.text.strip() for segment in segments).strip()
+            voice_stage_metrics.record("transcribe", started)
+
+            if transcription:
+                logger.success(f"Local Whisper transcribed {info.duration:.1f}s: {transcription[:100]}...")
+                return transcription
+            else:
+                logger.warning("Local Whisper returned empty transcription")
+                return None
+
+        except Exception as e:
+            logger.error(f"Local Whisper transcription error: {e}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            return None
+
+
+class TranscriptionRouter:
+    """
+    Picks a backend per voice note and falls back to the others on failure
+
+    TRANSCRIPTION_ROUTING:
+    - remote: the configured remote backend (TRANSCRIPTION_BACKEND)
+    - local: the local engine
+    - auto: local for clips up to LOCAL_MAX_SECONDS while fewer than
+      LOCAL_MAX_QUEUE notes are on it or waiting for transcription;
+      longer clips, unknown durations and overflow go remote
+    """
+
+    def __init__(self, mode: str, primary: str, local_workers: int):
+        self.mode = mode
+        self.backends: Dict[str, TranscriptionBackend] = {}
+
+        if settings.OPENAI_API_KEY:
+            self.backends["openai"] = OpenAIWhisperBackend(settings.OPENAI_API_KEY)
+        if settings.GEMINI_API_KEY:
+            self.backends["gemini"] = GeminiBackend(settings.GEMINI_API_KEY, settings.GEMINI_MODEL)
+
+        if mode in ("local", "auto"):
+            if not FASTER_WHISPER_AVAILABLE:
+                logger.warning(f"TRANSCRIPTION_ROUTING={mode} but 'faster-whisper' is not installed, using remote backends")
+            else:
+                try:
+                    self.backends["local"] = LocalWhisperBackend(local_workers)
+                except Exception as e:
+                    logger.error(f"Local transcription disabled: {e}")
+
+        # Remote backends in preference order
+        self.remote_order = [name for name in dict.fromkeys((primary, "openai", "gemini")) if name in self.backends]
+        if not self.backends:
+            logger.error("No transcription backend configured (set OPENAI_API_KEY or GEMINI_API_KEY)")
+
+        self.lock = threading.Lock()
+        self.local_in_flight = 0
+        self.routed = {name: 0 for name in self.backends}
+        self.failures = {name: 0 for name in self.backends}
+        self.latency_ms = {name: deque(maxlen=200) for name in self.backends}
+
+    def choose(self, duration: Optional[float], queue_depth: int) -> Optional[str]:
+        """Backend for a note of `duration` seconds with `queue_depth` notes waiting for transcription"""
+        if "local" in self.backends:
+            if self.mode == "local":
+                return "local"
+            if self.mode == "auto" and duration is not None and duration <= settings.LOCAL_MAX_SECONDS:
+                with self.lock:
+                    if self.local_in_flight + queue_depth < settings.LOCAL_MAX_QUEUE:
+                        return "local"
+        return self.remote_order[0] if self.remote_order else None
+
+    def needs_mp3(self, backend: Optional[str]) -> bool:
+        """Whether the transcode stage should convert for this backend"""
+        return backend == "openai" and self.backends["openai"].needs_mp3
+
+    def transcode(self, audio_file: IO[bytes]) -> Optional[Upload]:
+        return self.backends["openai"].transcode_to_mp3(audio_file)
+
+    def transcribe(
+        self,
+        backend: Optional[str],
+        audio_file: IO[bytes],
+        upload: Optional[Upload] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Transcribe with the chosen backend, then the remaining ones in order
+
+        Returns:
+            (transcription, backend name) or (None, None) if all failed
+        """
+        order = [backend] if backend else []
+        order += [name for name in self.remote_order + ["local"] if name in self.backends and name not in order]
+
+        for name in order:
+            if name == "local":
+                with self.lock:
+                    self.local_in_flight += 1
+
+            started = time.perf_counter()
+            try:
+                transcription = self.backends[name].transcribe(audio_file, upload)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with self.lock:
+                    if name == "local":
+                        self.local_in_flight -= 1
+                    self.routed[name] += 1
+                    self.latency_ms[name].append(elapsed_ms)
+
+            if transcription:
+                return transcription, name
+
+            with self.lock:
+                self.failures[name] += 1
+            logger.warning(f"Transcription backend '{name}' failed, trying the next one")
+
+        return None, None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "remote_order": self.remote_order,
+                "local_in_flight": self.local_in_flight,
+                "backends": {
+                    name: {
+                        "calls": self.routed[name],
+                        "failures": self.failures[name],
+                        "avg_ms": round(sum(self.latency_ms[name]) / len(self.latency_ms[name]), 1) if self.latency_ms[name] else 0.0
+                    }
+                    for name in self.backends
+                }
+            }
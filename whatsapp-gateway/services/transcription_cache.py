@@ -0,0 +1,154 @@
+"""
+Transcription Cache
+Content-hash cache of transcriptions: in-memory LRU in front of the transcription_cache table
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, IO, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from loguru import logger
+
+from config.database import SessionLocal
+from config.settings import settings
+from models.transcription_cache import TranscriptionCacheEntry
+from utils.metrics import metrics_registry
+
+
+class TranscriptionCache:
+    """
+    Transcriptions keyed by the SHA-256 of the audio bytes
+
+    Forwarded voice notes, retries and redeliveries carry the same audio,
+    so a hit answers them without another backend call. Entries expire
+    after `ttl_seconds` in both tiers; expired rows are purged every
+    `purge_every` writes.
+    """
+
+    def __init__(self, lru_size: int, ttl_seconds: int, purge_every: int = 100):
+        self.lru_size = max(1, lru_size)
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.purge_every = purge_every
+        self.lru: "OrderedDict[str, Tuple[str, float, datetime]]" = OrderedDict()  # hash -> (text, cost s, cached at)
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def audio_hash(audio_file: IO[bytes]) -> str:
+        """SHA-256 of the whole file, read in chunks (leaves the file at offset 0)"""
+        digest = hashlib.sha256()
+        audio_file.seek(0)
+        for chunk in iter(lambda: audio_file.read(settings.MEDIA_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        audio_file.seek(0)
+        return digest.hexdigest()
+
+    def get(self, audio_hash: str) -> Optional[str]:
+        """Cached transcription or None (memory first, then the database)"""
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            entry = self.lru.get(audio_hash)
+            if entry and now - entry[2] < self.ttl:
+                self.lru.move_to_end(audio_hash)
+                self.memory_hits += 1
+                self.saved_seconds += entry[1]
+                return entry[0]
+            if entry:
+                del self.lru[audio_hash]
+
+        row = None
+        db = SessionLocal()
+        try:
+            row = db.query(TranscriptionCacheEntry).filter(
+                TranscriptionCacheEntry.audio_hash == audio_hash,
+                TranscriptionCacheEntry.created_at >= now - self.ttl
+            ).first()
+        except Exception as e:
+            logger.error(f"Transcription cache lookup failed: {e}")
+        finally:
+            db.close()
+
+        with self.lock:
+            if not row:
+                self.misses += 1
+                return None
+
+            cost = (row.transcribe_ms or 0) / 1000
+            self._remember(audio_hash, row.transcription, cost, row.created_at)
+            self.db_hits += 1
+            self.saved_seconds += cost
+            return row.transcription
+
+    def _remember(self, audio_hash: str, transcription: str, cost: float, cached_at: datetime) -> None:
+        """Insert into the LRU (call with the lock held)"""
+        self.lru[audio_hash] = (transcription, cost, cached_at)
+        self.lru.move_to_end(audio_hash)
+        while len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def put(self, audio_hash: str, transcription: str, cost_seconds: float, backend: str) -> None:
+        """Store a fresh transcription in both tiers"""
+        with self.lock:
+            self._remember(audio_hash, transcription, cost_seconds, datetime.now(timezone.utc))
+            self.writes += 1
+            purge = self.writes % self.purge_every == 0
+
+        db = SessionLocal()
+        try:
+            stmt = insert(TranscriptionCacheEntry).values(
+                audio_hash=audio_hash,
+                transcription=transcription,
+                backend=backend,
+                transcribe_ms=int(cost_seconds * 1000)
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[TranscriptionCacheEntry.audio_hash],
+                set_={
+                    "transcription": stmt.excluded.transcription,
+                    "backend": stmt.excluded.backend,
+                    "transcribe_ms": stmt.excluded.transcribe_ms,
+                    "created_at": datetime.now(timezone.utc)
+                }
+            ))
+
+            if purge:
+                db.execute(delete(TranscriptionCacheEntry).where(
+                    TranscriptionCacheEntry.created_at < datetime.now(timezone.utc) - self.ttl
+                ))
+
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to store transcription in cache: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "lru_entries": len(self.lru),
+                "lru_size": self.lru_size,
+                "ttl_seconds": int(self.ttl.total_seconds()),
+                "lookups": lookups,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else None,
+                "saved_seconds": round(self.saved_seconds, 1)
+            }
+
+
+# Global transcription cache instance
+transcription_cache = TranscriptionCache(
+    lru_size=settings.TRANSCRIPTION_CACHE_SIZE,
+    ttl_seconds=settings.TRANSCRIPTION_CACHE_TTL
+)
+metrics_registry.register("transcription_cache", transcription_cache.stats)
@@ -1,45 +1,201 @@
 """
 Voice Transcription Service
-Transcribes voice messages using OpenAI Whisper API with OGG to MP3 conversion
+Transcribes voice messages with pluggable backends (OpenAI Whisper, Gemini, local faster-whisper)
+in a staged pipeline: download, transcode and transcribe pools connected by bounded queues
 """
+import functools
 import json
+import os
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Callable, IO, Optional, Tuple
 from loguru import logger
 import pika
-import google.generativeai as genai
-from openai import OpenAI
-from pydub import AudioSegment
-import tempfile
-import os
 
 from services.wappi_client import WappiClient
+from services.audio_preprocessor import AudioPreprocessor, PreprocessResult
+from services.chunked_transcription import ChunkedTranscriber
+from services.audio_transcoder import voice_stage_metrics
+from services.transcription_backends import TranscriptionRouter, ogg_duration
+from services.circuit_breaker import wappi_circuit_breaker
+from services.transcription_cache import transcription_cache
 from config.queue import QueueManager
 from config.settings import settings
 from config.database import get_db
 from models.message_log import MessageLog
+from utils.metrics import metrics_registry
+
+# Published instead of a transcription when the VAD finds no speech in a note
+NO_SPEECH_TRANSCRIPTION = '[Голосовое сообщение без речи]'
+
+
+class VoiceJob:
+    """One voice note moving through the pipeline"""
+
+    def __init__(
+        self,
+        ch: pika.channel.Channel,
+        method: pika.spec.Basic.Deliver,
+        properties: pika.spec.BasicProperties,
+        body: bytes,
+        message_data: Dict[str, Any]
+    ):
+        self.ch = ch
+        self.method = method
+        self.properties = properties
+        self.body = body
+        self.message_data = message_data
+        self.message_id = message_data.get("message_id")
+        self.audio_file: Optional[IO[bytes]] = None
+        self.upload: Optional[Tuple[str, IO[bytes]]] = None  # preprocessed or pre-transcoded audio, if any
+        self.samples = None  # trimmed 16 kHz PCM of long notes, for chunked transcription
+        self.audio_hash: Optional[str] = None
+        self.backend: Optional[str] = None  # chosen by the router in the transcode stage
+        self.received_at = time.perf_counter()
+
+
+class StagePool:
+    """
+    Fixed set of threads draining one bounded stage queue
+
+    A full queue blocks the previous stage, so at most `queue_size` notes
+    wait in front of each stage. Handlers pass the job on or settle it;
+    a handler exception goes to `on_error`, which must settle the job.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        handler: Callable[[VoiceJob], None],
+        on_error: Callable[[VoiceJob, Exception], None],
+        queue_size: int
+    ):
+        self.name = name
+        self.handler = handler
+        self.on_error = on_error
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.threads = [
+            threading.Thread(target=self.run, name=f"voice-{name}-{index}", daemon=True)
+            for index in range(max(1, workers))
+        ]
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.processed = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, job: VoiceJob) -> None:
+        """Hand a job to this stage (blocks while the stage queue is full)"""
+        self.queue.put(job)
+
+    def run(self) -> None:
+        while True:
+            job = self.queue.get()
+            with self.lock:
+                self.busy += 1
+            try:
+                self.handler(job)
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                try:
+                    self.on_error(job, e)
+                except Exception as settle_error:
+                    logger.error(f"Voice {self.name} stage could not settle a failed job: {settle_error}")
+            finally:
+                with self.lock:
+                    self.busy -= 1
+                    self.processed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "workers": len(self.threads),
+                "busy": self.busy,
+                "queued": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "processed": self.processed,
+                "errors": self.errors
+            }
 
 
 class VoiceTranscriptionService:
-    """Service to transcribe voice messages using OpenAI Whisper API or Google Gemini API (fallback)"""
+    """Service to transcribe voice messages using OpenAI Whisper, Gemini or a local Whisper model"""
 
     def __init__(self):
         self.wappi_client = WappiClient()
         self.queue_manager = QueueManager()  # Dedicated instance for this consumer
+        self.max_retries = 2
 
-        # Initialize OpenAI Whisper API (Primary - with OGG to MP3 conversion)
-        logger.info("Initializing OpenAI Whisper API for voice transcription...")
-        self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.use_openai = True
-        logger.success("OpenAI Whisper API initialized successfully")
+        # Transcription backends and the routing policy between them
+        self.router = TranscriptionRouter(
+            mode=settings.TRANSCRIPTION_ROUTING,
+            primary=settings.TRANSCRIPTION_BACKEND,
+            local_workers=settings.VOICE_TRANSCRIBE_WORKERS
+        )
+        metrics_registry.register("transcription_backends", self.router.stats)
+
+        # 16 kHz mono, silence trimmed and long pauses compressed before upload
+        self.preprocessor = None
+        if settings.VOICE_PREPROCESS:
+            self.preprocessor = AudioPreprocessor(
+                pool_size=settings.VOICE_TRANSCODE_POOL,
+                frame_ms=settings.VOICE_VAD_FRAME_MS,
+                threshold_db=settings.VOICE_VAD_THRESHOLD_DB,
+                margin_db=settings.VOICE_VAD_MARGIN_DB,
+                padding_ms=settings.VOICE_VAD_PADDING_MS,
+                max_pause_ms=settings.VOICE_VAD_MAX_PAUSE_MS,
+                bitrate=settings.VOICE_PREPROCESS_BITRATE,
+                output_format="ogg" if settings.VOICE_OGG_PASSTHROUGH else "mp3",
+                timeout=settings.VOICE_TRANSCODE_TIMEOUT
+            )
+            metrics_registry.register("voice_preprocessor", self.preprocessor.stats)
+            if not self.preprocessor.available:
+                self.preprocessor = None
+
+        # Long notes are split at pauses and transcribed as concurrent chunks (needs preprocessing)
+        self.chunker = None
+        if settings.VOICE_CHUNKING and self.preprocessor:
+            self.chunker = ChunkedTranscriber(
+                self.preprocessor,
+                self.router,
+                workers=settings.VOICE_CHUNK_WORKERS,
+                threshold_seconds=settings.VOICE_CHUNK_THRESHOLD_SECONDS,
+                chunk_seconds=settings.VOICE_CHUNK_MAX_SECONDS,
+                overlap_ms=settings.VOICE_CHUNK_OVERLAP_MS
+            )
+            metrics_registry.register("voice_chunking", self.chunker.stats)
 
-    def download_audio(self, message_id: str) -> bytes:
-        """Download audio file from Wappi API"""
+        # Staged pipeline: the next note downloads while the current one transcribes
+        self.download_pool = StagePool(
+            "download", settings.VOICE_DOWNLOAD_WORKERS, self.download_stage, self.fail_job,
+            settings.VOICE_MAX_IN_FLIGHT  # fed by the consumer, never blocks it (prefetch = VOICE_MAX_IN_FLIGHT)
+        )
+        self.transcode_pool = StagePool(
+            "transcode", settings.VOICE_TRANSCODE_WORKERS or os.cpu_count() or 1, self.transcode_stage, self.fail_job,
+            settings.VOICE_STAGE_QUEUE_SIZE
+        )
+        self.transcribe_pool = StagePool(
+            "transcribe", settings.VOICE_TRANSCRIBE_WORKERS, self.transcribe_stage, self.fail_job,
+            settings.VOICE_STAGE_QUEUE_SIZE
+        )
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+        metrics_registry.register("voice_stages", self.stats)
+
+    def download_audio(self, message_id: str) -> IO[bytes]:
+        """Stream audio file from Wappi API into a size-capped spooled file"""
         try:
-            audio_bytes = self.wappi_client.get_message_file(message_id)
-            if audio_bytes:
+            audio_file = self.wappi_client.download_message_file(message_id)
+            if audio_file:
                 logger.success(f"Downloaded audio for message {message_id}")
-                return audio_bytes
+                return audio_file
             else:
                 logger.error(f"Failed to download audio for message {message_id}")
                 return None
@@ -47,119 +203,6 @@ class VoiceTranscriptionService:
             logger.error(f"Error downloading audio: {e}")
             return None
 
-    def transcribe_with_openai(self, audio_bytes: bytes) -> str:
-        """Transcribe audio using OpenAI Whisper API with OGG to MP3 conversion"""
-        ogg_file_path = None
-        mp3_file_path = None
-        try:
-            # Save OGG audio to temporary file
-            with tempfile.NamedTemporaryFile(suffix='.ogg', delete=False) as ogg_file:
-                ogg_file.write(audio_bytes)
-                ogg_file_path = ogg_file.name
-
-            logger.debug(f"Saved OGG audio to temp file: {ogg_file_path}")
-
-            # Convert OGG Opus to MP3 using pydub
-            audio = AudioSegment.from_file(ogg_file_path, format="ogg")
-            mp3_file_path = ogg_file_path.replace('.ogg', '.mp3')
-            audio.export(mp3_file_path, format="mp3", bitrate="64k")
-
-            logger.debug(f"Converted OGG to MP3: {mp3_file_path}")
-
-            # Transcribe with OpenAI Whisper
-            with open(mp3_file_path, "rb") as audio_file:
-                transcript = self.openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ru"  # Russian/Kazakh transcription
-                )
-
-            transcription = transcript.text.strip()
-
-            if transcription:
-                logger.success(f"OpenAI Whisper transcribed: {transcription[:100]}...")
-                return transcription
-            else:
-                logger.warning("OpenAI Whisper returned empty transcription")
-                return None
-
-        except Exception as e:
-            logger.error(f"OpenAI Whisper transcription error: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
-
-        finally:
-            # Clean up temp files
-            if ogg_file_path and os.path.exists(ogg_file_path):
-                try:
-                    os.unlink(ogg_file_path)
-                    logger.debug(f"Cleaned up OGG temp file: {ogg_file_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete OGG temp file: {e}")
-
-            if mp3_file_path and os.path.exists(mp3_file_path):
-                try:
-                    os.unlink(mp3_file_path)
-                    logger.debug(f"Cleaned up MP3 temp file: {mp3_file_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete MP3 temp file: {e}")
-
-    def transcribe_with_gemini(self, audio_bytes: bytes) -> str:
-        """Transcribe audio using Google Gemini API"""
-        temp_file = None
-        temp_file_path = None
-        try:
-            # Save audio to temporary file (Gemini needs file path)
-            with tempfile.NamedTemporaryFile(suffix='.ogg', delete=False) as temp_file:
-                temp_file.write(audio_bytes)
-                temp_file_path = temp_file.name
-
-            logger.debug(f"Saved audio to temp file: {temp_file_path}")
-
-            # Upload file to Gemini with explicit MIME type
-            # WhatsApp voice messages are typically Opus codec in OGG container
-            audio_file = genai.upload_file(
-                path=temp_file_path,
-                mime_type="audio/ogg"  # Explicitly set MIME type for OGG audio
-            )
-            logger.debug(f"Uploaded audio file to Gemini: {audio_file.name}")
-
-            # Generate transcription
-            prompt = "Транскрибируй это голосовое сообщение на русском или казахском языке. Верни только текст транскрипции, без комментариев и пояснений."
-
-            response = self.model.generate_content([prompt, audio_file])
-            transcription = response.text.strip()
-
-            # Delete uploaded file from Gemini to save quota
-            try:
-                genai.delete_file(audio_file.name)
-                logger.debug(f"Deleted uploaded file from Gemini: {audio_file.name}")
-            except Exception as e:
-                logger.warning(f"Failed to delete file from Gemini: {e}")
-
-            if transcription:
-                logger.success(f"Gemini transcribed: {transcription[:100]}...")
-                return transcription
-            else:
-                logger.warning("Gemini returned empty transcription")
-                return None
-
-        except Exception as e:
-            logger.error(f"Gemini transcription error: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
-
-        finally:
-            # Clean up temp file
-            if temp_file_path and os.path.exists(temp_file_path):
-                try:
-                    os.unlink(temp_file_path)
-                    logger.debug(f"Cleaned up temp file: {temp_file_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete temp file: {e}")
-
     def publish_transcription(
         self,
         original_data: Dict[str, Any],
@@ -175,17 +218,183 @@ class VoiceTranscriptionService:
                 "original_voice_url": original_data.get("voice_url", "")
             }
 
-            # Publish to incoming messages queue
-            queue_manager.publish(
+            # Publish to incoming messages queue (on the connection thread)
+            self._threadsafe(functools.partial(
+                self.queue_manager.publish,
                 settings.QUEUE_INCOMING_MESSAGES,
                 message_data
-            )
+            ))
 
             logger.success(f"Published transcription to incoming queue")
 
         except Exception as e:
             logger.error(f"Error publishing transcription: {e}")
 
+    def _threadsafe(self, callback: Callable) -> None:
+        """Run a channel operation on the consumer's connection thread"""
+        self.queue_manager.connection.add_callback_threadsafe(callback)
+
+    def settle(self, job: VoiceJob, action: str) -> None:
+        """Ack or requeue a finished job and release its audio"""
+        if action == "ack":
+            self._threadsafe(functools.partial(job.ch.basic_ack, delivery_tag=job.method.delivery_tag))
+        else:
+            self._threadsafe(functools.partial(job.ch.basic_nack, delivery_tag=job.method.delivery_tag, requeue=True))
+
+        if job.audio_file:
+            job.audio_file.close()
+        with self.in_flight_lock:
+            self.in_flight -= 1
+
+    def fail_job(self, job: VoiceJob, error: Exception) -> None:
+        logger.error(f"Error processing voice message {job.message_id}: {error}")
+        # Acknowledge to remove from queue
+        self.settle(job, "ack")
+
+    def retry_job(self, job: VoiceJob) -> None:
+        """Failed to transcribe: delayed retry, then the dead-letter queue"""
+        retry_count = QueueManager.retry_count(job.properties)
+
+        if retry_count < self.max_retries:
+            logger.warning(f"Scheduling delayed transcription retry (attempt {retry_count + 1}/{self.max_retries})")
+        else:
+            logger.error(f"❌ Failed to transcribe after {self.max_retries} retries, dead-lettering: {job.message_id}")
+
+        # Publish before ack, both on the connection thread
+        self._threadsafe(functools.partial(
+            self.queue_manager.publish_retry,
+            settings.QUEUE_VOICE_TRANSCRIPTION,
+            job.body,
+            job.properties,
+            self.max_retries,
+            f"transcription failed for {job.message_id}"
+        ))
+        self.settle(job, "ack")
+
+    def download_stage(self, job: VoiceJob) -> None:
+        """Stream audio into a spooled file, then hand the note to the transcode stage"""
+        started = time.perf_counter()
+        job.audio_file = self.download_audio(job.message_id)
+        voice_stage_metrics.record("download", started)
+
+        if not job.audio_file and wappi_circuit_breaker.is_open():
+            # Wappi is degraded: keep the voice message queued for later
+            wait = max(1.0, wappi_circuit_breaker.retry_in())
+            logger.warning(f"⏸️  Wappi circuit open, requeueing voice message in {wait:.0f}s")
+            time.sleep(wait)
+            self.settle(job, "nack")
+            return
+
+        if not job.audio_file:
+            logger.warning(f"Could not download audio for {job.message_id}, forwarding as text")
+            # Forward to AI agent as text message with [Voice message] placeholder
+            message_data_copy = job.message_data.copy()
+            message_data_copy['message_text'] = '[Голосовое сообщение - не удалось загрузить]'
+            message_data_copy['is_voice'] = False  # Treat as text since we can't transcribe
+
+            self._threadsafe(functools.partial(
+                self.queue_manager.publish,
+                settings.QUEUE_INCOMING_MESSAGES,
+                message_data_copy
+            ))
+            logger.info(f"📢 Forwarded failed voice message as text to AI agent")
+            self.settle(job, "ack")
+            return
+
+        # Same audio transcribed before (forward, retry, redelivery): answer without a backend call
+        job.audio_hash = transcription_cache.audio_hash(job.audio_file)
+        cached = transcription_cache.get(job.audio_hash)
+        if cached:
+            logger.info(f"♻️  Transcription cache hit for voice message {job.message_id}")
+            self.complete_job(job, cached)
+            return
+
+        self.transcode_pool.put(job)
+
+    def preprocess(self, job: VoiceJob) -> Optional[PreprocessResult]:
+        """VAD-trim the note into job.upload (None if preprocessing failed)"""
+        started = time.perf_counter()
+        result = self.preprocessor.process(job.audio_file)
+        voice_stage_metrics.record("preprocess", started)
+
+        if not result:
+            logger.warning(f"Preprocessing failed for {job.message_id}, sending the original audio")
+            return None
+        if not result.has_speech:
+            return result
+
+        job.upload = result.upload
+        if self.chunker and result.seconds_out > self.chunker.threshold_seconds:
+            job.samples = result.samples
+        logger.info(
+            f"🔇 Preprocessed voice message {job.message_id}: {result.bytes_in} -> {result.bytes_out} bytes, "
+            f"removed {result.seconds_removed:.1f}s of {result.seconds_in:.1f}s"
+        )
+        return result
+
+    def transcode_stage(self, job: VoiceJob) -> None:
+        """Preprocess, route the note by length and load, and convert to MP3 if still needed (CPU-bound)"""
+        result = self.preprocess(job) if self.preprocessor else None
+        if result and not result.has_speech:
+            # Nothing to transcribe: answer without a paid backend call
+            logger.info(f"🔇 No speech in voice message {job.message_id} ({result.seconds_in:.1f}s), skipping transcription")
+            self.complete_job(job, NO_SPEECH_TRANSCRIPTION)
+            return
+
+        duration = result.seconds_out if result else ogg_duration(job.audio_file)
+        job.backend = self.router.choose(duration, self.transcribe_pool.queue.qsize())
+
+        if not job.upload and self.router.needs_mp3(job.backend):
+            job.upload = self.router.transcode(job.audio_file)
+            if not job.upload:
+                self.retry_job(job)
+                return
+
+        self.transcribe_pool.put(job)
+
+    def transcribe_stage(self, job: VoiceJob) -> None:
+        """Transcription on the routed backend (others as fallback), then cache and complete the note"""
+        logger.info(f"Using '{job.backend}' backend for transcription")
+        started = time.perf_counter()
+        transcription = None
+        if self.chunker and self.chunker.should_chunk(job.backend, job.samples):
+            transcription, backend = self.chunker.transcribe(job.backend, job.samples)
+        if not transcription:
+            transcription, backend = self.router.transcribe(job.backend, job.audio_file, job.upload)
+
+        if not transcription:
+            self.retry_job(job)
+            return
+
+        if job.audio_hash:
+            transcription_cache.put(job.audio_hash, transcription, time.perf_counter() - started, backend)
+        self.complete_job(job, transcription)
+
+    def complete_job(self, job: VoiceJob, transcription: str) -> None:
+        """Message log update and publish; acks the note"""
+        # Update message log
+        db = next(get_db())
+        try:
+            message_log = db.query(MessageLog).filter(
+                MessageLog.message_id == job.message_id
+            ).first()
+
+            if message_log:
+                message_log.message_text = f"[ТРАНСКРИБАЦИЯ] {transcription}"
+                message_log.processed_at = datetime.now()
+                db.commit()
+        except Exception as e:
+            logger.error(f"Failed to update message log: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+        # Publish to incoming queue, then acknowledge
+        self.publish_transcription(job.message_data, transcription)
+        self.settle(job, "ack")
+        voice_stage_metrics.record("total", job.received_at)
+        logger.success(f"✅ Transcribed voice message {job.message_id}")
+
     def process_voice_message(
         self,
         ch: pika.channel.Channel,
@@ -193,101 +402,48 @@ class VoiceTranscriptionService:
         properties: pika.spec.BasicProperties,
         body: bytes
     ) -> None:
-        """Process voice message from queue"""
-        db = next(get_db())
-
+        """Hand a voice message from the queue to the download stage (runs on the connection thread)"""
         try:
             # Parse message
             message_data = json.loads(body.decode())
-            logger.info(f"🎤 Processing voice message: {message_data.get('message_id')}")
-
-            message_id = message_data.get("message_id")
-
-            if not message_id:
-                logger.error("Missing message_id")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-
-            # Download audio
-            audio_bytes = self.download_audio(message_id)
-
-            if not audio_bytes:
-                logger.warning(f"Could not download audio for {message_id}, forwarding as text")
-                # Forward to AI agent as text message with [Voice message] placeholder
-                message_data_copy = message_data.copy()
-                message_data_copy['message_text'] = '[Голосовое сообщение - не удалось загрузить]'
-                message_data_copy['is_voice'] = False  # Treat as text since we can't transcribe
-
-                from config.queue import queue_manager
-                queue_manager.publish(settings.QUEUE_INCOMING_MESSAGES, message_data_copy)
-                logger.info(f"📢 Forwarded failed voice message as text to AI agent")
-
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-
-            # Transcribe using OpenAI Whisper (primary) or Gemini (fallback)
-            if self.use_openai:
-                logger.info("Using OpenAI Whisper for transcription")
-                transcription = self.transcribe_with_openai(audio_bytes)
-            else:
-                logger.info("Using Gemini for transcription")
-                transcription = self.transcribe_with_gemini(audio_bytes)
-
-            if transcription:
-                # Update message log
-                try:
-                    message_log = db.query(MessageLog).filter(
-                        MessageLog.message_id == message_id
-                    ).first()
-
-                    if message_log:
-                        message_log.message_text = f"[ТРАНСКРИБАЦИЯ] {transcription}"
-                        message_log.processed_at = datetime.now()
-                        db.commit()
-                except Exception as e:
-                    logger.error(f"Failed to update message log: {e}")
-                    db.rollback()
-
-                # Publish to incoming queue
-                self.publish_transcription(message_data, transcription)
-
-                # Acknowledge
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                logger.success(f"✅ Transcribed voice message {message_id}")
-            else:
-                # Failed to transcribe, retry
-                retry_count = properties.headers.get("x-retry-count", 0) if properties.headers else 0
-
-                if retry_count < 2:
-                    logger.warning(f"Retrying transcription (attempt {retry_count + 1}/2)")
-
-                    headers = properties.headers or {}
-                    headers["x-retry-count"] = retry_count + 1
-
-                    ch.basic_publish(
-                        exchange='',
-                        routing_key=settings.QUEUE_VOICE_TRANSCRIPTION,
-                        body=body,
-                        properties=pika.BasicProperties(headers=headers)
-                    )
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
-                else:
-                    logger.error(f"❌ Failed to transcribe after 2 retries: {message_id}")
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
-
         except Exception as e:
-            logger.error(f"Error processing voice message: {e}")
+            logger.error(f"Invalid voice message: {e}")
             ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
 
-        finally:
-            db.close()
+        logger.info(f"🎤 Processing voice message: {message_data.get('message_id')}")
+
+        if not message_data.get("message_id"):
+            logger.error("Missing message_id")
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+
+        with self.in_flight_lock:
+            self.in_flight += 1
+        self.download_pool.put(VoiceJob(ch, method, properties, body, message_data))
+
+    def stats(self) -> Dict[str, Any]:
+        """Notes in flight and per-stage pool state"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": settings.VOICE_MAX_IN_FLIGHT,
+            "download": self.download_pool.stats(),
+            "transcode": self.transcode_pool.stats(),
+            "transcribe": self.transcribe_pool.stats()
+        }
 
     def start_consuming(self) -> None:
-        """Start consuming voice messages from queue"""
-        logger.info(f"🚀 Started voice transcription service, consuming from {settings.QUEUE_VOICE_TRANSCRIPTION}")
+        """Start the stage pools and consume voice messages from queue"""
+        for pool in (self.download_pool, self.transcode_pool, self.transcribe_pool):
+            pool.start()
+
+        logger.info(
+            f"🚀 Started voice transcription service, consuming from {settings.QUEUE_VOICE_TRANSCRIPTION} "
+            f"(up to {settings.VOICE_MAX_IN_FLIGHT} notes in flight)"
+        )
 
         self.queue_manager.consume(
             queue_name=settings.QUEUE_VOICE_TRANSCRIPTION,
             callback=self.process_voice_message,
-            prefetch_count=1
+            prefetch_count=settings.VOICE_MAX_IN_FLIGHT
         )
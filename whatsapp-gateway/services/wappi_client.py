@@ -2,16 +2,211 @@
 Wappi.pro API Client Wrapper
 Handles all interactions with Wappi WhatsApp API
 """
-import requests
+import httpx
+import tempfile
+import threading
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, IO
 from loguru import logger
 from config.settings import settings
+from utils.metrics import metrics_registry
+from services.rate_limiter import wappi_rate_limiter
+from services.circuit_breaker import wappi_circuit_breaker
 
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
-class WappiClient:
+
+class RequestTimer:
     """
-    Client for interacting with Wappi.pro WhatsApp API
+    Collects httpcore trace events for one request
+
+    Splits connection setup (TCP connect, TLS handshake) from server time
+    (request fully sent -> response headers received).
+    """
+
+    def __init__(self):
+        self.events: Dict[str, float] = {}
+
+    def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpx "trace" extension callback"""
+        # Drop the protocol prefix so http11 and http2 events share names
+        name = event_name.split(".", 1)[1] if event_name.startswith("http") else event_name
+        self.events[name] = time.perf_counter()
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """Async variant for httpx.AsyncClient"""
+        self.trace(event_name, info)
+
+    def _span(self, name: str) -> Optional[float]:
+        started = self.events.get(f"{name}.started")
+        completed = self.events.get(f"{name}.complete")
+        if started is None or completed is None:
+            return None
+        return (completed - started) * 1000
+
+    def phases(self) -> Dict[str, Optional[float]]:
+        """Phase durations in milliseconds (None when a phase did not happen)"""
+        server_ms = None
+        sent = self.events.get("send_request_body.complete")
+        received = self.events.get("receive_response_headers.complete")
+        if sent is not None and received is not None:
+            server_ms = (received - sent) * 1000
+
+        return {
+            "connect_ms": self._span("connection.connect_tcp"),
+            "tls_ms": self._span("connection.start_tls"),
+            "server_ms": server_ms
+        }
+
+
+class WappiHttpMetrics:
+    """Per-endpoint request timing, split into connect/TLS and server time"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, endpoint: str, timer: RequestTimer, total_ms: float, http_version: Optional[str]) -> None:
+        """Record one completed request"""
+        phases = timer.phases()
+        with self.lock:
+            entry = self.endpoints.setdefault(endpoint, {
+                "requests": 0,
+                "new_connections": 0,
+                "tls_handshakes": 0,
+                "connect_ms_total": 0.0,
+                "tls_ms_total": 0.0,
+                "server_ms_total": 0.0,
+                "total_ms_total": 0.0,
+                "http_versions": {}
+            })
+            entry["requests"] += 1
+            entry["total_ms_total"] += total_ms
+            if phases["connect_ms"] is not None:
+                entry["new_connections"] += 1
+                entry["connect_ms_total"] += phases["connect_ms"]
+            if phases["tls_ms"] is not None:
+                entry["tls_handshakes"] += 1
+                entry["tls_ms_total"] += phases["tls_ms"]
+            if phases["server_ms"] is not None:
+                entry["server_ms_total"] += phases["server_ms"]
+            if http_version:
+                entry["http_versions"][http_version] = entry["http_versions"].get(http_version, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Averages per endpoint; setup averages are over new connections only"""
+        with self.lock:
+            result = {}
+            for endpoint, entry in self.endpoints.items():
+                requests_count = entry["requests"] or 1
+                result[endpoint] = {
+                    "requests": entry["requests"],
+                    "new_connections": entry["new_connections"],
+                    "connection_reuse_rate": round(1 - entry["new_connections"] / requests_count, 4),
+                    "avg_connect_ms": round(entry["connect_ms_total"] / entry["new_connections"], 1) if entry["new_connections"] else None,
+                    "avg_tls_ms": round(entry["tls_ms_total"] / entry["tls_handshakes"], 1) if entry["tls_handshakes"] else None,
+                    "avg_server_ms": round(entry["server_ms_total"] / requests_count, 1),
+                    "avg_total_ms": round(entry["total_ms_total"] / requests_count, 1),
+                    "setup_ms_total": round(entry["connect_ms_total"] + entry["tls_ms_total"], 1),
+                    "http_versions": dict(entry["http_versions"])
+                }
+            return result
+
+
+class MediaDownloadMetrics:
+    """Streaming media downloads: bytes in flight per worker thread and outcomes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, int] = {}  # thread name -> bytes received so far
+        self.peak_in_flight = 0
+        self.downloads = 0
+        self.bytes_total = 0
+        self.too_large = 0
+        self.deadline_exceeded = 0
+        self.failed = 0
+
+    def update(self, received: int) -> None:
+        """Bytes received so far by the current thread's download"""
+        with self.lock:
+            self.in_flight[threading.current_thread().name] = received
+            self.peak_in_flight = max(self.peak_in_flight, sum(self.in_flight.values()))
+
+    def finish(self, outcome: str, received: int) -> None:
+        """Close the current thread's download with ok/too_large/deadline/failed"""
+        with self.lock:
+            self.in_flight.pop(threading.current_thread().name, None)
+            if outcome == "ok":
+                self.downloads += 1
+                self.bytes_total += received
+            elif outcome == "too_large":
+                self.too_large += 1
+            elif outcome == "deadline":
+                self.deadline_exceeded += 1
+            else:
+                self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "in_flight_bytes": dict(self.in_flight),
+                "in_flight_bytes_total": sum(self.in_flight.values()),
+                "peak_in_flight_bytes": self.peak_in_flight,
+                "downloads": self.downloads,
+                "avg_bytes": round(self.bytes_total / self.downloads) if self.downloads else 0,
+                "too_large": self.too_large,
+                "deadline_exceeded": self.deadline_exceeded,
+                "failed": self.failed
+            }
+
+
+# Global request metrics shared by every Wappi client in the process
+wappi_http_metrics = WappiHttpMetrics()
+metrics_registry.register("wappi_http", wappi_http_metrics.stats)
+
+media_download_metrics = MediaDownloadMetrics()
+metrics_registry.register("media_downloads", media_download_metrics.stats)
+
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+
+def http_client_options() -> Dict[str, Any]:
+    """Connection pool settings shared by the sync and async clients"""
+    http2 = settings.WAPPI_HTTP2 and HTTP2_AVAILABLE
+    if settings.WAPPI_HTTP2 and not HTTP2_AVAILABLE:
+        logger.warning("WAPPI_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=settings.WAPPI_POOL_SIZE,
+            max_keepalive_connections=settings.WAPPI_POOL_KEEPALIVE,
+            keepalive_expiry=settings.WAPPI_KEEPALIVE_EXPIRY
+        )
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled keep-alive client (thread-safe)"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(**http_client_options())
+    return _http_client
+
+
+class BaseWappiClient:
+    """
+    Shared configuration, request building and response handling
+
+    Subclasses only differ in how a request is sent (blocking or asyncio),
+    so every endpoint builds its request and interprets its result here.
     """
 
     def __init__(self):
@@ -25,6 +220,195 @@ class WappiClient:
         self.timeout = 30  # seconds
         self.max_retries = 3
 
+        # 429 tracking (read by the adaptive poll scheduler)
+        self.rate_limit_hits = 0
+        self.last_retry_after = 0
+
+    def _handle_response(self, response: httpx.Response, attempt: int, elapsed_ms: float) -> Tuple[str, Any]:
+        """
+        Decide what to do with a response and feed the circuit breaker
+
+        Returns:
+            ("return", json), ("retry", seconds to wait) or ("fail", None)
+        """
+        if response.status_code >= 500:
+            wappi_circuit_breaker.record_failure(elapsed_ms)
+        else:
+            wappi_circuit_breaker.record_success(elapsed_ms)
+
+        # Check for rate limiting
+        if response.status_code == 429:
+            retry_after = int(response.headers.get('Retry-After', 5))
+            self.rate_limit_hits += 1
+            self.last_retry_after = retry_after
+            logger.warning(f"Rate limited. Waiting {retry_after} seconds...")
+            # Pause every caller; the retry then waits in the limiter
+            wappi_rate_limiter.drain(retry_after)
+            return "retry", 0
+
+        # Check for server errors
+        if response.status_code >= 500:
+            logger.warning(f"Server error {response.status_code}. Retry {attempt + 1}/{self.max_retries}")
+            return "retry", 2 ** attempt  # Exponential backoff
+
+        # Check for client errors
+        if response.status_code >= 400:
+            logger.error(f"Client error {response.status_code}: {response.text}")
+            return "fail", None
+
+        return "return", response.json()
+
+    def _handle_exception(self, error: Exception, attempt: int, elapsed_ms: float) -> Optional[float]:
+        """Return seconds to wait before retrying, or None to give up"""
+        if isinstance(error, httpx.TransportError):
+            wappi_circuit_breaker.record_failure(elapsed_ms)
+
+        if isinstance(error, httpx.TimeoutException):
+            logger.warning(f"Request timeout. Retry {attempt + 1}/{self.max_retries}")
+            if attempt < self.max_retries - 1:
+                return 2 ** attempt
+            logger.error(f"Failed after {self.max_retries} retries")
+            return None
+
+        logger.error(f"Request failed: {str(error)}")
+        if attempt < self.max_retries - 1:
+            return 2 ** attempt
+        return None
+
+    def _chats_request(self, limit: int, offset: int, show_all: bool) -> Dict[str, Any]:
+        logger.debug(f"Fetching chats: limit={limit}, offset={offset}")
+        return {
+            "method": "POST",
+            "endpoint": "/api/sync/chats/get",
+            "params": {
+                "profile_id": self.profile_id,
+                "limit": limit,
+                "offset": offset,
+                "show_all": str(show_all).lower()
+            }
+        }
+
+    def _chats_result(self, response: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if response and response.get("status") == "done":
+            logger.info(f"Retrieved {len(response.get('dialogs', []))} chats")
+            return response
+
+        return None
+
+    def _messages_request(self, chat_id: str, limit: int, offset: int, mark_all: bool, order: str) -> Dict[str, Any]:
+        return {
+            "method": "GET",
+            "endpoint": "/api/sync/messages/get",
+            "params": {
+                "profile_id": self.profile_id,
+                "chat_id": chat_id,
+                "limit": limit,
+                "offset": offset,
+                "mark_all": str(mark_all).lower(),
+                "order": order
+            }
+        }
+
+    def _send_request(self, recipient: str, body: str) -> Optional[Dict[str, Any]]:
+        if not recipient or not body:
+            logger.error("Recipient and body are required")
+            return None
+
+        logger.info(f"Sending message to {recipient}")
+        return {
+            "method": "POST",
+            "endpoint": "/api/sync/message/send",
+            "params": {"profile_id": self.profile_id},
+            "data": {
+                "recipient": recipient,
+                "body": body
+            }
+        }
+
+    def _send_result(self, response: Optional[Dict[str, Any]], recipient: str) -> Optional[Dict[str, Any]]:
+        if response and response.get("status") == "done":
+            logger.success(f"Message sent successfully. Message ID: {response.get('message_id')}")
+            return response
+
+        logger.error(f"Failed to send message to {recipient}")
+        return None
+
+    def _reply_request(self, message_id: str, body: str, url: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not message_id or not body:
+            logger.error("Message ID and body are required")
+            return None
+
+        data = {
+            "message_id": message_id,
+            "body": body
+        }
+
+        if url:
+            data["url"] = url
+
+        logger.info(f"Replying to message {message_id}")
+        return {
+            "method": "POST",
+            "endpoint": "/api/sync/message/reply",
+            "params": {"profile_id": self.profile_id},
+            "data": data
+        }
+
+    def _reply_result(self, response: Optional[Dict[str, Any]], message_id: str) -> Optional[Dict[str, Any]]:
+        if response and response.get("status") == "done":
+            logger.success(f"Reply sent successfully. Message ID: {response.get('message_id')}")
+            return response
+
+        logger.error(f"Failed to reply to message {message_id}")
+        return None
+
+    def _mark_read_request(self, message_id: str, mark_all: bool) -> Dict[str, Any]:
+        logger.debug(f"Marking message {message_id} as read")
+        return {
+            "method": "POST",
+            "endpoint": "/api/sync/message/mark/read",
+            "params": {
+                "profile_id": self.profile_id,
+                "mark_all": str(mark_all).lower()
+            },
+            "data": {"message_id": message_id}
+        }
+
+    def _mark_read_result(self, response: Optional[Dict[str, Any]], message_id: str) -> bool:
+        if response and response.get("status") == "done":
+            logger.success(f"Message {message_id} marked as read")
+            return True
+
+        logger.error(f"Failed to mark message {message_id} as read")
+        return False
+
+    def _file_request(self, message_id: str) -> Dict[str, Any]:
+        return {
+            "endpoint": "/api/sync/message/media/download",
+            "params": {
+                "profile_id": self.profile_id,
+                "message_id": message_id
+            }
+        }
+
+    def _file_result(self, response: httpx.Response, message_id: str) -> Optional[bytes]:
+        if response.status_code == 200:
+            logger.success(f"Downloaded file for message {message_id}")
+            return response.content
+
+        logger.error(f"Failed to download file: {response.status_code}")
+        return None
+
+
+class WappiClient(BaseWappiClient):
+    """
+    Client for interacting with Wappi.pro WhatsApp API
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.http = get_http_client()
+
     def _make_request(
         self,
         method: str,
@@ -47,50 +431,39 @@ class WappiClient:
         url = f"{self.base_url}{endpoint}"
 
         for attempt in range(self.max_retries):
+            if not wappi_circuit_breaker.allow_request():
+                # Fail fast while Wappi is degraded
+                return None
+
+            started = time.perf_counter()
             try:
-                response = requests.request(
+                wappi_rate_limiter.acquire(endpoint)
+                timer = RequestTimer()
+                started = time.perf_counter()
+                response = self.http.request(
                     method=method,
                     url=url,
                     headers=self.headers,
                     params=params,
                     json=data,
-                    timeout=self.timeout
+                    timeout=self.timeout,
+                    extensions={"trace": timer.trace}
                 )
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                wappi_http_metrics.record(endpoint, timer, elapsed_ms, response.http_version)
 
-                # Check for rate limiting
-                if response.status_code == 429:
-                    retry_after = int(response.headers.get('Retry-After', 5))
-                    logger.warning(f"Rate limited. Waiting {retry_after} seconds...")
-                    time.sleep(retry_after)
-                    continue
-
-                # Check for server errors
-                if response.status_code >= 500:
-                    logger.warning(f"Server error {response.status_code}. Retry {attempt + 1}/{self.max_retries}")
-                    time.sleep(2 ** attempt)  # Exponential backoff
+                action, value = self._handle_response(response, attempt, elapsed_ms)
+                if action == "retry":
+                    if value:
+                        time.sleep(value)
                     continue
-
-                # Check for client errors
-                if response.status_code >= 400:
-                    logger.error(f"Client error {response.status_code}: {response.text}")
-                    return None
-
-                return response.json()
-
-            except requests.exceptions.Timeout:
-                logger.warning(f"Request timeout. Retry {attempt + 1}/{self.max_retries}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(2 ** attempt)
-                else:
-                    logger.error(f"Failed after {self.max_retries} retries")
-                    return None
+                return value
 
             except Exception as e:
-                logger.error(f"Request failed: {str(e)}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(2 ** attempt)
-                else:
+                wait = self._handle_exception(e, attempt, (time.perf_counter() - started) * 1000)
+                if wait is None:
                     return None
+                time.sleep(wait)
 
         return None
 
@@ -106,22 +479,7 @@ class WappiClient:
         Returns:
             API response with chats or None
         """
-        endpoint = "/api/sync/chats/get"
-        params = {
-            "profile_id": self.profile_id,
-            "limit": limit,
-            "offset": offset,
-            "show_all": str(show_all).lower()
-        }
-
-        logger.debug(f"Fetching chats: limit={limit}, offset={offset}")
-        response = self._make_request("POST", endpoint, params=params)
-
-        if response and response.get("status") == "done":
-            logger.info(f"Retrieved {len(response.get('dialogs', []))} chats")
-            return response
-
-        return None
+        return self._chats_result(self._make_request(**self._chats_request(limit, offset, show_all)))
 
     def get_messages(
         self,
@@ -144,18 +502,7 @@ class WappiClient:
         Returns:
             API response with messages or None
         """
-        endpoint = "/api/sync/messages/get"
-        params = {
-            "profile_id": self.profile_id,
-            "chat_id": chat_id,
-            "limit": limit,
-            "offset": offset,
-            "mark_all": str(mark_all).lower(),
-            "order": order
-        }
-
-        response = self._make_request("GET", endpoint, params=params)
-        return response
+        return self._make_request(**self._messages_request(chat_id, limit, offset, mark_all, order))
 
     def send_message(self, recipient: str, body: str) -> Optional[Dict[str, Any]]:
         """
@@ -168,26 +515,11 @@ class WappiClient:
         Returns:
             API response or None
         """
-        if not recipient or not body:
-            logger.error("Recipient and body are required")
+        request = self._send_request(recipient, body)
+        if request is None:
             return None
 
-        endpoint = "/api/sync/message/send"
-        params = {"profile_id": self.profile_id}
-        data = {
-            "recipient": recipient,
-            "body": body
-        }
-
-        logger.info(f"Sending message to {recipient}")
-        response = self._make_request("POST", endpoint, params=params, data=data)
-
-        if response and response.get("status") == "done":
-            logger.success(f"Message sent successfully. Message ID: {response.get('message_id')}")
-            return response
-
-        logger.error(f"Failed to send message to {recipient}")
-        return None
+        return self._send_result(self._make_request(**request), recipient)
 
     def reply_to_message(self, message_id: str, body: str, url: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
@@ -201,29 +533,11 @@ class WappiClient:
         Returns:
             API response or None
         """
-        if not message_id or not body:
-            logger.error("Message ID and body are required")
+        request = self._reply_request(message_id, body, url)
+        if request is None:
             return None
 
-        endpoint = "/api/sync/message/reply"
-        params = {"profile_id": self.profile_id}
-        data = {
-            "message_id": message_id,
-            "body": body
-        }
-
-        if url:
-            data["url"] = url
-
-        logger.info(f"Replying to message {message_id}")
-        response = self._make_request("POST", endpoint, params=params, data=data)
-
-        if response and response.get("status") == "done":
-            logger.success(f"Reply sent successfully. Message ID: {response.get('message_id')}")
-            return response
-
-        logger.error(f"Failed to reply to message {message_id}")
-        return None
+        return self._reply_result(self._make_request(**request), message_id)
 
     def mark_as_read(self, message_id: str, mark_all: bool = False) -> bool:
         """
@@ -236,22 +550,7 @@ class WappiClient:
         Returns:
             True if successful, False otherwise
         """
-        endpoint = "/api/sync/message/mark/read"
-        params = {
-            "profile_id": self.profile_id,
-            "mark_all": str(mark_all).lower()
-        }
-        data = {"message_id": message_id}
-
-        logger.debug(f"Marking message {message_id} as read")
-        response = self._make_request("POST", endpoint, params=params, data=data)
-
-        if response and response.get("status") == "done":
-            logger.success(f"Message {message_id} marked as read")
-            return True
-
-        logger.error(f"Failed to mark message {message_id} as read")
-        return False
+        return self._mark_read_result(self._make_request(**self._mark_read_request(message_id, mark_all)), message_id)
 
     def get_message_file(self, message_id: str) -> Optional[bytes]:
         """
@@ -265,28 +564,146 @@ class WappiClient:
         Returns:
             File bytes or None
         """
-        endpoint = "/api/sync/message/media/download"
-        params = {
-            "profile_id": self.profile_id,
-            "message_id": message_id
-        }
+        request = self._file_request(message_id)
+        if not wappi_circuit_breaker.allow_request():
+            return None
 
+        started = time.perf_counter()
         try:
-            url = f"{self.base_url}{endpoint}"
-            response = requests.get(
+            wappi_rate_limiter.acquire(request["endpoint"])
+            url = f"{self.base_url}{request['endpoint']}"
+            timer = RequestTimer()
+            started = time.perf_counter()
+            response = self.http.get(
                 url,
                 headers=self.headers,
-                params=params,
-                timeout=self.timeout
+                params=request["params"],
+                timeout=self.timeout,
+                extensions={"trace": timer.trace}
             )
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            wappi_http_metrics.record(request["endpoint"], timer, elapsed_ms, response.http_version)
+            if response.status_code >= 500:
+                wappi_circuit_breaker.record_failure(elapsed_ms)
+            else:
+                wappi_circuit_breaker.record_success(elapsed_ms)
 
-            if response.status_code == 200:
-                logger.success(f"Downloaded file for message {message_id}")
-                return response.content
+            return self._file_result(response, message_id)
 
-            logger.error(f"Failed to download file: {response.status_code}")
+        except Exception as e:
+            if isinstance(e, httpx.TransportError):
+                wappi_circuit_breaker.record_failure((time.perf_counter() - started) * 1000)
+            logger.error(f"Error downloading file: {str(e)}")
             return None
 
+    def download_message_file(
+        self,
+        message_id: str,
+        max_bytes: Optional[int] = None,
+        deadline: Optional[float] = None
+    ) -> Optional[IO[bytes]]:
+        """
+        Stream a message file into a spooled temp file
+
+        Small files stay in memory, larger ones spill to disk, so a long
+        voice note never sits in the worker's memory whole.
+
+        Args:
+            message_id: ID of message containing file
+            max_bytes: Abort when the file is larger (default MEDIA_MAX_BYTES)
+            deadline: Abort when the download takes longer, in seconds
+                      (default MEDIA_DOWNLOAD_DEADLINE)
+
+        Returns:
+            File-like object positioned at 0 (caller closes it) or None
+        """
+        max_bytes = max_bytes or settings.MEDIA_MAX_BYTES
+        deadline = deadline or settings.MEDIA_DOWNLOAD_DEADLINE
+        request = self._file_request(message_id)
+        if not wappi_circuit_breaker.allow_request():
+            return None
+
+        buffer = tempfile.SpooledTemporaryFile(max_size=settings.MEDIA_SPOOL_MAX_MEMORY)
+        received = 0
+        outcome = "failed"
+        expired = threading.Event()
+        started = time.perf_counter()
+        try:
+            wappi_rate_limiter.acquire(request["endpoint"])
+            url = f"{self.base_url}{request['endpoint']}"
+            timer = RequestTimer()
+            started = time.perf_counter()
+
+            with self.http.stream(
+                "GET",
+                url,
+                headers=self.headers,
+                params=request["params"],
+                # A short read timeout bounds how far a stalled read can run past the deadline
+                timeout=httpx.Timeout(self.timeout, read=min(self.timeout, settings.MEDIA_READ_TIMEOUT)),
+                extensions={"trace": timer.trace}
+            ) as response:
+                if response.status_code >= 500:
+                    wappi_circuit_breaker.record_failure((time.perf_counter() - started) * 1000)
+                else:
+                    wappi_circuit_breaker.record_success((time.perf_counter() - started) * 1000)
+
+                if response.status_code != 200:
+                    logger.error(f"Failed to download file: {response.status_code}")
+                    return None
+
+                content_length = int(response.headers.get("Content-Length") or 0)
+                if content_length > max_bytes:
+                    outcome = "too_large"
+                    logger.error(f"File for message {message_id} is {content_length} bytes, limit is {max_bytes}")
+                    return None
+
+                # Close the stream at the deadline even if no further chunk arrives
+                def expire() -> None:
+                    expired.set()
+                    response.close()
+
+                watchdog = threading.Timer(max(0.0, deadline - (time.perf_counter() - started)), expire)
+                watchdog.daemon = True
+                watchdog.start()
+                try:
+                    for chunk in response.iter_bytes(settings.MEDIA_CHUNK_SIZE):
+                        received += len(chunk)
+                        if received > max_bytes:
+                            outcome = "too_large"
+                            logger.error(f"File for message {message_id} exceeded {max_bytes} bytes, aborting")
+                            return None
+                        if expired.is_set() or time.perf_counter() - started > deadline:
+                            outcome = "deadline"
+                            logger.error(f"Download of message {message_id} exceeded {deadline}s deadline, aborting")
+                            return None
+
+                        buffer.write(chunk)
+                        media_download_metrics.update(received)
+                finally:
+                    watchdog.cancel()
+
+            wappi_http_metrics.record(
+                request["endpoint"], timer, (time.perf_counter() - started) * 1000, response.http_version
+            )
+
+            outcome = "ok"
+            buffer.seek(0)
+            logger.success(f"Downloaded file for message {message_id} ({received} bytes)")
+            return buffer
+
         except Exception as e:
+            elapsed = time.perf_counter() - started
+            if isinstance(e, httpx.TransportError):
+                wappi_circuit_breaker.record_failure(elapsed * 1000)
+            if expired.is_set() or elapsed >= deadline:
+                outcome = "deadline"
+                logger.error(f"Download of message {message_id} stalled past the {deadline}s deadline, aborting")
+                return None
             logger.error(f"Error downloading file: {str(e)}")
             return None
+
+        finally:
+            media_download_metrics.finish(outcome, received)
+            if outcome != "ok":
+                buffer.close()
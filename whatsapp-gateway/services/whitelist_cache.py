@@ -0,0 +1,96 @@
+"""
+Whitelist Cache
+In-memory frozenset of ignored phone numbers with a versioned TTL refresh
+"""
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from loguru import logger
+
+from config.database import get_db
+from config.settings import settings
+from models.whitelist import Whitelist
+from utils.metrics import metrics_registry
+
+
+class WhitelistCache:
+    """
+    Whitelist lookups in O(1) memory
+
+    Every `ttl` seconds a cheap version query (row count + max id) checks
+    whether the table changed; the full list is reloaded only when it did.
+    Admin changes made through this process call invalidate() directly.
+    The version only sees inserts and deletes: an in-place UPDATE of a
+    number made by another process is picked up on its next reload.
+    A failed refresh (e.g. the database is down at startup) is retried
+    after the TTL as well, not on every lookup.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.numbers: frozenset = frozenset()
+        self.version: Optional[Tuple[int, int]] = None
+        self.checked_at: Optional[float] = None  # last refresh attempt, successful or not
+        self.lock = threading.Lock()
+        self.reloads = 0
+        self.lookups = 0
+
+    def _read_version(self, db: Session) -> Tuple[int, int]:
+        """Version of the whitelist table: (row count, max id)"""
+        count, max_id = db.query(func.count(Whitelist.id), func.max(Whitelist.id)).one()
+        return count or 0, max_id or 0
+
+    def _reload(self, db: Session) -> None:
+        """Load all numbers into a new frozenset"""
+        version = self._read_version(db)
+        rows = db.query(Whitelist.phone_number).all()
+        self.numbers = frozenset(row[0] for row in rows)
+        self.version = version
+        self.reloads += 1
+        logger.info(f"Loaded {len(self.numbers)} whitelist numbers")
+
+    def refresh(self, force: bool = False) -> None:
+        """Reload the whitelist if forced, or if the TTL expired and the version changed"""
+        with self.lock:
+            now = time.monotonic()
+            if not force and self.checked_at is not None and now - self.checked_at < self.ttl:
+                return
+
+            db = next(get_db())
+            try:
+                if force or self.version is None or self._read_version(db) != self.version:
+                    self._reload(db)
+                self.checked_at = now
+            except Exception as e:
+                # Keep serving the previous set; retry on the next lookup after TTL
+                logger.error(f"Failed to refresh whitelist cache: {e}")
+                self.checked_at = now
+            finally:
+                db.close()
+
+    def invalidate(self) -> None:
+        """Reload immediately (after an admin change)"""
+        self.refresh(force=True)
+
+    def contains(self, phone_number: str) -> bool:
+        """Check if phone number is whitelisted"""
+        self.refresh()
+        self.lookups += 1
+        return phone_number in self.numbers
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and refresh counters"""
+        return {
+            "numbers": len(self.numbers),
+            "version": list(self.version) if self.version else None,
+            "ttl_seconds": self.ttl,
+            "reloads": self.reloads,
+            "lookups": self.lookups
+        }
+
+
+# Global whitelist cache instance
+whitelist_cache = WhitelistCache(ttl=settings.WHITELIST_CACHE_TTL)
+metrics_registry.register("whitelist_cache", whitelist_cache.stats)
@@ -0,0 +1,39 @@
+"""
+Runtime metrics registry
+Components register a snapshot callable; the health API collects them on /stats
+"""
+import threading
+from typing import Callable, Dict, Any
+from loguru import logger
+
+
+class MetricsRegistry:
+    """Registry of named metric providers"""
+
+    def __init__(self):
+        self.providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+
+    def register(self, name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+        """Register (or replace) a metrics provider"""
+        with self.lock:
+            self.providers[name] = provider
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Collect metrics from all registered providers"""
+        with self.lock:
+            providers = dict(self.providers)
+
+        result = {}
+        for name, provider in providers.items():
+            try:
+                result[name] = provider()
+            except Exception as e:
+                logger.error(f"Failed to collect metrics '{name}': {e}")
+                result[name] = {"error": str(e)}
+
+        return result
+
+
+# Global metrics registry instance
+metrics_registry = MetricsRegistry()